@@ -0,0 +1,59 @@
+"""
+Measures the overhead init_athena_params adds to a call compared to
+calling the awswrangler function directly.
+
+AWS calls are stubbed out so only the time spent in the wrapper
+(including any SQL rewriting) is measured. Run with:
+
+    python benchmarks/bench_init_athena_params.py
+"""
+import functools
+import timeit
+
+import awswrangler.athena as ath
+
+import pydbtools._wrangler as wrangler
+
+N = 20_000
+
+
+@functools.wraps(ath.get_query_execution)
+def get_query_execution(*args, **kwargs):
+    return None
+
+
+@functools.wraps(ath.read_sql_query)
+def read_sql_query(*args, **kwargs):
+    return None
+
+
+def report(name, func, *args, **kwargs):
+    wrapped = wrangler.init_athena_params(func)
+    direct = timeit.timeit(lambda: func(*args, **kwargs), number=N) / N
+    total = timeit.timeit(lambda: wrapped(*args, **kwargs), number=N) / N
+    print(
+        f"{name:<20} direct {1e6 * direct:8.2f} us/call  "
+        f"wrapped {1e6 * total:8.2f} us/call  "
+        f"overhead {1e6 * (total - direct):8.2f} us/call"
+    )
+
+
+def main():
+    wrangler.get_boto_session = lambda **kwargs: None
+    wrangler.get_user_id_and_table_dir = lambda *args, **kwargs: (
+        "abcde:alpha_user_bench",
+        "s3://bucket/abcde:alpha_user_bench/",
+    )
+    wrangler._create_temp_database = lambda *args, **kwargs: None
+
+    report("get_query_execution", get_query_execution, "query-id")
+    report(
+        "read_sql_query",
+        read_sql_query,
+        "SELECT * FROM db.table WHERE a = 1",
+        database="db",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Compares replace_temp_database_name_reference with the sqlparse based
+version it replaced, on a large generated UNION query with and without
+references to __temp__. Recent versions of sqlparse refuse to parse
+statements of more than 10,000 tokens, so the old version fails on the
+largest query. Run with:
+
+    python benchmarks/bench_replace_temp.py
+"""
+import re
+import timeit
+
+import sqlparse
+import sqlparse.exceptions
+
+from pydbtools.utils import check_temp_query, replace_temp_database_name_reference
+
+SIZES = [200, 2_000, 10_000]  # lines
+REPEAT = 3
+
+
+def sqlparse_replace(sql: str, database_name: str) -> str:
+    """The previous implementation, which parses every query in full."""
+    new_query = []
+    for query in sqlparse.parse(sql):
+        check_temp_query(str(query))
+        new_query.append(
+            "".join(
+                re.sub("^__temp__", database_name, str(word), flags=re.IGNORECASE)
+                for word in query.flatten()
+            )
+        )
+    return "".join(new_query).strip()
+
+
+def union_query(database: str, n_lines: int) -> str:
+    return "\nUNION ALL\n".join(
+        f"SELECT {i} AS n, 'row {i}' AS label FROM {database}.table_{i % 50} "
+        f"-- part {i}"
+        for i in range(n_lines // 2)
+    )
+
+
+def best_time(func, *args):
+    return min(timeit.repeat(lambda: func(*args), number=1, repeat=REPEAT))
+
+
+def report(name, sql):
+    new = best_time(replace_temp_database_name_reference, sql, "temp_db")
+    try:
+        expected = sqlparse_replace(sql, "temp_db")
+    except sqlparse.exceptions.SQLParseError:
+        print(f"{name:<24} sqlparse    failed  single pass {1e3 * new:9.2f} ms")
+        return
+    assert expected == replace_temp_database_name_reference(sql, "temp_db")
+    old = best_time(sqlparse_replace, sql, "temp_db")
+    print(
+        f"{name:<24} sqlparse {1e3 * old:9.2f} ms  "
+        f"single pass {1e3 * new:9.2f} ms  speedup {old / new:8.1f}x"
+    )
+
+
+def main():
+    for n_lines in SIZES:
+        report(f"{n_lines} lines, __temp__", union_query("__temp__", n_lines))
+        report(f"{n_lines} lines, no __temp__", union_query("a_database", n_lines))
+
+
+if __name__ == "__main__":
+    main()
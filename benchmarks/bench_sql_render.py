@@ -0,0 +1,82 @@
+"""
+Compares rendering a SQL template once per date partition by building
+a new jinja2 Template on every call (as render_sql_template used to)
+with render_sql_template and render_sql_templates, which compile the
+template once. Run with:
+
+    python benchmarks/bench_sql_render.py
+"""
+import datetime
+import os
+import tempfile
+import timeit
+
+from jinja2 import Template
+
+import pydbtools as pydb
+
+N_RENDERS = 500
+REPEAT = 5
+
+TEMPLATE = """
+SELECT {% for col in columns %}{{ col }}{% if not loop.last %}, {% endif %}{% endfor %}
+FROM {{ database }}.{{ table }}
+WHERE dt = '{{ dt }}'
+{% if categories %}AND category IN (
+    {%- for c in categories %}'{{ c }}'{% if not loop.last %}, {% endif %}{% endfor -%}
+){% endif %}
+"""
+
+ARGS = [
+    {
+        "columns": ["id", "name", "amount", "category"],
+        "database": "db",
+        "table": "transactions",
+        "dt": datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+        "categories": ["a", "b", "c"],
+    }
+    for i in range(N_RENDERS)
+]
+
+
+def uncached_from_file(path):
+    with open(path) as f:
+        sql = "".join(f.readlines())
+    return [Template(sql).render(**args) for args in ARGS]
+
+
+def report(name, old, new):
+    assert old() == new()
+    old_time = min(timeit.repeat(old, number=1, repeat=REPEAT))
+    new_time = min(timeit.repeat(new, number=1, repeat=REPEAT))
+    print(
+        f"{name:<28} uncached {1e3 * old_time:8.2f} ms  "
+        f"cached {1e3 * new_time:8.2f} ms  speedup {old_time / new_time:6.1f}x"
+    )
+
+
+def main():
+    print(f"Rendering a template {N_RENDERS} times")
+    report(
+        "render_sql_template",
+        lambda: [Template(TEMPLATE).render(**args) for args in ARGS],
+        lambda: [pydb.render_sql_template(TEMPLATE, args) for args in ARGS],
+    )
+    report(
+        "render_sql_templates",
+        lambda: [Template(TEMPLATE).render(**args) for args in ARGS],
+        lambda: pydb.render_sql_templates(TEMPLATE, ARGS),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "query.sql")
+        with open(path, "w") as f:
+            f.write(TEMPLATE)
+        report(
+            "get_sql_from_file",
+            lambda: uncached_from_file(path),
+            lambda: [pydb.get_sql_from_file(path, args) for args in ARGS],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
-from ._sql_render import get_sql_from_file, render_sql_template  # noqa: F401
+from ._result_cache import clear_result_cache  # noqa: F401
+from ._sql_render import (  # noqa: F401
+    get_sql_from_file,
+    render_sql_template,
+    render_sql_templates,
+)
 from ._wrangler import (  # noqa: F401
+    DeletionError,
+    cleanup_temp_storage,
+    compact_table,
     create_athena_bucket,
     create_database,
     create_table,
     create_temp_database,
     create_temp_table,
+    create_temp_tables,
     dataframe_to_table,
     dataframe_to_temp_table,
     delete_database_and_data,
@@ -19,8 +28,10 @@ from ._wrangler import (  # noqa: F401
     read_sql_queries,
     read_sql_queries_gen,
     read_sql_query,
+    read_sql_query_batches,
     read_sql_table,
     repair_table,
+    run_queries,
     save_query_to_parquet,
     show_create_table,
     start_query_execution,
@@ -28,7 +39,14 @@ from ._wrangler import (  # noqa: F401
     stop_query_execution,
     tables,
     wait_query,
+    was_result_reused,
+)
+from .utils import (  # noqa: F401
+    clear_glue_cache,
+    clear_session_cache,
+    get_glue_cache_stats,
+    get_query_poll_stats,
+    s3_path_join,
 )
-from .utils import s3_path_join  # noqa: F401
 
 __version__ = "5.8.1"
@@ -0,0 +1,176 @@
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from arrow_pd_parser.utils import human_to_bytes
+
+# Match the files written by awswrangler's to_parquet
+_writer_kwargs = {
+    "coerce_timestamps": "ms",
+    "flavor": "spark",
+    "version": "1.0",
+    "use_dictionary": True,
+    "write_statistics": True,
+}
+
+# Largest amount of data (in memory) written as a single row group
+_max_row_group_bytes = 128 * 1024**2
+
+# Largest amount of data held in memory across all partitions
+# before the biggest buffer is written out early
+_max_buffered_bytes = 512 * 1024**2
+
+# Most files open at once. Each open S3 file holds its own upload
+# buffer, so when a new one is needed the least recently written file
+# is closed, and its partition starts a new file if written to again
+_max_open_files = 32
+
+
+def _parse_file_size(file_size: Union[int, str]) -> int:
+    """
+    Converts a file size given as a number of bytes or
+    a string such as "128MB" to a number of bytes.
+    """
+    if isinstance(file_size, str):
+        file_size = human_to_bytes(file_size)
+    if file_size <= 0:
+        raise ValueError("target_file_size must be greater than 0")
+    return int(file_size)
+
+
+def _split_partitions(
+    df: pd.DataFrame, partition_cols: Optional[List[str]]
+) -> Iterator[Tuple[List[Tuple[str, str]], pd.DataFrame]]:
+    """
+    Splits a dataframe by its partition columns.
+
+    Yields:
+        A list of (column, value) pairs for the partition and the rows
+        in it without the partition columns.
+    """
+    if not partition_cols:
+        yield [], df
+        return
+    for keys, part in df.groupby(partition_cols, sort=False, dropna=False):
+        if not isinstance(keys, tuple):
+            keys = (keys,)
+        yield list(zip(partition_cols, keys)), part.drop(columns=partition_cols)
+
+
+class _SizedParquetWriter:
+    """
+    Writes arrow tables to a Hive partitioned Parquet dataset.
+    Tables written to the same partition are buffered and coalesced
+    into row groups, and each partition's file is closed and a new one
+    started once it reaches the target file size. At most
+    _max_open_files files are open at once, so data spread over more
+    partitions than that can be written as more, smaller files.
+
+    Args:
+        path (str): S3 path of the dataset
+        schema (pyarrow.Schema): Schema of the files (without the
+            partition columns)
+        filesystem (pyarrow.fs.FileSystem): Filesystem to write to
+        target_file_size (int): Size in bytes to close files at
+        compression (str): Parquet compression codec
+    """
+
+    def __init__(
+        self,
+        path: str,
+        schema: pa.Schema,
+        filesystem,
+        target_file_size: int,
+        compression: str = "snappy",
+    ):
+        self.path = path if path.endswith("/") else path + "/"
+        self.schema = schema
+        self.filesystem = filesystem
+        self.target_file_size = target_file_size
+        self.compression = compression
+        self.row_group_bytes = min(target_file_size, _max_row_group_bytes)
+        self.paths: List[str] = []
+        self.partitions_values: Dict[str, List[str]] = {}
+        self._file_prefix = uuid.uuid4().hex
+        self._buffers: Dict[str, List[pa.Table]] = {}
+        self._buffered_bytes: Dict[str, int] = {}
+        self._files = {}
+
+    def write(
+        self, table: pa.Table, partition: Optional[List[Tuple[str, str]]] = None
+    ) -> None:
+        """
+        Adds a table to a partition, given as (column, value) pairs.
+        """
+        prefix = self.path + "".join(f"{col}={val}/" for col, val in partition or [])
+        if partition:
+            self.partitions_values[prefix] = [str(val) for _, val in partition]
+
+        self._buffers.setdefault(prefix, []).append(table)
+        self._buffered_bytes[prefix] = self._buffered_bytes.get(prefix, 0) + (
+            table.nbytes
+        )
+        if self._buffered_bytes[prefix] >= self.row_group_bytes:
+            self._flush(prefix)
+        elif sum(self._buffered_bytes.values()) >= _max_buffered_bytes:
+            self._flush(max(self._buffered_bytes, key=self._buffered_bytes.get))
+
+    def close(self) -> None:
+        """
+        Writes any buffered data and closes all files.
+        """
+        for prefix in list(self._buffers):
+            self._flush(prefix)
+        for prefix in list(self._files):
+            self._close_file(prefix)
+
+    def abort(self) -> None:
+        """
+        Closes all files and deletes everything written so far.
+        """
+        self._buffers.clear()
+        self._buffered_bytes.clear()
+        for prefix in list(self._files):
+            self._close_file(prefix)
+        for path in self.paths:
+            try:
+                self.filesystem.delete_file(path.replace("s3://", "", 1))
+            except FileNotFoundError:
+                pass
+
+    def _flush(self, prefix: str) -> None:
+        tables = self._buffers.pop(prefix, [])
+        self._buffered_bytes.pop(prefix, None)
+        if not tables:
+            return
+        table = pa.concat_tables(tables)
+        if prefix in self._files:
+            # Keep the files in the order they were last written to
+            self._files[prefix] = self._files.pop(prefix)
+        else:
+            if len(self._files) >= _max_open_files:
+                self._close_file(next(iter(self._files)))
+            self._open_file(prefix)
+        sink, writer = self._files[prefix]
+        writer.write_table(table, row_group_size=table.num_rows)
+        if sink.tell() >= self.target_file_size:
+            self._close_file(prefix)
+
+    def _open_file(self, prefix: str) -> None:
+        path = (
+            f"{prefix}{self._file_prefix}_{len(self.paths):05d}"
+            f".{self.compression}.parquet"
+        )
+        sink = self.filesystem.open_output_stream(path.replace("s3://", "", 1))
+        writer = pq.ParquetWriter(
+            sink, self.schema, compression=self.compression, **_writer_kwargs
+        )
+        self.paths.append(path)
+        self._files[prefix] = (sink, writer)
+
+    def _close_file(self, prefix: str) -> None:
+        sink, writer = self._files.pop(prefix)
+        writer.close()
+        sink.close()
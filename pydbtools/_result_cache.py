@@ -0,0 +1,193 @@
+import functools
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+import sql_metadata
+
+from pydbtools import utils
+
+logger = logging.getLogger(__name__)
+
+# Arguments to read_sql_query that change the result returned
+_result_args = [
+    "params",
+    "paramstyle",
+    "categories",
+    "dtype_backend",
+    "pyarrow_additional_kwargs",
+]
+
+
+def cache_results(func):
+    """
+    Wraps awswrangler's read_sql_query so results are stored in and read
+    from a local cache when pydbtools.utils.result_cache_dir is set.
+
+    Must be applied before init_athena_params, so the SQL, database and
+    boto3_session it sees are the ones sent to Athena.
+
+    Entries are keyed on the cleaned SQL, database, caller identity and
+    any arguments that change the result. An entry is used until it is
+    older than pydbtools.utils.result_cache_ttl seconds or a table the
+    query references has been updated in the Glue catalog. The least
+    recently used entries are removed once the cache is bigger than
+    pydbtools.utils.result_cache_max_bytes.
+    """
+
+    @functools.wraps(func)
+    def wrapper(sql, database=None, boto3_session=None, **kwargs):
+        if utils.result_cache_dir is None or kwargs.get("chunksize"):
+            return func(sql, database=database, boto3_session=boto3_session, **kwargs)
+
+        table_versions = _get_table_versions(sql, database, boto3_session)
+        if table_versions is None:
+            logger.debug("Query result not cached as its tables are unknown")
+            return func(sql, database=database, boto3_session=boto3_session, **kwargs)
+
+        key = _get_cache_key(sql, database, boto3_session, kwargs)
+        df = _read_cache_entry(key, table_versions, kwargs)
+        if df is not None:
+            logger.debug(f"Query result read from cache entry {key}")
+            return df
+
+        df = func(sql, database=database, boto3_session=boto3_session, **kwargs)
+        if isinstance(df, pd.DataFrame):
+            _write_cache_entry(key, df, table_versions)
+            _evict_cache_entries()
+        return df
+
+    return wrapper
+
+
+def clear_result_cache():
+    """
+    Deletes every entry in the local query result cache.
+    """
+    if utils.result_cache_dir is None:
+        return
+    for path in glob.glob(os.path.join(utils.result_cache_dir, "*.parquet")):
+        _delete_cache_entry(path[: -len(".parquet")])
+
+
+def _get_cache_key(sql: str, database: str, boto3_session, kwargs: dict) -> str:
+    user_id, _ = utils.get_user_id_and_table_dir(boto3_session)
+    key = {
+        "sql": utils.clean_query(sql),
+        "database": database,
+        "user_id": user_id,
+        "region": getattr(boto3_session, "region_name", None),
+        "args": {k: kwargs.get(k) for k in _result_args},
+    }
+    key_json = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(key_json.encode()).hexdigest()
+
+
+def _get_table_versions(
+    sql: str, database: str, boto3_session
+) -> Optional[Dict[str, str]]:
+    """
+    Returns the Glue update time of every table the SQL references,
+    or None if the tables cannot be worked out.
+    """
+    try:
+        tables = sql_metadata.Parser(sql).tables
+    # sql_metadata raises a range of errors for SQL it does not support
+    except Exception:
+        return None
+
+    glue_client = boto3_session.client("glue")
+    versions = {}
+    for table in tables:
+        names = table.replace('"', "").replace("`", "").split(".")
+        if len(names) == 1:
+            names = [database] + names
+        if len(names) != 2 or names[0] is None:
+            return None
+        try:
+            resp = glue_client.get_table(DatabaseName=names[0], Name=names[1])
+        except glue_client.exceptions.EntityNotFoundException:
+            return None
+        updated = resp["Table"].get("UpdateTime", resp["Table"].get("CreateTime"))
+        versions[".".join(names).lower()] = str(updated)
+    return versions
+
+
+def _read_cache_entry(
+    key: str, table_versions: Dict[str, str], kwargs: dict
+) -> Optional[pd.DataFrame]:
+    entry_path = os.path.join(utils.result_cache_dir, key)
+    try:
+        with open(entry_path + ".json") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        time.time() - meta["created"] > utils.result_cache_ttl
+        or meta["table_versions"] != table_versions
+    ):
+        _delete_cache_entry(entry_path)
+        return None
+
+    pyarrow_kwargs = kwargs.get("pyarrow_additional_kwargs") or {}
+    try:
+        df = pq.read_table(entry_path + ".parquet").to_pandas(
+            timestamp_as_object=pyarrow_kwargs.get("timestamp_as_object", False)
+        )
+    except OSError:
+        return None
+
+    # Modification time records when the entry was last used
+    os.utime(entry_path + ".parquet")
+    return df
+
+
+def _write_cache_entry(key: str, df: pd.DataFrame, table_versions: Dict[str, str]):
+    os.makedirs(utils.result_cache_dir, exist_ok=True)
+    entry_path = os.path.join(utils.result_cache_dir, key)
+    meta = {"created": time.time(), "table_versions": table_versions}
+
+    # Write to temporary files first so other processes never
+    # read a partially written entry
+    tmp_suffix = f".{os.getpid()}.tmp"
+    df.to_parquet(entry_path + ".parquet" + tmp_suffix)
+    with open(entry_path + ".json" + tmp_suffix, "w") as f:
+        json.dump(meta, f)
+    os.replace(entry_path + ".parquet" + tmp_suffix, entry_path + ".parquet")
+    os.replace(entry_path + ".json" + tmp_suffix, entry_path + ".json")
+
+
+def _delete_cache_entry(entry_path: str):
+    for ext in [".parquet", ".json"]:
+        try:
+            os.remove(entry_path + ext)
+        except FileNotFoundError:
+            pass
+
+
+def _evict_cache_entries():
+    """
+    Deletes the least recently used entries until the cache
+    is no bigger than pydbtools.utils.result_cache_max_bytes.
+    """
+    entries = []
+    for path in glob.glob(os.path.join(utils.result_cache_dir, "*.parquet")):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path[: -len(".parquet")]))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, entry_path in sorted(entries):
+        if total_bytes <= utils.result_cache_max_bytes:
+            break
+        _delete_cache_entry(entry_path)
+        total_bytes -= size
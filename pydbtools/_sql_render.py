@@ -1,10 +1,30 @@
+import os
+from functools import lru_cache
+from typing import List
+
 from jinja2 import Template
 
 
+@lru_cache(maxsize=128)
+def _read_sql_file(filepath: str, mtime_ns: int, size: int, open_kwargs: tuple) -> str:
+    # The modification time and size are part of the cache key so
+    # a file is read again after it changes
+    with open(filepath, **dict(open_kwargs)) as f:
+        return "".join(f.readlines())
+
+
+@lru_cache(maxsize=128)
+def _compile_template(sql: str) -> Template:
+    # Keyed by the template source, so templates are compiled once
+    # however many times they are rendered
+    return Template(sql)
+
+
 def get_sql_from_file(filepath: str, jinja_args: dict = None, **kwargs) -> str:
     """
     Read in an SQL file and inject arguments with Jinja (if given params).
-    Returns the SQL as a str.
+    Returns the SQL as a str. The file is only read again if it has
+    changed since it was last read.
 
     Args:
         filepath (str): A filepath to your SQL file.
@@ -13,8 +33,22 @@ def get_sql_from_file(filepath: str, jinja_args: dict = None, **kwargs) -> str:
             Otherwise will just return the SQL file as is. Defaults to None.
         kwargs: passed to the open() call.
     """
-    with open(filepath, **kwargs) as f:
-        sql = "".join(f.readlines())
+    try:
+        stat = os.stat(filepath)
+        key = (
+            os.path.abspath(filepath),
+            stat.st_mtime_ns,
+            stat.st_size,
+            tuple(sorted(kwargs.items())),
+        )
+        hash(key)
+    except TypeError:
+        # Paths that are not strings and unhashable open() arguments
+        # are not cached
+        with open(filepath, **kwargs) as f:
+            sql = "".join(f.readlines())
+    else:
+        sql = _read_sql_file(*key)
     if jinja_args:
         sql = render_sql_template(sql, jinja_args)
     return sql
@@ -32,4 +66,20 @@ def render_sql_template(sql: str, jinja_args: dict) -> str:
     Returns:
         str: SQL string that has args rendered into it
     """
-    return Template(sql).render(**jinja_args)
+    return _compile_template(sql).render(**jinja_args)
+
+
+def render_sql_templates(sql: str, jinja_args_list: List[dict]) -> List[str]:
+    """
+    Renders a SQL template once for each set of arguments, for example
+    once per date partition. The template is only compiled once.
+
+    Args:
+        sql (str): SQL templated with Jinja
+        jinja_args_list (List[dict]): Arguments to render the template with
+
+    Returns:
+        List[str]: The rendered SQL for each set of arguments, in order
+    """
+    template = _compile_template(sql)
+    return [template.render(**jinja_args) for jinja_args in jinja_args_list]
@@ -1,18 +1,47 @@
 import awswrangler as wr
+import boto3
 import awswrangler.athena as ath
 import os
-import sqlparse
+import re
 import warnings
 import logging
 import pprint
+import random
 import pandas as pd
-import re
-from typing import Iterator, Optional, List
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterator,
+    Optional,
+    List,
+    Set,
+    Tuple,
+    Union,
+)
 import time
+import datetime
 import inspect
 import functools
+import itertools
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from graphlib import CycleError, TopologicalSorter
 from arrow_pd_parser import reader
-
+from awswrangler._data_types import athena2pyarrow
+import botocore.session
+from botocore.credentials import CredentialProvider, CredentialResolver
+from botocore.exceptions import ClientError
+
+from pydbtools._parquet_dataset import (
+    _SizedParquetWriter,
+    _parse_file_size,
+    _split_partitions,
+)
+from pydbtools._result_cache import cache_results
 from pydbtools.utils import (
     get_user_id_and_table_dir,
     get_database_name_from_userid,
@@ -23,13 +52,30 @@ from pydbtools.utils import (
     replace_temp_database_name_reference,
     _set_region_name,
     s3_path_join,
-    get_table_location,
+    _database_exists,
+    _forget_database,
+    _forget_table,
+    _forget_temp_database,
+    _get_cached_metadata,
+    _get_databases,
+    _get_glue_table,
+    _get_partitions,
+    _query_poll_delays,
+    _record_query_wait,
+    _SqlAnalysis,
+    _analyse_sql,
+    _known_temp_databases,
+    _session_cache_lock,
+    _get_arrow_s3_filesystem,
 )
 
-
 logger = logging.getLogger(__name__)
 
 
+# Arguments used to create the boto3 session in init_athena_params
+_boto_session_defaults = get_default_args(get_boto_session)
+
+
 # Wrapper used to set parameters in the athena wrangler functions
 # before they are called
 def init_athena_params(func=None, *, allow_boto3_session=False):  # noqa: C901
@@ -37,6 +83,12 @@ def init_athena_params(func=None, *, allow_boto3_session=False):  # noqa: C901
     Takes a wrangler athena function and sets the following:
     boto3_session and s3_output_path if exists in function param.
 
+    Functions that take result_reuse_configuration (or **kwargs) also
+    accept result_reuse_max_age, the age in minutes of a previous
+    identical query whose results Athena can return instead of running
+    the query again. Setting it defaults ctas_approach to False, as
+    Athena cannot reuse the results of CTAS queries.
+
     Args:
         func (Callable): An function from wr.athena that requires
         boto3_session. If the func has an s3_output this is also
@@ -51,14 +103,52 @@ def init_athena_params(func=None, *, allow_boto3_session=False):  # noqa: C901
             init_athena_params, allow_boto3_session=allow_boto3_session
         )
 
+    # Inspect the function once when it is wrapped rather than on every call
+    sig = inspect.signature(func)
+    params = sig.parameters
+    takes_s3_output = "s3_output" in params
+    takes_sql = "sql" in params
+    takes_database = "database" in params
+    takes_ctas_approach = "ctas_approach" in params
+    takes_pyarrow_kwargs = "pyarrow_additional_kwargs" in params
+    positional_names = [
+        k
+        for k, v in params.items()
+        if v.kind in (v.POSITIONAL_ONLY, v.POSITIONAL_OR_KEYWORD)
+    ]
+    var_positional = next(
+        (k for k, v in params.items() if v.kind == v.VAR_POSITIONAL), None
+    )
+    var_keyword = next((k for k, v in params.items() if v.kind == v.VAR_KEYWORD), None)
+    # Session args the function does not take itself are only used
+    # by the wrapper
+    wrapper_only_setup_args = [k for k in _boto_session_defaults if k not in params]
+    accepts_result_reuse = (
+        "result_reuse_configuration" in params or var_keyword is not None
+    )
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        setup_kwargs = {k: kwargs.get(k, v) for k, v in _boto_session_defaults.items()}
+        for k in wrapper_only_setup_args:
+            kwargs.pop(k, None)
+        result_reuse_max_age = (
+            kwargs.pop("result_reuse_max_age", None) if accepts_result_reuse else None
+        )
+
         # Get parameters from function and overwrite specific params
-        sig = inspect.signature(func)
         argmap = sig.bind_partial(*args, **kwargs).arguments
+        varargs = argmap.pop(var_positional, ()) if var_positional else ()
+        if var_keyword:
+            argmap.update(argmap.pop(var_keyword, {}))
+
+        if result_reuse_max_age is not None:
+            argmap["result_reuse_configuration"] = _get_result_reuse_configuration(
+                result_reuse_max_age
+            )
 
         # Create a db flag
-        database_flag = "database" in sig.parameters and (
+        database_flag = takes_database and (
             argmap.get("database", "__temp__") in ["__temp__", "__TEMP__"]
         )
 
@@ -66,13 +156,9 @@ def init_athena_params(func=None, *, allow_boto3_session=False):  # noqa: C901
         # and it has been then do not create new boto3 session
         # otherwise do
         if allow_boto3_session and argmap.get("boto3_session"):
-            pass
+            boto3_session = argmap["boto3_session"]
         else:
             # Get the boto3 session
-            setup_defaults = get_default_args(get_boto_session)
-            setup_kwargs = {}
-            for k, v in setup_defaults.items():
-                setup_kwargs[k] = kwargs.pop(k, v)
             boto3_session = get_boto_session(**setup_kwargs)
 
             if argmap.get("boto3_session") is not None:
@@ -85,16 +171,12 @@ def init_athena_params(func=None, *, allow_boto3_session=False):  # noqa: C901
             argmap["boto3_session"] = boto3_session
 
         # Set s3 table path and get temp_db_name
-        if (
-            ("s3_output" in sig.parameters)
-            or ("sql" in sig.parameters)
-            or database_flag
-        ):
+        if takes_s3_output or takes_sql or database_flag:
             user_id, s3_output = get_user_id_and_table_dir(boto3_session)
             temp_db_name = get_database_name_from_userid(user_id)
 
         # Set s3_output to predefined path otherwise skip
-        if "s3_output" in sig.parameters:
+        if takes_s3_output:
             if argmap.get("s3_output") is not None:
                 warn_msg = (
                     "Warning parameter 's3_output' cannot be set. "
@@ -110,12 +192,14 @@ def init_athena_params(func=None, *, allow_boto3_session=False):  # noqa: C901
         # that timestamps are read in correctly to pandas using pyarrow.
         # Therefore forcing the default option to be True in case future
         # versions of wrangler change their default behaviour.
-        if "ctas_approach" in sig.parameters and argmap.get("ctas_approach") is None:
-            argmap["ctas_approach"] = True
+        # The exception is when results are reused as Athena can only
+        # reuse the results of queries run without CTAS.
+        if takes_ctas_approach and argmap.get("ctas_approach") is None:
+            argmap["ctas_approach"] = argmap.get("result_reuse_configuration") is None
 
         # Set database to None or set to keyword temp when not needed
         if database_flag:
-            if "ctas_approach" in sig.parameters and argmap["ctas_approach"]:
+            if takes_ctas_approach and argmap["ctas_approach"]:
                 argmap["database"] = temp_db_name
                 _ = _create_temp_database(temp_db_name, boto3_session=boto3_session)
             elif argmap.get("database", "").lower() == "__temp__":
@@ -129,35 +213,182 @@ def init_athena_params(func=None, *, allow_boto3_session=False):  # noqa: C901
                 argmap["sql"], temp_db_name
             )
 
-        if (
-            "sql" in sig.parameters
-            and "database" in sig.parameters
-            and argmap.get("database") is None
-        ):
+        if takes_sql and takes_database and argmap.get("database") is None:
             argmap["database"] = get_database_name_from_sql(argmap.get("sql", ""))
 
         # Set pyarrow_additional_kwargs
-        if (
-            "pyarrow_additional_kwargs" in argmap
-            and argmap.get("pyarrow_additional_kwargs", None) is None
-        ):
+        if takes_pyarrow_kwargs and argmap.get("pyarrow_additional_kwargs") is None:
             argmap["pyarrow_additional_kwargs"] = {
                 "coerce_int96_timestamp_unit": "ms",
                 "timestamp_as_object": True,
             }
 
-        logger.debug(f"Modifying function {func.__name__}")
-        logger.debug(pprint.pformat(dict(argmap)))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Modifying function {func.__name__}")
+            logger.debug(pprint.pformat(dict(argmap)))
+
+        if varargs:
+            # Arguments before *args have to be passed by position
+            leading = [argmap.pop(k) for k in positional_names if k in argmap]
+            return func(*leading, *varargs, **argmap)
         return func(**argmap)
 
     return wrapper
 
 
+def _get_result_reuse_configuration(max_age: int) -> dict:
+    """
+    Returns the Athena ResultReuseConfiguration to reuse the results
+    of a previous identical query run within max_age minutes.
+    """
+    return {
+        "ResultReuseByAgeConfiguration": {
+            "Enabled": True,
+            "MaxAgeInMinutes": max_age,
+        }
+    }
+
+
+def was_result_reused(result) -> bool:
+    """
+    Checks whether Athena returned the result of a previous
+    identical query rather than running the query again.
+
+    Args:
+        result: A DataFrame returned by read_sql_query or the query
+            execution returned by start_query_execution_and_wait or
+            get_query_execution.
+
+    Returns:
+        True if the result was reused, otherwise False.
+    """
+    if isinstance(result, pd.DataFrame):
+        result = getattr(result, "query_metadata", None) or {}
+    reuse_info = result.get("Statistics", {}).get("ResultReuseInformation", {})
+    return reuse_info.get("ReusedPreviousResult", False)
+
+
+def _read_arrow_results(func):
+    """
+    Adds a return_type argument to an awswrangler read function
+    (read_sql_query or read_sql_table). "pandas" calls the function
+    as normal. "arrow" and "polars" run the query as a CTAS query and
+    read the Parquet files it writes directly into a pyarrow Table or
+    polars DataFrame, without converting to pandas. If chunksize is
+    set an iterator of pyarrow RecordBatches or polars DataFrames is
+    returned instead.
+
+    Must be applied before init_athena_params, so the SQL, database and
+    boto3_session it sees are the ones sent to Athena.
+    """
+    sig = inspect.signature(func)
+    return_type_param = inspect.Parameter(
+        "return_type", inspect.Parameter.KEYWORD_ONLY, default="pandas"
+    )
+
+    @functools.wraps(func)
+    def wrapper(*args, return_type: str = "pandas", **kwargs):
+        if return_type == "pandas":
+            return func(*args, **kwargs)
+        if return_type not in ["arrow", "polars"]:
+            raise ValueError("return_type must be one of 'pandas', 'arrow' or 'polars'")
+        if return_type == "polars":
+            pl = _import_polars()
+
+        argmap = sig.bind_partial(*args, **kwargs).arguments
+        if not argmap.get("ctas_approach", True):
+            raise ValueError(f"return_type='{return_type}' requires ctas_approach")
+        sql = argmap.get("sql")
+        if sql is None:
+            sql = f'SELECT * FROM "{argmap["database"]}"."{argmap["table"]}"'
+        ctas_kwargs = {
+            k: argmap[k] for k in ["workgroup", "params", "paramstyle"] if k in argmap
+        }
+        paths, empty_schema = _run_ctas_query(
+            sql,
+            argmap.get("database"),
+            argmap.get("s3_output"),
+            argmap.get("boto3_session"),
+            **ctas_kwargs,
+        )
+
+        pyarrow_kwargs = argmap.get("pyarrow_additional_kwargs") or {}
+        chunksize = argmap.get("chunksize")
+        if chunksize:
+            batches = _read_parquet_batches(
+                paths,
+                100_000 if chunksize is True else chunksize,
+                argmap.get("boto3_session"),
+                pyarrow_kwargs,
+            )
+            if return_type == "polars":
+                return (pl.from_arrow(batch) for batch in batches)
+            return batches
+
+        if paths:
+            table = pq.read_table(
+                [p.replace("s3://", "", 1) for p in paths],
+                filesystem=_get_arrow_s3_filesystem(argmap.get("boto3_session")),
+                coerce_int96_timestamp_unit=pyarrow_kwargs.get(
+                    "coerce_int96_timestamp_unit"
+                ),
+            )
+        else:
+            table = empty_schema.empty_table()
+        return pl.from_arrow(table) if return_type == "polars" else table
+
+    wrapper.__signature__ = sig.replace(
+        parameters=list(sig.parameters.values()) + [return_type_param]
+    )
+    return wrapper
+
+
+def _import_polars():
+    try:
+        import polars
+    except ImportError:
+        raise ImportError(
+            "polars is needed for return_type='polars'. "
+            "Install it with pip install pydbtools[polars]"
+        )
+    return polars
+
+
+def _cache_glue_metadata(kind: str, func: Callable) -> Callable:
+    """
+    Caches the results of a function that reads metadata about a
+    database or table in the Glue metadata cache (see
+    pydbtools.utils.glue_cache_ttl), keyed by all its arguments.
+    """
+    sig = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        arguments = sig.bind(*args, **kwargs).arguments
+        boto3_session = arguments.pop("boto3_session", None)
+        database = arguments.pop("database", None)
+        table = arguments.pop("table", None)
+        return _get_cached_metadata(
+            kind,
+            boto3_session,
+            database,
+            table,
+            functools.partial(func, *args, **kwargs),
+            repr(sorted(arguments.items())),
+        )
+
+    return wrapper
+
+
 # Override all existing awswrangler.athena functions for pydbtools
-read_sql_query = init_athena_params(ath.read_sql_query)
-read_sql_table = init_athena_params(ath.read_sql_table)
+read_sql_query = init_athena_params(
+    _read_arrow_results(cache_results(ath.read_sql_query))
+)
+read_sql_table = init_athena_params(_read_arrow_results(ath.read_sql_table))
 create_athena_bucket = init_athena_params(ath.create_athena_bucket)
-describe_table = init_athena_params(ath.describe_table)
+describe_table = init_athena_params(
+    _cache_glue_metadata("describe_table", ath.describe_table)
+)
 get_query_columns_types = init_athena_params(ath.get_query_columns_types)
 get_query_execution = init_athena_params(ath.get_query_execution)
 get_work_group = init_athena_params(ath.get_work_group)
@@ -166,36 +397,325 @@ show_create_table = init_athena_params(ath.show_create_table)
 start_query_execution = init_athena_params(ath.start_query_execution)
 stop_query_execution = init_athena_params(ath.stop_query_execution)
 wait_query = init_athena_params(ath.wait_query)
-tables = init_athena_params(wr.catalog.tables)
+tables = init_athena_params(_cache_glue_metadata("tables", wr.catalog.tables))
 create_ctas_table = init_athena_params(ath.create_ctas_table, allow_boto3_session=True)
 
 
 @init_athena_params
-def start_query_execution_and_wait(sql, *args, **kwargs):
+def start_query_execution_and_wait(sql, *args, poll_schedule: dict = None, **kwargs):
     """Calls start_query_execution followed by wait_query.
     *args and **kwargs are passed to start_query_execution
 
     Args:
         sql (str): An SQL string. Which works with __TEMP__ references.
+        poll_schedule (dict, optional): Overrides any of the settings in
+            pydbtools.utils.query_poll_schedule, which controls how often
+            the query is checked while it runs.
     """
 
     # Function wrapper is applied to top of function so we need
     # to call the original unwrapped athena fun to ensure the wrapper fun
     # is not called again
     query_execution_id = ath.start_query_execution(sql, *args, **kwargs)
-    return ath.wait_query(query_execution_id, boto3_session=kwargs.get("boto3_session"))
+    return _wait_query(query_execution_id, kwargs.get("boto3_session"), poll_schedule)
+
+
+def _wait_query(
+    query_execution_id: str,
+    boto3_session,
+    poll_schedule: Optional[dict] = None,
+    check_state: bool = True,
+) -> dict:
+    """
+    Waits for an Athena query to finish like awswrangler's wait_query,
+    checking its state on the schedule in pydbtools.utils.query_poll_schedule
+    (updated with poll_schedule), and records the number of checks and
+    time spent waiting (see get_query_poll_stats). Throttled checks are
+    retried. If check_state is False the query execution is returned
+    even if the query failed.
+    """
+    start = time.monotonic()
+    polls = 0
+    for delay in _query_poll_delays(poll_schedule):
+        response = _call_with_retries(
+            ath.get_query_execution, query_execution_id, boto3_session=boto3_session
+        )
+        polls += 1
+        if response["Status"]["State"] in _query_final_states:
+            break
+        time.sleep(delay)
+
+    wait_seconds = time.monotonic() - start
+    _record_query_wait(polls, wait_seconds)
+    logger.debug(
+        f"Query {query_execution_id} finished after {polls} checks "
+        f"and {wait_seconds:.2f}s"
+    )
+    return _check_query_state(response) if check_state else response
+
+
+_query_final_states = {"SUCCEEDED", "FAILED", "CANCELLED"}
+
+
+def _check_query_state(response: dict) -> dict:
+    """
+    Raises awswrangler's QueryFailed or QueryCancelled if a finished
+    query did not succeed, otherwise returns its query execution.
+    """
+    state = response["Status"]["State"]
+    reason = response["Status"].get("StateChangeReason")
+    if state == "FAILED":
+        raise wr.exceptions.QueryFailed(reason)
+    if state == "CANCELLED":
+        raise wr.exceptions.QueryCancelled(reason)
+    return response
+
+
+def run_queries(
+    sqls: List[str],
+    max_concurrency: int = 5,
+    poll_schedule: dict = None,
+    force_ec2: bool = False,
+    region_name: str = None,
+    **kwargs,
+) -> List[dict]:
+    """
+    Runs independent SQL statements, with up to max_concurrency running
+    in Athena at once, and waits for them all to finish. A statement
+    that fails does not stop the others. Starting a query is retried
+    with backoff if Athena says too many queries are running, but
+    max_concurrency should be kept below the concurrent query quota of
+    the account so that queries are not held back.
+
+    Args:
+        sqls (List[str]): SQL strings. Which work with __TEMP__ references.
+        max_concurrency (int, optional): The most queries to run at once.
+            Defaults to 5.
+        poll_schedule (dict, optional): Overrides any of the settings in
+            pydbtools.utils.query_poll_schedule, which controls how often
+            each query is checked while it runs.
+        force_ec2 (bool, optional): See create_temp_table.
+        region_name (str, optional): See create_temp_table.
+        kwargs: Passed to start_query_execution for every query
+            (for example database or workgroup).
+
+    Returns:
+        A list with a dict for each statement, in the order of sqls,
+        with its "query_execution_id" (None if it could not be
+        started), "state", "statistics" (the Athena query statistics)
+        and "error" (the exception raised, or None if it succeeded).
+
+    Example:
+        results = run_queries(
+            [
+                f"INSERT INTO db.table SELECT * FROM db.source WHERE dt = '{dt}'"
+                for dt in dates
+            ],
+            max_concurrency=10,
+        )
+        failed = [r for r in results if r["error"] is not None]
+    """
+    setup_kwargs = {"force_ec2": force_ec2, "region_name": region_name}
+
+    def run_query(sql):
+        result = {
+            "query_execution_id": None,
+            "state": None,
+            "statistics": None,
+            "error": None,
+        }
+        try:
+            query_execution_id = _call_with_retries(
+                start_query_execution, sql, **setup_kwargs, **kwargs
+            )
+            result["query_execution_id"] = query_execution_id
+            response = _wait_query(
+                query_execution_id,
+                get_boto_session(**setup_kwargs),
+                poll_schedule,
+                check_state=False,
+            )
+            result["state"] = response["Status"]["State"]
+            result["statistics"] = response.get("Statistics")
+            _check_query_state(response)
+        except Exception as e:
+            result["error"] = e
+        return result
+
+    # run_query catches its own errors so there are no failures
+    results, _ = _map_concurrently(
+        run_query, dict(enumerate(sqls)), max_concurrency, "Finished %d of %d queries"
+    )
+    return [results[i] for i in range(len(sqls))]
+
+
+def _split_s3_path(path: str) -> Tuple[str, str]:
+    bucket, _, key = path.replace("s3://", "", 1).partition("/")
+    return bucket, key
+
+
+def _read_manifest(manifest_path: Optional[str], boto3_session) -> List[str]:
+    """
+    Returns the paths of the files written by a query
+    listed in its Athena data manifest.
+    """
+    if manifest_path is None:
+        return []
+    bucket, key = _split_s3_path(manifest_path)
+    s3_client = boto3_session.client("s3")
+    manifest = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+    return [p for p in manifest.decode("utf-8").split("\n") if p]
+
+
+def _run_ctas_query(
+    sql: str, database: Optional[str], s3_output: str, boto3_session, **kwargs
+) -> Tuple[List[str], Optional[pa.Schema]]:
+    """
+    Runs a SELECT query as a CTAS query in the temporary database and
+    returns the paths of the Parquet files it wrote. The table is
+    dropped once the query has finished, the files are left on S3.
+    kwargs are passed to awswrangler's create_ctas_table.
+
+    Returns:
+        The paths of the files and, if the query returned no rows (so
+        wrote no files), the schema of the results taken from the CTAS
+        table's columns in the Glue catalog, otherwise None.
+    """
+    ctas = _start_ctas_query(
+        sql, database, s3_output, boto3_session, wait=True, **kwargs
+    )
+    try:
+        paths = _read_manifest(
+            ctas["ctas_query_metadata"].manifest_location, boto3_session
+        )
+        if paths:
+            return paths, None
+        columns_types = wr.catalog.get_table_types(
+            database=ctas["ctas_database"],
+            table=ctas["ctas_table"],
+            boto3_session=boto3_session,
+        )
+        return paths, pa.schema(
+            [(name, athena2pyarrow(type_)) for name, type_ in columns_types.items()]
+        )
+    finally:
+        _drop_ctas_table(ctas, boto3_session)
+
+
+def _start_ctas_query(
+    sql: str,
+    database: Optional[str],
+    s3_output: str,
+    boto3_session,
+    wait: bool = False,
+    **kwargs,
+) -> dict:
+    """
+    Starts a CTAS query writing Parquet files for a SELECT query into
+    the temporary database. Returns the dict returned by awswrangler's
+    create_ctas_table, which kwargs are passed to.
+    """
+    user_id, _ = get_user_id_and_table_dir(boto3_session)
+    temp_db_name = get_database_name_from_userid(user_id)
+    _create_temp_database(temp_db_name, boto3_session=boto3_session)
+
+    return ath.create_ctas_table(
+        sql=sql,
+        database=database,
+        ctas_database=temp_db_name,
+        s3_output=s3_output,
+        storage_format="PARQUET",
+        write_compression="SNAPPY",
+        wait=wait,
+        boto3_session=boto3_session,
+        **kwargs,
+    )
+
+
+def _drop_ctas_table(ctas: dict, boto3_session) -> None:
+    """
+    Drops the table created by _start_ctas_query, leaving its files on S3.
+    """
+    wr.catalog.delete_table_if_exists(
+        database=ctas["ctas_database"],
+        table=ctas["ctas_table"],
+        boto3_session=boto3_session,
+    )
+
+
+def _read_parquet_batches(
+    paths: List[str],
+    batch_size: int,
+    boto3_session,
+    pyarrow_additional_kwargs: Optional[dict] = None,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Reads Parquet files on S3 one record batch at a time so only
+    a single batch is held in memory at once.
+    """
+    pyarrow_additional_kwargs = pyarrow_additional_kwargs or {}
+    s3_fs = _get_arrow_s3_filesystem(boto3_session)
+    for path in paths:
+        with s3_fs.open_input_file(path.replace("s3://", "", 1)) as f:
+            parquet_file = pq.ParquetFile(
+                f,
+                coerce_int96_timestamp_unit=pyarrow_additional_kwargs.get(
+                    "coerce_int96_timestamp_unit"
+                ),
+            )
+            yield from parquet_file.iter_batches(batch_size=batch_size)
+
+
+@init_athena_params
+def read_sql_query_batches(
+    sql: str,
+    database: str = None,
+    batch_size: int = 100_000,
+    s3_output: str = None,
+    boto3_session=None,
+    pyarrow_additional_kwargs: dict = None,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Runs a SELECT query and streams the result as pyarrow record
+    batches read directly from the Parquet files the query writes.
+    Only one batch is held in memory at a time, so this can be used
+    for results too large to read in one go.
+
+    To stream pandas DataFrames instead use read_sql_query with
+    chunksize set to the number of rows in each DataFrame.
+
+    Args:
+        sql (str): An SQL string. Which works with __TEMP__ references.
+        database (str, optional): The database the query is run in.
+            Defaults to the first database referenced in the SQL.
+        batch_size (int, optional): The maximum number of rows in
+            each batch. Defaults to 100,000.
+        pyarrow_additional_kwargs (dict, optional): Only
+            coerce_int96_timestamp_unit is used. Defaults to the
+            pydbtools default of "ms".
+
+    Returns:
+        An iterator of pyarrow RecordBatches.
+
+    Example:
+        for batch in read_sql_query_batches("SELECT * FROM db.table"):
+            process(batch)
+    """
+    paths, _ = _run_ctas_query(sql, database, s3_output, boto3_session)
+    return _read_parquet_batches(
+        paths, batch_size, boto3_session, pyarrow_additional_kwargs
+    )
 
 
 def check_sql(sql: str):
     """
     Validates sql to confirm it is a select statement
     """
-    parsed = sqlparse.parse(clean_query(sql))
-    i = 0
-    for p in parsed:
-        if p.get_type() != "SELECT" or i > 0:
-            raise ValueError("The sql statement must be a single select query")
-        i += 1
+    statements = _analyse_sql(clean_query(sql)).statements
+    if len(statements) > 1 or any(
+        statement.statement_type != "SELECT" for statement in statements
+    ):
+        raise ValueError("The sql statement must be a single select query")
 
 
 # This is not necessary atm but incase future changes are made
@@ -227,6 +747,9 @@ def _create_temp_database(
 ):
     region_name = _set_region_name(region_name)
 
+    if boto3_session is None:
+        boto3_session = get_boto_session(force_ec2=force_ec2, region_name=region_name)
+
     user_id, s3_output = get_user_id_and_table_dir(
         boto3_session=boto3_session,
         force_ec2=force_ec2,
@@ -236,15 +759,25 @@ def _create_temp_database(
     if temp_db_name is None or temp_db_name.lower().strip() == "__temp__":
         temp_db_name = get_database_name_from_userid(user_id)
 
-    create_db_query = f"CREATE DATABASE IF NOT EXISTS {temp_db_name}"
+    # Skip the check entirely once the database is known to exist
+    # and use Glue rather than an Athena query to check otherwise
+    known_db_key = (user_id, boto3_session.region_name, temp_db_name)
+    if known_db_key in _known_temp_databases:
+        return None
 
-    q_e_id = ath.start_query_execution(
-        create_db_query,
-        s3_output=s3_output,
-        boto3_session=boto3_session,
-    )
+    if not _database_exists(temp_db_name, boto3_session=boto3_session):
+        create_db_query = f"CREATE DATABASE IF NOT EXISTS {temp_db_name}"
+
+        q_e_id = ath.start_query_execution(
+            create_db_query,
+            s3_output=s3_output,
+            boto3_session=boto3_session,
+        )
+        _wait_query(q_e_id, boto3_session)
+        _forget_database(temp_db_name)
 
-    return ath.wait_query(q_e_id, boto3_session=boto3_session)
+    with _session_cache_lock:
+        _known_temp_databases.add(known_db_key)
 
 
 @init_athena_params
@@ -254,6 +787,7 @@ def create_temp_table(
     boto3_session=None,
     force_ec2: bool = False,
     region_name: str = None,
+    poll_schedule: dict = None,
 ):
     """
     Create a table inside the temporary database from create table
@@ -278,24 +812,191 @@ def create_temp_table(
             Name of the AWS region you want to run queries on. Defaults to
             pydbtools.utils.aws_default_region (which if left unset is
             "eu-west-1").
+
+        poll_schedule (dict, optional):
+            Overrides any of the settings in
+            pydbtools.utils.query_poll_schedule, which controls how often
+            the query is checked while it runs.
     """
     region_name = _set_region_name(region_name)
+    q_e_id, temp_db_name = _start_temp_table_query(sql, table_name, boto3_session)
+
+    try:
+        _wait_query(q_e_id, boto3_session, poll_schedule)
+    finally:
+        _forget_table(temp_db_name, table_name)
+
+
+@init_athena_params
+def create_temp_tables(
+    tables: Dict[str, str],
+    max_concurrency: int = 10,
+    boto3_session=None,
+    force_ec2: bool = False,
+    region_name: str = None,
+    poll_schedule: dict = None,
+):
+    """
+    Creates a number of tables inside the temporary database at once.
+    The temporary database is set up once, then the tables are cleared
+    out and created concurrently, with up to max_concurrency CTAS
+    queries running at a time. A table that reads another table in
+    tables (through __temp__) is only created once the table it reads
+    has been, whatever order they are given in. Returns once every
+    table has been created.
+
+    If a table fails to be created no more are started, and the error
+    is raised once the queries already running have finished.
+
+    Args:
+        tables (Dict[str, str]): The SQL to create each table from,
+            keyed by table name. Each should start with a WITH or
+            SELECT clause.
+        max_concurrency (int, optional): The most tables to create at
+            once. Defaults to 10.
+        force_ec2 (bool, optional): See create_temp_table.
+        region_name (str, optional): See create_temp_table.
+        poll_schedule (dict, optional): See create_temp_table.
+
+    Raises:
+        ValueError: If the tables read each other in a cycle.
+
+    Example:
+        create_temp_tables(
+            {
+                "people": "SELECT * FROM db.people WHERE year = 2021",
+                "orders": "SELECT * FROM db.orders WHERE year = 2021",
+                "joined": (
+                    "SELECT * FROM __temp__.people "
+                    "JOIN __temp__.orders USING (person_id)"
+                ),
+            }
+        )
+    """
+    for sql in tables.values():
+        check_sql(sql)
+    if not tables:
+        return
+    order, dependencies = _order_temp_tables(tables)
+
+    temp_db_name, db_path = _prepare_temp_database(boto3_session)
+    get_session = _thread_session_factory(boto3_session)
+
+    def create(table_name, sql):
+        session = get_session()
+        sql = replace_temp_database_name_reference(sql, temp_db_name)
+        q_e_id = _start_temp_table_ctas(sql, table_name, temp_db_name, db_path, session)
+        try:
+            _wait_query(q_e_id, session, poll_schedule)
+        finally:
+            _forget_table(temp_db_name, table_name)
+
+    tasks = [functools.partial(create, name, tables[name]) for name in order]
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        runner = _DependentTaskRunner(pool, tasks, dependencies)
+        try:
+            for future in runner.futures:
+                future.result()
+        finally:
+            # Stop anything not yet started if a table fails
+            runner.cancel()
+
+
+def _order_temp_tables(tables: Dict[str, str]) -> Tuple[List[str], List[Set[int]]]:
+    """
+    Sorts the tables passed to create_temp_tables so each comes after
+    the tables in it that it reads through __temp__.
+
+    Args:
+        tables (Dict[str, str]): The SQL for each table, keyed by name.
+
+    Returns:
+        The table names in the order to create them and, for each, the
+        set of indices of the tables it has to wait for.
+
+    Raises:
+        ValueError: If the tables read each other in a cycle.
+    """
+    names = {name.lower(): name for name in tables}
+    graph = {}
+    for name, sql in tables.items():
+        reads = _get_sql_tables(sql)
+        if reads is None:
+            # Fall back to looking for the references in the text
+            reads = {
+                f"__temp__.{other}"
+                for other in names
+                if re.search(
+                    rf"\b__temp__\s*\.\s*\"?{re.escape(other)}\b",
+                    sql,
+                    flags=re.IGNORECASE,
+                )
+            }
+        graph[name] = {
+            names[table.split(".", 1)[1]]
+            for table in reads
+            if table.startswith("__temp__.") and table.split(".", 1)[1] in names
+        }
+
+    try:
+        order = list(TopologicalSorter(graph).static_order())
+    except CycleError as e:
+        raise ValueError(
+            "The temp tables read each other in a cycle: " + " -> ".join(e.args[1])
+        ) from None
+    position = {name: i for i, name in enumerate(order)}
+    return order, [{position[table] for table in graph[name]} for name in order]
+
+
+def _start_temp_table_query(
+    sql: str, table_name: str, boto3_session
+) -> Tuple[str, str]:
+    """
+    Clears out a temp table and starts the CTAS query that recreates it
+    from sql (which must already have had __temp__ references replaced).
+
+    Returns:
+        The query execution id and the name of the temporary database.
+    """
     check_sql(sql)
+    temp_db_name, db_path = _prepare_temp_database(boto3_session)
+    q_e_id = _start_temp_table_ctas(
+        sql, table_name, temp_db_name, db_path, boto3_session
+    )
+    return q_e_id, temp_db_name
+
+
+def _prepare_temp_database(boto3_session) -> Tuple[str, str]:
+    """
+    Creates the temporary database if needed.
 
-    # Create named stuff
+    Returns:
+        The name of the temporary database and the S3 path its
+        tables are written under.
+    """
     user_id, out_path = get_user_id_and_table_dir(boto3_session=boto3_session)
     db_path = os.path.join(out_path, "__athena_temp_db__/")
+    temp_db_name = get_database_name_from_userid(user_id)
+
+    _ = create_temp_database(temp_db_name, boto3_session=boto3_session)
+    return temp_db_name, db_path
+
+
+def _start_temp_table_ctas(
+    sql: str, table_name: str, temp_db_name: str, db_path: str, boto3_session
+) -> str:
+    """
+    Deletes a temp table if it exists and starts the CTAS query that
+    recreates it. Returns the query execution id.
+    """
     # Include timestamp in path to avoid permissions problems with
     # previous sessions
     ts = str(time.time()).replace(".", "")
     table_path = os.path.join(db_path, ts, table_name)
-    temp_db_name = get_database_name_from_userid(user_id)
-
-    _ = create_temp_database(temp_db_name, boto3_session=boto3_session)
 
     # Clear out table every time, making sure other tables aren't being
     # cleared out
-    delete_temp_table(table_name, boto3_session=boto3_session)
+    _delete_temp_table(temp_db_name, table_name, boto3_session)
 
     ctas_query = f"""
     CREATE TABLE {temp_db_name}.{table_name}
@@ -307,9 +1008,7 @@ def create_temp_table(
     as {sql}
     """
 
-    q_e_id = ath.start_query_execution(ctas_query, boto3_session=boto3_session)
-
-    ath.wait_query(q_e_id, boto3_session=boto3_session)
+    return ath.start_query_execution(ctas_query, boto3_session=boto3_session)
 
 
 def create_table(
@@ -331,16 +1030,36 @@ def create_table(
         partition_cols (List[str]): partition columns (optional)
         boto3_session: optional boto3 session
     """
-    return ath.create_ctas_table(
-        sql=sql,
-        database=database,
-        ctas_database=database,
-        ctas_table=table,
-        s3_output=s3_path_join(location, table + ".parquet"),
-        partitioning_info=partition_cols,
-        wait=True,
-        boto3_session=boto3_session,
-    )
+    try:
+        return ath.create_ctas_table(
+            sql=sql,
+            database=database,
+            ctas_database=database,
+            ctas_table=table,
+            s3_output=s3_path_join(location, table + ".parquet"),
+            partitioning_info=partition_cols,
+            wait=True,
+            boto3_session=boto3_session,
+        )
+    finally:
+        _forget_table(database, table)
+
+
+def _parse_temp_table_sql(sql: str) -> Optional[Tuple[str, str]]:
+    """
+    Parses SQL of the format
+    CREATE TEMP TABLE tablename AS (...)
+
+    Args:
+        sql (str):
+            An SQL query.
+
+    Returns:
+        A tuple of the table name and the SQL the table is
+        created from, or None if the SQL does not create a
+        temporary table.
+    """
+    return _analyse_sql(sql).temp_table
 
 
 def _create_temp_table_in_sql(sql: str) -> bool:
@@ -358,26 +1077,153 @@ def _create_temp_table_in_sql(sql: str) -> bool:
         be processed (False).
     """
 
-    sql = clean_query(sql, fmt_opts={"strip_comments": True})
-    m = re.fullmatch(
-        r"create\s+temp\s+table\s+(\S+)\s+as\s+(.*)", sql, flags=re.IGNORECASE
-    )
-    if m:
-        table_name = m.group(1)
-        table_sql = m.group(2)
-
-        # Remove parentheses from the SQL
-        m = re.fullmatch(r"\((.*)\)", table_sql)
-        if m:
-            table_sql = m.group(1)
-
+    temp_table = _parse_temp_table_sql(sql)
+    if temp_table:
+        table_name, table_sql = temp_table
         create_temp_table(table_sql, table_name)
         return True
     else:
         return False
 
 
-def read_sql_queries(sql: str) -> Optional[pd.DataFrame]:
+def _get_sql_tables(sql: str) -> Optional[FrozenSet[str]]:
+    """
+    Returns the lower cased tables referenced in an SQL query,
+    or None if they cannot be worked out.
+    """
+    return _analyse_sql(sql).tables
+
+
+def _get_statement_dependencies(
+    queries: List[_SqlAnalysis],
+) -> List[Set[int]]:
+    """
+    Works out which earlier statements in a script each statement
+    has to wait for before it can be run.
+
+    A temp table creation or SELECT statement depends on an earlier
+    one if it reads a table the earlier one creates or creates a table
+    the earlier one reads or creates. Any other statement, or one whose
+    tables cannot be parsed, waits for everything before it and
+    everything after it waits for it.
+
+    Args:
+        queries (List[_SqlAnalysis]): The statements
+
+    Returns:
+        A list with the set of indices each statement depends on.
+    """
+    # (tables read, tables created) per statement or None if it must
+    # be run on its own
+    table_refs = []
+    for query in queries:
+        statement = _analyse_sql(str(query))
+        temp_table = statement.temp_table
+        if temp_table:
+            table_name, table_sql = temp_table
+            reads = _get_sql_tables(table_sql)
+            writes = {f"__temp__.{table_name.lower()}"}
+        elif statement.statement_type == "SELECT":
+            reads = statement.tables
+            writes = set()
+        else:
+            reads = None
+        table_refs.append(None if reads is None else (reads, writes))
+
+    dependencies = []
+    for j, refs_j in enumerate(table_refs):
+        deps = set()
+        for i, refs_i in enumerate(table_refs[:j]):
+            if (
+                refs_j is None
+                or refs_i is None
+                or refs_i[1] & (refs_j[0] | refs_j[1])
+                or refs_i[0] & refs_j[1]
+            ):
+                deps.add(i)
+        dependencies.append(deps)
+    return dependencies
+
+
+class _DependentTaskRunner:
+    """
+    Runs tasks in a thread pool, starting each one only once the tasks
+    it depends on have finished. If a task fails, the tasks that depend
+    on it are not run and their futures raise the same exception.
+
+    Args:
+        pool (ThreadPoolExecutor): The pool to run the tasks in
+        tasks (List[Callable]): Functions that take no arguments
+        dependencies (List[Set[int]]): The indices of the tasks
+            each task depends on. Tasks may only depend on tasks
+            earlier in the list.
+
+    Attributes:
+        futures (List[Future]): A future for each task in the order given
+    """
+
+    def __init__(
+        self,
+        pool: ThreadPoolExecutor,
+        tasks: List[Callable],
+        dependencies: List[Set[int]],
+    ):
+        self.futures = [Future() for _ in tasks]
+        self._pool = pool
+        self._tasks = tasks
+        self._waiting_on = [set(deps) for deps in dependencies]
+        self._dependents = [[] for _ in tasks]
+        for j, deps in enumerate(dependencies):
+            for i in deps:
+                self._dependents[i].append(j)
+        self._lock = threading.Lock()
+
+        with self._lock:
+            for i, deps in enumerate(self._waiting_on):
+                if not deps:
+                    self._start(i)
+
+    def cancel(self):
+        """Cancels every task that has not yet started."""
+        with self._lock:
+            for future in self.futures:
+                future.cancel()
+
+    def _start(self, i: int):
+        # Called with the lock held so tasks cannot be
+        # started and cancelled at the same time
+        if self.futures[i].set_running_or_notify_cancel():
+            self._pool.submit(self._run, i)
+
+    def _run(self, i: int):
+        try:
+            self.futures[i].set_result(self._tasks[i]())
+        except Exception as e:
+            self.futures[i].set_exception(e)
+            with self._lock:
+                self._fail_dependents(i, e)
+            return
+
+        with self._lock:
+            for j in self._dependents[i]:
+                self._waiting_on[j].discard(i)
+                if not self._waiting_on[j] and not self.futures[j].done():
+                    self._start(j)
+
+    def _fail_dependents(self, i: int, e: Exception):
+        for j in self._dependents[i]:
+            future = self.futures[j]
+            if not future.done() and future.set_running_or_notify_cancel():
+                future.set_exception(e)
+                self._fail_dependents(j, e)
+
+
+def read_sql_queries(
+    sql: str,
+    max_concurrency: Optional[int] = None,
+    result_reuse_max_age: Optional[int] = None,
+    return_type: str = "pandas",
+) -> Optional[pd.DataFrame]:
     """
     Reads a number of SQL statements and returns the result of
     the last select statement as a dataframe.
@@ -387,6 +1233,15 @@ def read_sql_queries(sql: str) -> Optional[pd.DataFrame]:
 
     Args:
         sql (str): SQL commands
+        max_concurrency (int, optional): If set, statements that do
+            not depend on each other are run concurrently, with at most
+            this many running at once. See read_sql_queries_gen.
+            Defaults to None (statements run one after another).
+        result_reuse_max_age (int, optional): If set, select statements
+            can return the results of an identical query run in Athena
+            within this many minutes. See read_sql_queries_gen.
+        return_type (str, optional): "pandas" (default), "arrow" or
+            "polars". See read_sql_query.
 
     Returns:
         An iterator of Pandas DataFrames.
@@ -411,12 +1266,23 @@ def read_sql_queries(sql: str) -> Optional[pd.DataFrame]:
     """
 
     df = None
-    for df in read_sql_queries_gen(sql):
+    for df in read_sql_queries_gen(
+        sql,
+        max_concurrency=max_concurrency,
+        result_reuse_max_age=result_reuse_max_age,
+        return_type=return_type,
+    ):
         pass
     return df
 
 
-def read_sql_queries_gen(sql: str) -> Iterator[pd.DataFrame]:
+def read_sql_queries_gen(
+    sql: str,
+    max_concurrency: Optional[int] = None,
+    result_reuse_max_age: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    return_type: str = "pandas",
+) -> Iterator[pd.DataFrame]:
     """
     Reads a number of SQL statements and returns the result of
     any select statements as a dataframe generator.
@@ -426,6 +1292,28 @@ def read_sql_queries_gen(sql: str) -> Iterator[pd.DataFrame]:
 
     Args:
         sql (str): SQL commands
+        max_concurrency (int, optional): If set, the tables each
+            statement references are used to work out which statements
+            depend on each other. Temp table creations and select
+            statements that are independent are then run concurrently,
+            with at most max_concurrency running at once. Any other
+            statement runs on its own after the statements before it.
+            Results are still yielded in the order of the script and if
+            a statement fails the statements that depend on it are not
+            run. Defaults to None (statements run one after another).
+        result_reuse_max_age (int, optional): If set, select statements
+            can return the results of an identical query run in Athena
+            within this many minutes instead of running again. These
+            queries are run without CTAS. Use was_result_reused on a
+            DataFrame to check if its result was reused. Defaults to
+            None (results are not reused).
+        chunksize (int, optional): If set, each select statement yields
+            an iterator of DataFrames with at most this many rows rather
+            than a single DataFrame, so large results are never held in
+            memory at once. Defaults to None.
+        return_type (str, optional): "pandas" (default), "arrow" or
+            "polars". The type each select statement's result is
+            returned as. See read_sql_query.
 
     Returns:
         An iterator of Pandas DataFrames.
@@ -454,13 +1342,65 @@ def read_sql_queries_gen(sql: str) -> Iterator[pd.DataFrame]:
         df2 = next(df_iter)
     """
 
-    for query in sqlparse.parse(sql):
+    if max_concurrency is not None:
+        yield from _read_sql_queries_concurrently(
+            sql, max_concurrency, result_reuse_max_age, chunksize, return_type
+        )
+        return
+
+    for query in _analyse_sql(sql).statements:
         if not _create_temp_table_in_sql(str(query)):
-            if query.get_type() == "SELECT":
-                yield read_sql_query(str(query))
+            if query.statement_type == "SELECT":
+                yield read_sql_query(
+                    str(query),
+                    result_reuse_max_age=result_reuse_max_age,
+                    chunksize=chunksize,
+                    return_type=return_type,
+                )
+            else:
+                start_query_execution_and_wait(str(query))
+
+
+def _read_sql_queries_concurrently(
+    sql: str,
+    max_concurrency: int,
+    result_reuse_max_age: Optional[int],
+    chunksize: Optional[int],
+    return_type: str,
+) -> Iterator[pd.DataFrame]:
+    """
+    Runs the statements in an SQL script concurrently where they
+    do not depend on each other. See read_sql_queries_gen.
+    """
+
+    def run_query(query):
+        if not _create_temp_table_in_sql(str(query)):
+            if query.statement_type == "SELECT":
+                return read_sql_query(
+                    str(query),
+                    result_reuse_max_age=result_reuse_max_age,
+                    chunksize=chunksize,
+                    return_type=return_type,
+                )
             else:
                 start_query_execution_and_wait(str(query))
 
+    queries = list(_analyse_sql(sql).statements)
+    tasks = [functools.partial(run_query, query) for query in queries]
+    dependencies = _get_statement_dependencies(queries)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        runner = _DependentTaskRunner(pool, tasks, dependencies)
+        try:
+            for future in runner.futures:
+                result = future.result()
+                if result is not None:
+                    yield result
+        finally:
+            # Stop anything not yet started if the caller stops
+            # iterating or a statement fails
+            runner.cancel()
+
 
 @init_athena_params(allow_boto3_session=True)
 def delete_table_and_data(table: str, database: str, boto3_session=None):
@@ -476,18 +1416,19 @@ def delete_table_and_data(table: str, database: str, boto3_session=None):
         does not exist
     """
 
-    if table in list(tables(database=database, limit=None)["Table"]):
-        path = get_table_location(
-            database=database, table=table, boto3_session=boto3_session
-        )
-        wr.s3.delete_objects(path, boto3_session=boto3_session)
-        wr.catalog.delete_table_if_exists(
-            database=database, table=table, boto3_session=boto3_session
-        )
-        return True
-    else:
+    glue_table = _get_glue_table(database, table, boto3_session, refresh=True)
+    if glue_table is None:
         return False
 
+    path = _get_glue_table_location(glue_table)
+    if path:
+        wr.s3.delete_objects(path, boto3_session=boto3_session)
+    wr.catalog.delete_table_if_exists(
+        database=database, table=table, boto3_session=boto3_session
+    )
+    _forget_table(database, table)
+    return True
+
 
 @init_athena_params(allow_boto3_session=True)
 def delete_temp_table(table: str, boto3_session=None):
@@ -505,58 +1446,240 @@ def delete_temp_table(table: str, boto3_session=None):
     user_id, table_dir = get_user_id_and_table_dir(boto3_session=boto3_session)
     database = get_database_name_from_userid(user_id)
     _create_temp_database(database, boto3_session=boto3_session)
+    return _delete_temp_table(database, table, boto3_session)
 
-    if table in list(tables(database=database, limit=None)["Table"]):
-        path = get_table_location(
-            database=database, table=table, boto3_session=boto3_session
-        )
 
-        # Use try in case table was set up in previous session
-        try:
+def _delete_temp_table(database: str, table: str, boto3_session) -> bool:
+    """
+    Deletes a table in the temporary database and its data.
+    """
+    glue_table = _get_glue_table(database, table, boto3_session, refresh=True)
+    if glue_table is None:
+        return False
+
+    path = _get_glue_table_location(glue_table)
+    # Use try in case table was set up in previous session
+    try:
+        if path:
             wr.s3.delete_objects(path, boto3_session=boto3_session)
-        except wr.exceptions.ServiceApiError:
-            pass
+    except wr.exceptions.ServiceApiError:
+        pass
 
-        wr.catalog.delete_table_if_exists(
-            database=database, table=table, boto3_session=boto3_session
-        )
-        return True
-    else:
-        return False
+    wr.catalog.delete_table_if_exists(
+        database=database, table=table, boto3_session=boto3_session
+    )
+    _forget_table(database, table)
+    return True
+
+
+def _get_glue_table_location(glue_table: dict) -> Optional[str]:
+    """
+    Returns the S3 location of a Glue table ending in a slash,
+    or None if it has no location (e.g. a view).
+    """
+    location = glue_table.get("StorageDescriptor", {}).get("Location")
+    if not location:
+        return None
+    return location if location.endswith("/") else location + "/"
+
+
+class DeletionError(Exception):
+    """
+    Raised when some of the tables or partitions being deleted
+    could not be deleted.
+
+    Attributes:
+        failures (dict): The exception raised for each table
+            name or partition location that failed.
+    """
+
+    def __init__(self, message: str, failures: dict):
+        super().__init__(message)
+        self.failures = failures
+
+
+# Error codes AWS uses when requests are being throttled
+_throttling_error_codes = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "Throttling",
+    "RequestLimitExceeded",
+}
+
+# Seconds to wait before the first retry of a throttled request,
+# doubling with each attempt
+_retry_base_delay = 0.5
+_retry_max_attempts = 6
+
+
+def _call_with_retries(func: Callable, *args, **kwargs):
+    """
+    Calls an AWS API function, retrying with exponential backoff
+    and jitter if the request is throttled.
+    """
+    for attempt in range(_retry_max_attempts):
+        try:
+            return func(*args, **kwargs)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in _throttling_error_codes:
+                raise
+            if attempt == _retry_max_attempts - 1:
+                raise
+            time.sleep(_retry_base_delay * 2**attempt * random.uniform(0.5, 1.5))
+
+
+def _batches(items: list, size: int) -> Iterator[list]:
+    """
+    Splits a list into lists of at most size items.
+    """
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
 
 
 @init_athena_params(allow_boto3_session=True)
-def delete_database_and_data(database: str, boto3_session=None):
+def delete_database_and_data(
+    database: str, boto3_session=None, max_concurrency: int = 10
+):
     """
     Deletes both an Athena database and the underlying data on S3.
 
+    The tables are listed once and their data deleted concurrently, then
+    the tables are removed from the Glue catalog in batches. Progress is
+    logged at INFO level. A table that fails to delete does not stop the
+    others, but the database is kept and a DeletionError is raised
+    listing every failure.
+
     Args:
         database (str): The database name to drop.
+        boto3_session: optional boto3 session
+        max_concurrency (int): The number of tables whose data is
+            deleted at the same time.
 
     Returns:
         True if database exists and is deleted, False if database
         does not exist
     """
-    if database not in (db["Name"] for db in wr.catalog.get_databases()):
+    if not _database_exists(database, boto3_session, refresh=True):
         return False
-    for table in wr.catalog.get_tables(database=database, boto3_session=boto3_session):
-        delete_table_and_data(table["Name"], database, boto3_session=boto3_session)
+
+    glue_tables = list(
+        wr.catalog.get_tables(database=database, boto3_session=boto3_session)
+    )
+    failures = _delete_tables_data(
+        glue_tables, database, max_concurrency, boto3_session
+    )
+
+    glue = boto3_session.client("glue")
+    deleted = [t["Name"] for t in glue_tables if t["Name"] not in failures]
+    # BatchDeleteTable takes at most 100 tables
+    for names in _batches(deleted, 100):
+        response = _call_with_retries(
+            glue.batch_delete_table, DatabaseName=database, TablesToDelete=names
+        )
+        for error in response.get("Errors", []):
+            failures[error["TableName"]] = RuntimeError(
+                error["ErrorDetail"]["ErrorMessage"]
+            )
+
+    if failures:
+        _forget_table(database)
+        raise DeletionError(
+            f"Failed to delete {len(failures)} of {len(glue_tables)} tables "
+            f"from {database}: {', '.join(sorted(failures))}",
+            failures,
+        )
+
     wr.catalog.delete_database(database, boto3_session=boto3_session)
+    _forget_database(database)
+    _forget_temp_database(database)
     return True
 
 
+def _delete_tables_data(
+    glue_tables: List[dict], database: str, max_concurrency: int, boto3_session
+) -> dict:
+    """
+    Deletes the S3 data of Glue tables concurrently.
+
+    Returns:
+        The exception raised for each table that failed.
+    """
+    get_session = _thread_session_factory(boto3_session)
+
+    def delete_data(glue_table):
+        location = _get_glue_table_location(glue_table)
+        # Views have no data
+        if location:
+            wr.s3.delete_objects(location, boto3_session=get_session())
+
+    _, failures = _map_concurrently(
+        delete_data,
+        {t["Name"]: t for t in glue_tables},
+        max_concurrency,
+        f"Deleted data for %d of %d tables in {database}",
+    )
+    return failures
+
+
+def _map_concurrently(
+    func: Callable, items: dict, max_concurrency: int, progress_message: str
+) -> Tuple[dict, dict]:
+    """
+    Calls func on each value of items from a thread pool, logging
+    progress_message (formatted with the number done and the total)
+    as each call finishes. A failed call does not stop the others.
+
+    Returns:
+        The result for each key of items that succeeded and the
+        exception raised for each key that failed.
+    """
+    results = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        futures = {pool.submit(func, item): key for key, item in items.items()}
+        for n, future in enumerate(as_completed(futures), 1):
+            if future.exception() is not None:
+                failures[futures[future]] = future.exception()
+            else:
+                results[futures[future]] = future.result()
+            logger.info(progress_message, n, len(items))
+    return results, failures
+
+
 @init_athena_params(allow_boto3_session=True)
 def delete_partitions_and_data(
-    database: str, table: str, expression: str, boto3_session=None
-):
+    database: str,
+    table: str,
+    expression: str,
+    boto3_session=None,
+    max_concurrency: int = 10,
+    dry_run: bool = False,
+) -> Optional[pd.DataFrame]:
     """
     Deletes partitions and the underlying data on S3 from an Athena
     database table matching an expression.
 
+    The data of up to max_concurrency partitions is deleted at a time,
+    then the partitions are removed from the Glue catalog in batches.
+    Progress is logged at INFO level. A partition that fails to delete
+    does not stop the others, but a DeletionError is raised at the end
+    listing every failure. Partitions whose data could not be deleted
+    are kept in the catalog.
+
     Args:
         database (str): The database name.
         table (str): The table name.
         expression (str): The expression to match.
+        boto3_session: optional boto3 session
+        max_concurrency (int): The number of partitions whose data is
+            deleted (or measured for a dry run) at the same time.
+        dry_run (bool): If True nothing is deleted and the partitions
+            that would be are returned instead.
+
+    Returns:
+        None, or for a dry run a DataFrame with the location, values,
+        number of objects and total bytes of each matched partition.
 
     Please see
     https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/glue.html#Glue.Client.get_partitions # noqa
@@ -567,43 +1690,525 @@ def delete_partitions_and_data(
     delete_partitions_and_data("my_database", "my_table", "year = 2020 and month = 5")
     """
 
-    matched_partitions = wr.catalog.get_partitions(
-        database, table, expression=expression, boto3_session=boto3_session
+    matched_partitions = _get_partitions(
+        database, table, expression, boto3_session, refresh=True
     )
+    if dry_run:
+        return _describe_partitions_data(
+            matched_partitions, max_concurrency, boto3_session
+        )
+
     # Delete data at partition locations
-    for location in matched_partitions:
-        wr.s3.delete_objects(location, boto3_session=boto3_session)
-    # Delete partitions
-    wr.catalog.delete_partitions(
-        table,
-        database,
-        list(matched_partitions.values()),
+    get_session = _thread_session_factory(boto3_session)
+    _, failures = _map_concurrently(
+        lambda location: wr.s3.delete_objects(
+            location if location.endswith("/") else location + "/",
+            boto3_session=get_session(),
+        ),
+        {location: location for location in matched_partitions},
+        max_concurrency,
+        f"Deleted data for %d of %d partitions of {database}.{table}",
+    )
+
+    # Delete partitions, BatchDeletePartition takes at most 25 at a time
+    locations = {
+        tuple(values): location
+        for location, values in matched_partitions.items()
+        if location not in failures
+    }
+    batches = list(_batches(list(locations), 25))
+
+    def delete_batch(values):
+        response = _call_with_retries(
+            get_session().client("glue").batch_delete_partition,
+            DatabaseName=database,
+            TableName=table,
+            PartitionsToDelete=[{"Values": list(v)} for v in values],
+        )
+        return response.get("Errors", [])
+
+    batch_errors, batch_failures = _map_concurrently(
+        delete_batch,
+        dict(enumerate(batches)),
+        max_concurrency,
+        f"Deleted %d of %d batches of partitions from {database}.{table}",
+    )
+    _forget_table(database, table)
+    for i, e in batch_failures.items():
+        failures.update({locations[values]: e for values in batches[i]})
+    for errors in batch_errors.values():
+        for error in errors:
+            failures[locations[tuple(error["PartitionValues"])]] = RuntimeError(
+                error["ErrorDetail"]["ErrorMessage"]
+            )
+
+    if failures:
+        raise DeletionError(
+            f"Failed to delete {len(failures)} of {len(matched_partitions)} "
+            f"partitions from {database}.{table}",
+            failures,
+        )
+
+
+def _describe_partitions_data(
+    partitions: dict, max_concurrency: int, boto3_session
+) -> pd.DataFrame:
+    """
+    Counts the objects and bytes under each partition location.
+    See delete_partitions_and_data.
+    """
+    get_session = _thread_session_factory(boto3_session)
+    sizes, failures = _map_concurrently(
+        lambda location: _list_object_sizes(location, get_session()),
+        {location: location for location in partitions},
+        max_concurrency,
+        "Measured %d of %d partitions",
+    )
+    if failures:
+        raise next(iter(failures.values()))
+    return pd.DataFrame(
+        {
+            "location": list(partitions),
+            "values": list(partitions.values()),
+            "objects": [len(sizes[location]) for location in partitions],
+            "bytes": [sum(sizes[location].values()) for location in partitions],
+        }
+    )
+
+
+def _list_object_sizes(prefix: str, boto3_session) -> dict:
+    """
+    Lists the objects under an S3 prefix.
+
+    Returns:
+        The size in bytes of each object, keyed by its S3 path.
+    """
+    bucket, key = _split_s3_path(prefix if prefix.endswith("/") else prefix + "/")
+    paginator = boto3_session.client("s3").get_paginator("list_objects_v2")
+    return {
+        f"s3://{bucket}/{obj['Key']}": obj["Size"]
+        for page in paginator.paginate(Bucket=bucket, Prefix=key)
+        for obj in page.get("Contents", [])
+    }
+
+
+@init_athena_params(allow_boto3_session=True)
+def cleanup_temp_storage(
+    older_than: datetime.timedelta = datetime.timedelta(days=1),
+    dry_run: bool = False,
+    max_concurrency: int = 10,
+    boto3_session=None,
+) -> pd.DataFrame:
+    """
+    Deletes temporary table data that no table uses any more.
+
+    create_temp_table and dataframe_to_temp_table write each table to a
+    new folder named with the time it was made, and replacing or
+    deleting a temp table only removes the folder it currently uses, so
+    folders from earlier sessions build up. This lists those folders,
+    keeps any holding the data of a table in your temporary database and
+    deletes the rest that were made more than older_than ago.
+
+    The folders are listed and deleted up to max_concurrency at a time,
+    with their objects deleted in batches of 1,000. Progress is logged
+    at INFO level. A folder that fails to delete does not stop the
+    others, but a DeletionError is raised at the end listing every
+    failure.
+
+    Args:
+        older_than (datetime.timedelta): Only delete folders made longer
+            ago than this. A CTAS query writes its data before its table
+            is registered, so keep this longer than your queries take.
+            Defaults to one day.
+        dry_run (bool): If True nothing is deleted and the folders that
+            would be are returned instead.
+        max_concurrency (int): The number of folders listed and deleted
+            at the same time.
+        boto3_session: optional boto3 session
+
+    Returns:
+        A DataFrame with the location, creation time, number of objects
+        and total bytes of each folder deleted (or for a dry run, that
+        would be deleted).
+
+    Examples:
+    cleanup_temp_storage(older_than=datetime.timedelta(days=7), dry_run=True)
+    """
+    user_id, out_path = get_user_id_and_table_dir(boto3_session=boto3_session)
+    temp_db_name = get_database_name_from_userid(user_id)
+    cutoff = time.time() - older_than.total_seconds()
+
+    # dataframe_to_temp_table writes to out_path/<timestamp>/<table>.parquet/
+    # and create_temp_table to out_path/__athena_temp_db__/<timestamp>/<table>
+    created = {}
+    for parent in [out_path, os.path.join(out_path, "__athena_temp_db__/")]:
+        for prefix in _list_subprefixes(parent, boto3_session):
+            # The timestamp is time.time() without the decimal point
+            ts = prefix[len(parent) :].rstrip("/")
+            if ts.isdigit() and len(ts) >= 10 and int(ts[:10]) < cutoff:
+                created[prefix] = int(ts[:10])
+
+    live_locations = []
+    if _database_exists(temp_db_name, boto3_session, refresh=True):
+        glue_tables = wr.catalog.get_tables(
+            database=temp_db_name, boto3_session=boto3_session
+        )
+        live_locations = [
+            location
+            for location in map(_get_glue_table_location, glue_tables)
+            if location
+        ]
+    unused = [
+        prefix
+        for prefix in created
+        if not any(location.startswith(prefix) for location in live_locations)
+    ]
+
+    get_session = _thread_session_factory(boto3_session)
+
+    def delete_prefix(prefix):
+        session = get_session()
+        sizes = _list_object_sizes(prefix, session)
+        if sizes and not dry_run:
+            wr.s3.delete_objects(list(sizes), boto3_session=session)
+        return sizes
+
+    sizes, failures = _map_concurrently(
+        delete_prefix,
+        {prefix: prefix for prefix in unused},
+        max_concurrency,
+        f"{'Measured' if dry_run else 'Deleted'} %d of %d temporary storage folders",
+    )
+    if failures:
+        raise DeletionError(
+            f"Failed to delete {len(failures)} of {len(unused)} "
+            f"temporary storage folders under {out_path}",
+            failures,
+        )
+
+    return pd.DataFrame(
+        {
+            "location": unused,
+            "created": pd.to_datetime([created[prefix] for prefix in unused], unit="s"),
+            "objects": [len(sizes[prefix]) for prefix in unused],
+            "bytes": [sum(sizes[prefix].values()) for prefix in unused],
+        }
+    )
+
+
+def _list_subprefixes(prefix: str, boto3_session) -> List[str]:
+    """
+    Lists the folders directly under an S3 prefix.
+    """
+    bucket, key = _split_s3_path(prefix)
+    paginator = boto3_session.client("s3").get_paginator("list_objects_v2")
+    return [
+        f"s3://{bucket}/{common_prefix['Prefix']}"
+        for page in paginator.paginate(Bucket=bucket, Prefix=key, Delimiter="/")
+        for common_prefix in page.get("CommonPrefixes", [])
+    ]
+
+
+@init_athena_params(allow_boto3_session=True)
+def compact_table(
+    database: str,
+    table: str,
+    target_file_size: Union[int, str] = "128MB",
+    expression: Optional[str] = None,
+    boto3_session=None,
+) -> List[str]:
+    """
+    Rewrites the Parquet files of a table, or of the partitions matching
+    an expression, into files of around target_file_size. Tables built
+    up by many appends, e.g. with dataframe_to_table(mode="append"),
+    can hold thousands of small files that make queries slow.
+
+    The new files are written next to the old ones, under new names, and
+    the old files are deleted once they have all been written, so the
+    table keeps its location and later writes go where they did before.
+    Queries run while a location is being compacted may read both the
+    old and the new files. The schema of the new files is the union of
+    the columns of every old file, with columns a file lacks filled with
+    nulls. If the files have conflicting column types nothing is
+    rewritten.
+
+    Args:
+        database (str): The database name.
+        table (str): The table name.
+        target_file_size (Union[int,str]): size in bytes, or e.g.
+            "128MB", to write each Parquet file up to.
+        expression (str, optional): Only compact the partitions matching
+            this expression, see delete_partitions_and_data.
+        boto3_session: optional boto3 session
+
+    Returns:
+        The S3 locations that were rewritten. Locations whose files
+        are already about the target size are left alone.
+
+    Examples:
+    compact_table("my_database", "my_table", "256MB", "year = 2020")
+    """
+    target_file_size = _parse_file_size(target_file_size)
+    glue_table = _get_glue_table(database, table, boto3_session, refresh=True)
+    if glue_table is None:
+        raise wr.exceptions.InvalidTable(f"{database}.{table}")
+    if not _get_glue_table_location(glue_table):
+        raise ValueError(f"{database}.{table} has no location (is it a view?)")
+
+    if glue_table.get("PartitionKeys"):
+        locations = list(
+            _get_partitions(database, table, expression, boto3_session, refresh=True)
+        )
+    elif expression is not None:
+        raise ValueError(f"{database}.{table} is not partitioned")
+    else:
+        locations = [_get_glue_table_location(glue_table)]
+
+    s3_fs = _get_arrow_s3_filesystem(boto3_session)
+    compacted = []
+    try:
+        for location in locations:
+            if _compact_location(location, target_file_size, s3_fs, boto3_session):
+                compacted.append(location)
+    finally:
+        _forget_table(database, table)
+    return compacted
+
+
+def _compact_location(
+    location: str, target_file_size: int, s3_fs, boto3_session
+) -> bool:
+    """
+    Rewrites the Parquet files directly under an S3 location into
+    files of around target_file_size in the same location, then
+    deletes the old files. See compact_table.
+
+    Returns:
+        True if the files were rewritten, False if they were left alone.
+    """
+    location = location if location.endswith("/") else location + "/"
+    sizes = wr.s3.size_objects(
+        [
+            path
+            for path in wr.s3.list_objects(location, boto3_session=boto3_session)
+            if path.endswith(".parquet") and "/" not in path[len(location) :]
+        ],
         boto3_session=boto3_session,
     )
+    paths = sorted(sizes)
+    if len(paths) <= max(1, -(-sum(sizes.values()) // target_file_size)):
+        return False
+
+    schema = _unify_parquet_schemas(location, paths, s3_fs)
+    # The writer names its files with a new uuid so they can't clash
+    # with the ones being replaced
+    writer = _SizedParquetWriter(location, schema, s3_fs, target_file_size)
+    try:
+        for path in paths:
+            with s3_fs.open_input_file(path.replace("s3://", "", 1)) as f:
+                parquet_file = pq.ParquetFile(f, coerce_int96_timestamp_unit="ms")
+                for batch in parquet_file.iter_batches():
+                    writer.write(_conform_to_schema(batch, schema))
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    wr.s3.delete_objects(paths, boto3_session=boto3_session)
+    return True
+
+
+def _unify_parquet_schemas(location: str, paths: List[str], s3_fs) -> pa.Schema:
+    """
+    Reads the schema of every Parquet file and returns one with all of
+    their columns, raising a ValueError if a column's type differs
+    between files.
+    """
+    schemas = []
+    for path in paths:
+        with s3_fs.open_input_file(path.replace("s3://", "", 1)) as f:
+            schemas.append(
+                pq.ParquetFile(f, coerce_int96_timestamp_unit="ms").schema_arrow
+            )
+    try:
+        return pa.unify_schemas(schemas)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(
+            f"The Parquet files under {location} have conflicting schemas: {e}"
+        ) from e
 
 
-def save_query_to_parquet(sql: str, file_path: str) -> None:
+def _conform_to_schema(batch: pa.RecordBatch, schema: pa.Schema) -> pa.Table:
+    """
+    Orders a record batch's columns as in schema, adding any it
+    lacks as nulls.
+    """
+    table = pa.Table.from_batches([batch])
+    return pa.Table.from_arrays(
+        [
+            table.column(field.name).cast(field.type)
+            if field.name in table.column_names
+            else pa.nulls(table.num_rows, field.type)
+            for field in schema
+        ],
+        schema=schema,
+    )
+
+
+def save_query_to_parquet(
+    sql: str,
+    file_path: str,
+    unload_approach: bool = False,
+    compression: str = "snappy",
+    row_group_size: Optional[int] = None,
+) -> None:
     """
     Saves the results of a query to a parquet file
     at a given location.
 
     Args:
         sql (str): The SQL query.
-        file_path (str): The path to save the result to.
+        file_path (str): The path to save the result to. Can be a
+            local path or an S3 path.
+        unload_approach (bool, optional): If True, the query is run with
+            Athena UNLOAD and the Parquet files it writes are copied to
+            file_path without being read into memory. If the query
+            writes more than one file and file_path does not end in "/",
+            the files are streamed into a single file one record batch
+            at a time. A file_path ending in "/" is treated as a
+            directory the files are copied into. Defaults to False
+            (the result is read into a pandas DataFrame and then
+            written out).
+        compression (str, optional): The Parquet compression codec,
+            e.g. "snappy", "gzip" or "zstd". Defaults to "snappy".
+        row_group_size (int, optional): The maximum number of rows in
+            each row group. With unload_approach this means the files
+            are rewritten (one record batch at a time) rather than
+            copied. Defaults to None (the writer's default).
 
     Examples:
     save_query_to_parquet(
         "select * from my database.my_table",
         "result.parquet"
     )
+    save_query_to_parquet(
+        "select * from my database.my_big_table",
+        "s3://my-bucket/extracts/my_big_table/",
+        unload_approach=True,
+    )
     """
 
+    if unload_approach:
+        # Queries that return no rows write no files so
+        # fall back to writing an empty file with pandas
+        if _unload_query_to_parquet(sql, file_path, compression, row_group_size):
+            return None
+
     df = read_sql_query(sql)
-    df.to_parquet(file_path)
+    df.to_parquet(file_path, compression=compression, row_group_size=row_group_size)
 
     return None
 
 
+@init_athena_params
+def _unload_query_to_parquet(
+    sql: str,
+    file_path: str,
+    compression: str,
+    row_group_size: Optional[int],
+    database: str = None,
+    s3_output: str = None,
+    boto3_session=None,
+    pyarrow_additional_kwargs: dict = None,
+) -> bool:
+    """
+    Runs a query with Athena UNLOAD and copies or streams the
+    Parquet files written to file_path. Returns False if the
+    query did not write any files.
+    """
+    unload_path = s3_path_join(s3_output, "__unload__/", uuid.uuid4().hex + "/")
+    query_metadata = ath.unload(
+        sql,
+        path=unload_path,
+        database=database,
+        file_format="PARQUET",
+        compression=compression.upper(),
+        boto3_session=boto3_session,
+    )
+    try:
+        paths = _read_manifest(query_metadata.manifest_location, boto3_session)
+        if not paths:
+            return False
+
+        if row_group_size is None and (len(paths) == 1 or file_path.endswith("/")):
+            _copy_s3_files(paths, file_path, boto3_session)
+        else:
+            batches = _read_parquet_batches(
+                paths,
+                row_group_size or 100_000,
+                boto3_session,
+                pyarrow_additional_kwargs,
+            )
+            _write_parquet_batches(
+                batches, file_path, compression, row_group_size, boto3_session
+            )
+        return True
+    finally:
+        wr.s3.delete_objects(unload_path, boto3_session=boto3_session)
+
+
+def _copy_s3_files(paths: List[str], file_path: str, boto3_session):
+    """
+    Copies files from S3 to a local or S3 path without reading them.
+    If file_path ends in "/" the files are copied into it, otherwise
+    there must be a single file which is copied to file_path.
+    """
+    s3_client = boto3_session.client("s3")
+    for path in paths:
+        bucket, key = _split_s3_path(path)
+        if file_path.endswith("/"):
+            filename = key.split("/")[-1]
+            if not filename.endswith(".parquet"):
+                filename += ".parquet"
+            target = file_path + filename
+        else:
+            target = file_path
+
+        if target.startswith("s3://"):
+            target_bucket, target_key = _split_s3_path(target)
+            s3_client.copy({"Bucket": bucket, "Key": key}, target_bucket, target_key)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            s3_client.download_file(bucket, key, target)
+
+
+def _write_parquet_batches(
+    batches: Iterator[pa.RecordBatch],
+    file_path: str,
+    compression: str,
+    row_group_size: Optional[int],
+    boto3_session,
+):
+    """
+    Writes record batches to a single local or S3 Parquet file
+    holding only one batch in memory at a time.
+    """
+    if file_path.startswith("s3://"):
+        s3_fs = _get_arrow_s3_filesystem(boto3_session)
+        sink = s3_fs.open_output_stream(file_path.replace("s3://", "", 1))
+    else:
+        sink = pa.OSFile(file_path, "wb")
+
+    writer = None
+    with sink:
+        for batch in batches:
+            if writer is None:
+                writer = pq.ParquetWriter(sink, batch.schema, compression=compression)
+            writer.write_batch(batch, row_group_size=row_group_size)
+        if writer is not None:
+            writer.close()
+
+
 @init_athena_params(allow_boto3_session=True)
 def dataframe_to_temp_table(df: pd.DataFrame, table: str, boto3_session=None) -> None:
     """
@@ -623,7 +2228,7 @@ def dataframe_to_temp_table(df: pd.DataFrame, table: str, boto3_session=None) ->
     # Include timestamp in path to avoid permissions problems with
     # previous sessions
     ts = str(time.time()).replace(".", "")
-    path = s3_path_join(table_dir, ts, table)
+    path = os.path.join(table_dir, ts, table)
     dataframe_to_table(df, db, table, path, boto3_session=boto3_session)
 
 
@@ -636,6 +2241,7 @@ def dataframe_to_table(
     mode: str = "overwrite",
     partition_cols: Optional[List[str]] = None,
     boto3_session=None,
+    target_file_size: Optional[Union[int, str]] = None,
     **kwargs,
 ) -> None:
     """
@@ -649,22 +2255,43 @@ def dataframe_to_table(
         mode (str): "overwrite" (default), "append", or "overwrite_partitions"
         partition_cols (List[str]): partition columns (optional)
         boto3_session: optional boto3 session
+        target_file_size (Union[int,str], optional): size in bytes, or e.g.
+            "128MB", to write each Parquet file up to. Replaced data is
+            deleted and the Glue catalog updated once all files are written.
         **kwargs: arguments for to_parquet
     """
 
+    if target_file_size is not None:
+        if kwargs:
+            raise ValueError("to_parquet arguments can't be used with target_file_size")
+        _write_sized_table(
+            iter([df]),
+            database,
+            table,
+            location,
+            mode=mode,
+            partition_cols=partition_cols,
+            target_file_size=target_file_size,
+            boto3_session=boto3_session,
+        )
+        return
+
     # Write table
-    wr.s3.to_parquet(
-        df,
-        path=s3_path_join(location, table + ".parquet"),
-        dataset=True,
-        database=database,
-        table=table,
-        boto3_session=boto3_session,
-        mode=mode,
-        partition_cols=partition_cols,
-        compression="snappy",
-        **kwargs,
-    )
+    try:
+        wr.s3.to_parquet(
+            df,
+            path=s3_path_join(location, table + ".parquet"),
+            dataset=True,
+            database=database,
+            table=table,
+            boto3_session=boto3_session,
+            mode=mode,
+            partition_cols=partition_cols,
+            compression="snappy",
+            **kwargs,
+        )
+    finally:
+        _forget_table(database, table)
 
 
 def create_database(database: str, **kwargs) -> bool:
@@ -679,9 +2306,11 @@ def create_database(database: str, **kwargs) -> bool:
         it has been created.
     """
 
-    if database in (db["Name"] for db in wr.catalog.get_databases()):
+    boto3_session = kwargs.get("boto3_session") or get_boto_session()
+    if database in _get_databases(boto3_session):
         return False
     wr.catalog.create_database(database, **kwargs)
+    _forget_database(database)
     return True
 
 
@@ -696,6 +2325,8 @@ def file_to_table(
     boto3_session=None,
     chunksize=None,
     metadata=None,
+    max_concurrency: Optional[int] = None,
+    target_file_size: Optional[Union[int, str]] = None,
     **kwargs,
 ) -> None:
     """
@@ -712,20 +2343,60 @@ def file_to_table(
         chunksize Union[int,str]: size of chunks in memory or rows,
             e.g. "100MB", 100000
         metadata: mojap_metadata instance
+        max_concurrency (int, optional): The number of chunks to upload
+            to S3 at the same time when chunksize is set. The next chunks
+            are read while earlier ones upload and the table and its
+            partitions are registered in the Glue catalog once all chunks
+            have been written. Defaults to uploading one chunk at a time.
+        target_file_size (Union[int,str], optional): size in bytes, or e.g.
+            "128MB", to write each Parquet file up to. Chunks are coalesced
+            into row groups and files of this size, replaced data is
+            deleted and the Glue catalog is updated once at the end. Can
+            be used with mode "overwrite_partitions" and chunksize.
         **kwargs: arguments for arrow_pd_parser.reader.read
             e.g. use chunksize for very large files, metadata
             to apply metadata
     """
 
+    if target_file_size is not None and max_concurrency is not None:
+        raise ValueError(
+            "max_concurrency and target_file_size can't be used at the same time"
+        )
+
     dfs = reader.read(path, chunksize=chunksize, metadata=metadata, **kwargs)
     if isinstance(dfs, pd.DataFrame):
         # Convert single dataframe to iterator
         dfs = iter([dfs])
-    elif mode == "overwrite_partitions":
+    elif mode == "overwrite_partitions" and target_file_size is None:
         raise ValueError(
             "overwrite_partitions and a set chunksize "
             + "can't be used at the same time"
         )
+    elif max_concurrency is not None:
+        _upload_chunks_to_table(
+            dfs,
+            database,
+            table,
+            location,
+            mode=mode,
+            partition_cols=partition_cols,
+            max_concurrency=max_concurrency,
+            boto3_session=boto3_session,
+        )
+        return
+
+    if target_file_size is not None:
+        _write_sized_table(
+            dfs,
+            database,
+            table,
+            location,
+            mode=mode,
+            partition_cols=partition_cols,
+            target_file_size=target_file_size,
+            boto3_session=boto3_session,
+        )
+        return
 
     for df in dfs:
         dataframe_to_table(
@@ -738,3 +2409,334 @@ def file_to_table(
             boto3_session=boto3_session,
         )
         mode = "append"
+
+
+class _SharedCredentialProvider(CredentialProvider):
+    """
+    Gives a botocore session an existing credentials object.
+    """
+
+    METHOD = "shared"
+
+    def __init__(self, credentials):
+        self._credentials = credentials
+
+    def load(self):
+        return self._credentials
+
+
+def _thread_session_factory(boto3_session) -> Callable:
+    """
+    boto3 sessions are not thread safe, so returns a function giving
+    each thread its own session. The sessions share boto3_session's
+    credentials object, so credentials that expire (e.g. from an
+    assumed role) are refreshed for every thread as they would be for
+    boto3_session.
+    """
+    credentials = boto3_session.get_credentials()
+    region_name = boto3_session.region_name
+    local = threading.local()
+
+    def get_session():
+        if not hasattr(local, "session"):
+            botocore_session = botocore.session.Session()
+            botocore_session.register_component(
+                "credential_provider",
+                CredentialResolver([_SharedCredentialProvider(credentials)]),
+            )
+            local.session = boto3.Session(
+                botocore_session=botocore_session, region_name=region_name
+            )
+        return local.session
+
+    return get_session
+
+
+def _upload_chunks_to_table(
+    dfs: Iterator[pd.DataFrame],
+    database: str,
+    table: str,
+    location: str,
+    mode: str,
+    partition_cols: Optional[List[str]],
+    max_concurrency: int,
+    boto3_session,
+) -> None:
+    """
+    Writes chunks of a table to S3 concurrently then registers the
+    table and its partitions in the Glue catalog once.
+    See file_to_table.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    dataset_path = s3_path_join(location, table + ".parquet/")
+    get_session = _thread_session_factory(boto3_session)
+
+    def upload(df):
+        return wr.s3.to_parquet(
+            df,
+            path=dataset_path,
+            dataset=True,
+            mode="append",
+            partition_cols=partition_cols,
+            compression="snappy",
+            # Cast every chunk to the same types, whatever its own values
+            dtype=columns_types,
+            boto3_session=get_session(),
+        )
+
+    dfs = iter(dfs)
+    first = next(dfs, None)
+    if first is None:
+        return
+    columns_types, partitions_types = _get_catalog_types(
+        *wr.catalog.extract_athena_types(
+            first, index=False, partition_cols=partition_cols
+        ),
+        database,
+        table,
+        mode,
+        boto3_session,
+    )
+    if mode == "overwrite":
+        wr.s3.delete_objects(dataset_path, boto3_session=boto3_session)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        # Only allow a couple of chunks per worker to wait in memory
+        # while the reader gets ahead of the uploads
+        results = _map_bounded(
+            pool, upload, itertools.chain([first], dfs), 2 * max_concurrency
+        )
+
+    partitions_values = {}
+    for result in results:
+        partitions_values.update(result["partitions_values"])
+    _register_parquet_table(
+        database,
+        table,
+        dataset_path,
+        columns_types,
+        partitions_types,
+        partitions_values,
+        mode=mode,
+        boto3_session=boto3_session,
+    )
+
+
+def _map_bounded(
+    pool: ThreadPoolExecutor, func: Callable, items, max_pending: int
+) -> list:
+    """
+    Calls func on each item in a pool, taking items from the iterable
+    only while fewer than max_pending calls are waiting or running.
+    Stops taking items and raises as soon as a call fails.
+
+    Returns:
+        The results of each call in the order of items.
+    """
+    slots = threading.BoundedSemaphore(max_pending)
+    failed = []
+    futures = []
+
+    def on_done(future):
+        slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            failed.append(future)
+
+    try:
+        for item in items:
+            slots.acquire()
+            if failed:
+                break
+            future = pool.submit(func, item)
+            future.add_done_callback(on_done)
+            futures.append(future)
+        if failed:
+            failed[0].result()
+        return [f.result() for f in futures]
+    finally:
+        for f in futures:
+            f.cancel()
+
+
+def _write_sized_table(
+    dfs: Iterator[pd.DataFrame],
+    database: str,
+    table: str,
+    location: str,
+    mode: str,
+    partition_cols: Optional[List[str]],
+    target_file_size: Union[int, str],
+    boto3_session,
+) -> None:
+    """
+    Writes dataframes to a table as Parquet files of around
+    target_file_size, then swaps out replaced data and updates
+    the Glue catalog once. See file_to_table.
+    """
+    if mode not in ("overwrite", "append", "overwrite_partitions"):
+        raise ValueError(f"Unknown mode: {mode}")
+    target_file_size = _parse_file_size(target_file_size)
+
+    dfs = iter(dfs)
+    first = next(dfs, None)
+    if first is None:
+        return
+    first_types, partitions_types = wr.catalog.extract_athena_types(
+        first, index=False, partition_cols=partition_cols
+    )
+    columns_types, partitions_types = _get_catalog_types(
+        first_types, partitions_types, database, table, mode, boto3_session
+    )
+    schema = _cast_schema(
+        pa.Schema.from_pandas(
+            first.drop(columns=partition_cols or []), preserve_index=False
+        ),
+        first_types,
+        columns_types,
+    )
+    dataset_path = s3_path_join(location, table + ".parquet/")
+    writer = _SizedParquetWriter(
+        dataset_path,
+        schema,
+        _get_arrow_s3_filesystem(boto3_session),
+        target_file_size,
+    )
+
+    try:
+        for df in itertools.chain([first], dfs):
+            for partition, part in _split_partitions(df, partition_cols):
+                writer.write(
+                    pa.Table.from_pandas(part, schema=schema, preserve_index=False),
+                    partition,
+                )
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    if mode == "overwrite_partitions" and partition_cols:
+        replaced = list(writer.partitions_values)
+    elif mode == "append":
+        replaced = []
+    else:
+        replaced = [dataset_path]
+    _delete_replaced_objects(replaced, writer.paths, boto3_session)
+
+    _register_parquet_table(
+        database,
+        table,
+        dataset_path,
+        columns_types,
+        partitions_types,
+        writer.partitions_values,
+        mode=mode,
+        boto3_session=boto3_session,
+    )
+
+
+def _cast_schema(schema: pa.Schema, from_types: dict, to_types: dict) -> pa.Schema:
+    """
+    Changes the type of each field of a schema whose Athena type is
+    different in to_types than in from_types (the types of the data
+    the schema came from).
+    """
+    for name, type_ in to_types.items():
+        if type_ != from_types[name]:
+            schema = schema.set(
+                schema.get_field_index(name), pa.field(name, athena2pyarrow(type_))
+            )
+    return schema
+
+
+def _delete_replaced_objects(
+    prefixes: List[str], keep: List[str], boto3_session
+) -> None:
+    """
+    Deletes the objects under each S3 prefix apart from those in keep.
+    """
+    keep = set(keep)
+    replaced = [
+        path
+        for prefix in prefixes
+        for path in wr.s3.list_objects(prefix, boto3_session=boto3_session)
+        if path not in keep
+    ]
+    if replaced:
+        wr.s3.delete_objects(replaced, boto3_session=boto3_session)
+
+
+def _get_catalog_types(
+    columns_types: dict,
+    partitions_types: dict,
+    database: str,
+    table: str,
+    mode: str,
+    boto3_session,
+) -> Tuple[dict, dict]:
+    """
+    Swaps the Athena types of the columns (and partition columns) of
+    data to be added to an existing table for their types in the Glue
+    catalog, as awswrangler does when writing to a table, so every file
+    of the table has the same types. Types are left as they are when
+    the table is to be overwritten or does not exist yet.
+
+    Returns:
+        The column types and partition column types to write.
+    """
+    if mode == "overwrite":
+        return columns_types, partitions_types
+    glue_table = _get_glue_table(database, table, boto3_session or get_boto_session())
+    if glue_table is None:
+        return columns_types, partitions_types
+
+    catalog_types = {
+        column["Name"]: column["Type"]
+        for column in (
+            glue_table.get("StorageDescriptor", {}).get("Columns", [])
+            + glue_table.get("PartitionKeys", [])
+        )
+    }
+    return tuple(
+        {
+            name: catalog_types.get(wr.catalog.sanitize_column_name(name), type_)
+            for name, type_ in types.items()
+        }
+        for types in (columns_types, partitions_types)
+    )
+
+
+def _register_parquet_table(
+    database: str,
+    table: str,
+    path: str,
+    columns_types: dict,
+    partitions_types: dict,
+    partitions_values: dict,
+    mode: str,
+    boto3_session,
+) -> None:
+    """
+    Creates or updates the Glue table for a Parquet dataset already
+    written to path and adds its partitions.
+    """
+    _forget_table(database, table)
+    wr.catalog.create_parquet_table(
+        database=database,
+        table=table,
+        path=path,
+        columns_types=columns_types,
+        partitions_types=partitions_types,
+        compression="snappy",
+        mode="overwrite" if mode == "overwrite" else "append",
+        boto3_session=boto3_session,
+    )
+    if partitions_values:
+        wr.catalog.add_parquet_partitions(
+            database=database,
+            table=table,
+            partitions_values=partitions_values,
+            compression="snappy",
+            boto3_session=boto3_session,
+        )
@@ -0,0 +1,289 @@
+"""
+Async versions of the main pydbtools query functions, for use in
+asyncio applications such as web services.
+
+Queries are started and their results read in worker threads, but
+waiting for Athena is done by polling the query state from the event
+loop, so no thread is held while a query runs and many queries can be
+in flight from a single event loop. The arguments are handled in the
+same way as the blocking functions in pydbtools, including __temp__
+references and the boto3 session.
+
+Example:
+    import asyncio
+    import pydbtools.aio as pydb_aio
+
+    async def main():
+        return await asyncio.gather(
+            pydb_aio.read_sql_query("SELECT * FROM db.table1"),
+            pydb_aio.read_sql_query("SELECT * FROM db.table2"),
+        )
+
+    df1, df2 = asyncio.run(main())
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import awswrangler.athena as ath
+import pandas as pd
+
+from pydbtools._wrangler import (
+    _check_query_state,
+    _drop_ctas_table,
+    _query_final_states,
+    _start_ctas_query,
+    _start_temp_table_query,
+    init_athena_params,
+)
+from pydbtools.utils import (
+    _forget_table,
+    _query_poll_delays,
+    _record_query_wait,
+    get_boto_session,
+)
+
+
+async def wait_query(
+    query_execution_id: str,
+    boto3_session=None,
+    poll_schedule: dict = None,
+) -> Dict[str, Any]:
+    """
+    Waits for an Athena query to finish without blocking the event loop.
+    If the waiting task is cancelled the query is stopped.
+
+    Args:
+        query_execution_id (str): Athena query execution id.
+        boto3_session (optional): Session whose credentials are used to
+            check the query. Defaults to the pydbtools session.
+        poll_schedule (dict, optional): Overrides any of the settings
+            in pydbtools.utils.query_poll_schedule, which controls how
+            often the query is checked while it runs.
+
+    Returns:
+        The query execution, as returned by get_query_execution.
+
+    Raises:
+        awswrangler.exceptions.QueryFailed: If the query failed
+        awswrangler.exceptions.QueryCancelled: If the query was cancelled
+    """
+    athena_client = await asyncio.to_thread(_athena_client, boto3_session)
+    return await _wait_query(athena_client, query_execution_id, poll_schedule)
+
+
+def _athena_client(boto3_session=None):
+    return (boto3_session or get_boto_session()).client("athena")
+
+
+async def _wait_query(
+    athena_client, query_execution_id: str, poll_schedule: Optional[dict] = None
+) -> Dict[str, Any]:
+    # boto3 clients (unlike sessions) can be used from any thread
+    start = time.monotonic()
+    polls = 0
+    try:
+        for delay in _query_poll_delays(poll_schedule):
+            response = await asyncio.to_thread(
+                athena_client.get_query_execution,
+                QueryExecutionId=query_execution_id,
+            )
+            polls += 1
+            execution = response["QueryExecution"]
+            if execution["Status"]["State"] in _query_final_states:
+                break
+            await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        await asyncio.to_thread(
+            athena_client.stop_query_execution, QueryExecutionId=query_execution_id
+        )
+        raise
+    finally:
+        _record_query_wait(polls, time.monotonic() - start)
+
+    return _check_query_state(execution)
+
+
+@init_athena_params
+def _start_query(sql, *args, **kwargs):
+    query_execution_id = ath.start_query_execution(sql, *args, **kwargs)
+    return query_execution_id, kwargs["boto3_session"].client("athena")
+
+
+async def start_query_execution_and_wait(
+    sql: str, *args, poll_schedule: dict = None, **kwargs
+) -> Dict[str, Any]:
+    """
+    Async version of pydbtools.start_query_execution_and_wait.
+    *args and **kwargs are passed to start_query_execution.
+
+    Args:
+        sql (str): An SQL string. Which works with __TEMP__ references.
+        poll_schedule (dict, optional): See wait_query.
+
+    Returns:
+        The query execution, as returned by get_query_execution.
+    """
+    query_execution_id, athena_client = await asyncio.to_thread(
+        _start_query, sql, *args, **kwargs
+    )
+    return await _wait_query(athena_client, query_execution_id, poll_schedule)
+
+
+@init_athena_params
+def _start_read_query(
+    sql: str,
+    database: str = None,
+    ctas_approach: bool = None,
+    s3_output: str = None,
+    workgroup: str = "primary",
+    result_reuse_configuration: dict = None,
+    boto3_session=None,
+):
+    if ctas_approach:
+        ctas = _start_ctas_query(
+            sql, database, s3_output, boto3_session, workgroup=workgroup
+        )
+        query_execution_id = ctas["ctas_query_id"]
+    else:
+        ctas = None
+        query_execution_id = ath.start_query_execution(
+            sql,
+            database=database,
+            s3_output=s3_output,
+            workgroup=workgroup,
+            result_reuse_configuration=result_reuse_configuration,
+            boto3_session=boto3_session,
+        )
+    return query_execution_id, ctas, boto3_session.client("athena")
+
+
+@init_athena_params
+def _get_query_results(
+    query_execution_id: str,
+    ctas: Optional[dict],
+    pyarrow_additional_kwargs: dict = None,
+    boto3_session=None,
+) -> pd.DataFrame:
+    try:
+        return ath.get_query_results(
+            query_execution_id,
+            boto3_session=boto3_session,
+            pyarrow_additional_kwargs=pyarrow_additional_kwargs,
+        )
+    finally:
+        if ctas is not None:
+            _drop_ctas_table(ctas, boto3_session)
+
+
+async def read_sql_query(
+    sql: str,
+    database: str = None,
+    ctas_approach: bool = None,
+    workgroup: str = "primary",
+    pyarrow_additional_kwargs: dict = None,
+    result_reuse_max_age: Optional[int] = None,
+    force_ec2: bool = False,
+    region_name: str = None,
+    poll_schedule: dict = None,
+) -> pd.DataFrame:
+    """
+    Async version of pydbtools.read_sql_query. Runs a SELECT query and
+    returns the result as a pandas DataFrame.
+
+    Args:
+        sql (str): An SQL string. Which works with __TEMP__ references.
+        database (str, optional): The database the query is run in.
+            Defaults to the first database referenced in the SQL.
+        ctas_approach (bool, optional): Run the query as a CTAS query
+            and read the Parquet files it writes. Defaults to True,
+            unless result_reuse_max_age is set.
+        workgroup (str, optional): Athena workgroup. Defaults to "primary".
+        pyarrow_additional_kwargs (dict, optional): Passed to pyarrow
+            when reading the results of a CTAS query. Defaults to the
+            pydbtools defaults.
+        result_reuse_max_age (int, optional): If set, Athena can return
+            the results of an identical query run within this many
+            minutes. See pydbtools.read_sql_query.
+        force_ec2 (bool, optional): See pydbtools.create_temp_table.
+        region_name (str, optional): See pydbtools.create_temp_table.
+        poll_schedule (dict, optional): See wait_query.
+
+    Returns:
+        A pandas DataFrame.
+    """
+    setup_kwargs = {"force_ec2": force_ec2, "region_name": region_name}
+    query_execution_id, ctas, athena_client = await asyncio.to_thread(
+        _start_read_query,
+        sql,
+        database=database,
+        ctas_approach=ctas_approach,
+        workgroup=workgroup,
+        result_reuse_max_age=result_reuse_max_age,
+        **setup_kwargs,
+    )
+    try:
+        await _wait_query(athena_client, query_execution_id, poll_schedule)
+    except BaseException:
+        if ctas is not None:
+            await asyncio.to_thread(_drop_query_table, ctas, **setup_kwargs)
+        raise
+    return await asyncio.to_thread(
+        _get_query_results,
+        query_execution_id,
+        ctas,
+        pyarrow_additional_kwargs=pyarrow_additional_kwargs,
+        **setup_kwargs,
+    )
+
+
+@init_athena_params
+def _drop_query_table(ctas: dict, boto3_session=None):
+    _drop_ctas_table(ctas, boto3_session)
+
+
+@init_athena_params
+def _start_temp_table(
+    sql: str,
+    table_name: str,
+    boto3_session=None,
+    force_ec2: bool = False,
+    region_name: str = None,
+):
+    query_execution_id, temp_db_name = _start_temp_table_query(
+        sql, table_name, boto3_session
+    )
+    return query_execution_id, temp_db_name, boto3_session.client("athena")
+
+
+async def create_temp_table(
+    sql: str,
+    table_name: str,
+    force_ec2: bool = False,
+    region_name: str = None,
+    poll_schedule: dict = None,
+) -> None:
+    """
+    Async version of pydbtools.create_temp_table. Creates a table
+    inside the temporary database from a SELECT query.
+
+    Args:
+        sql (str): The SQL table you want to create a temp table out of.
+            Should be a table that starts with a WITH or SELECT clause.
+        table_name (str): The name of the temp table you wish to create
+        force_ec2 (bool, optional): See pydbtools.create_temp_table.
+        region_name (str, optional): See pydbtools.create_temp_table.
+        poll_schedule (dict, optional): See wait_query.
+    """
+    query_execution_id, temp_db_name, athena_client = await asyncio.to_thread(
+        _start_temp_table,
+        sql,
+        table_name,
+        force_ec2=force_ec2,
+        region_name=region_name,
+    )
+    try:
+        await _wait_query(athena_client, query_execution_id, poll_schedule)
+    finally:
+        _forget_table(temp_db_name, table_name)
@@ -1,12 +1,18 @@
+import copy
+import datetime
 import inspect
 import os
+import random
 import re
-from functools import reduce
-from typing import Optional, Tuple
+import threading
+import time
+from functools import cached_property, lru_cache, reduce
+from typing import Callable, FrozenSet, Iterator, Optional, Tuple
 from urllib.parse import urljoin, urlparse, urlunparse
 
 import awswrangler as wr
 import boto3
+import pyarrow.fs
 import sql_metadata
 import sqlparse
 from botocore.credentials import InstanceMetadataFetcher, InstanceMetadataProvider
@@ -34,6 +40,60 @@ else:
             or specify the query dump bucket"""
         )
 
+# Cache boto3 sessions and caller identities between calls.
+# Set session_cache_enabled to False to build a new session
+# (and call STS) every time.
+session_cache_enabled = True
+session_cache_ttl = 15 * 60  # seconds
+# Refresh sessions holding frozen credentials this long before they expire
+_credentials_expiry_margin = 5 * 60  # seconds
+
+# boto3 sessions are not thread safe so each thread keeps its own,
+# which go with it when it ends. clear_session_cache bumps the
+# generation to drop those of every thread.
+_session_cache = threading.local()
+_session_cache_generation = 0
+_identity_cache = {}
+# Temporary databases known to exist as (user_id, region, database) tuples
+_known_temp_databases = set()
+
+# Local cache of read_sql_query results. Set result_cache_dir to a
+# directory (or set the PYDBTOOLS_RESULT_CACHE_DIR environment variable)
+# to turn it on.
+result_cache_dir = os.getenv("PYDBTOOLS_RESULT_CACHE_DIR")
+result_cache_ttl = 60 * 60  # seconds
+result_cache_max_bytes = 1024**3
+_session_cache_lock = threading.Lock()
+
+# Cache of Glue catalog metadata (databases, tables, locations and
+# partitions). Entries are kept for a short time as the catalog can be
+# changed outside pydbtools; pydbtools' own functions clear the entries
+# of the databases and tables they create or delete. Set
+# glue_cache_enabled to False to call Glue every time. Functions that
+# delete data always ask Glue rather than trust the cache.
+glue_cache_enabled = True
+glue_cache_ttl = 30  # seconds
+# Keyed by (kind, region, caller identity, database, table, other arguments)
+_glue_cache = {}
+_glue_cache_stats = {}
+_glue_cache_lock = threading.Lock()
+
+# How often to check whether a running Athena query has finished. The
+# first checks are made quickly so that short queries return promptly,
+# then the delay is multiplied each time up to max_delay so that long
+# queries make fewer GetQueryExecution calls. Each delay is reduced by
+# up to the jitter fraction at random so that jobs started together do
+# not poll in step. Functions that wait for queries take a
+# poll_schedule dict to override any of these for one call.
+query_poll_schedule = {
+    "initial_delay": 0.1,  # seconds
+    "multiplier": 2.0,
+    "max_delay": 5.0,  # seconds
+    "jitter": 0.2,
+}
+_query_poll_stats = {"queries": 0, "polls": 0, "wait_seconds": 0.0}
+_query_poll_stats_lock = threading.Lock()
+
 aws_role_regex_rules = [
     (
         r"@[a-z.-]+.gov.uk$",  # gov email
@@ -146,6 +206,12 @@ def clean_query(sql: str, fmt_opts: Optional[dict] = None) -> str:
     Returns:
         str: The cleaned SQL query
     """
+    if not fmt_opts or fmt_opts == {"strip_comments": True}:
+        return _analyse_sql(sql).clean
+    return _clean_query(sql, fmt_opts)
+
+
+def _clean_query(sql: str, fmt_opts: Optional[dict] = None) -> str:
     if fmt_opts is None:
         fmt_opts = {}
     fmt_opts["strip_comments"] = True
@@ -154,10 +220,117 @@ def clean_query(sql: str, fmt_opts: Optional[dict] = None) -> str:
     return sql
 
 
+class _SqlAnalysis:
+    """
+    What pydbtools needs to know about a piece of SQL. Each property
+    parses the SQL the first time it is used and the analyses of
+    recently seen SQL are kept (see _analyse_sql), so SQL is parsed
+    once however many functions inspect it.
+
+    Args:
+        sql (str): The SQL, which may contain several statements
+    """
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self._statement_type = None
+
+    def __str__(self) -> str:
+        return self.sql
+
+    @cached_property
+    def statements(self) -> Tuple["_SqlAnalysis", ...]:
+        """The analysis of each statement in the SQL."""
+        statements = []
+        for statement in sqlparse.parse(self.sql):
+            analysis = _analyse_sql(str(statement))
+            # Save the statement from being parsed again for its type
+            if analysis._statement_type is None:
+                analysis._statement_type = statement.get_type()
+            statements.append(analysis)
+        return tuple(statements)
+
+    @property
+    def statement_type(self) -> str:
+        """The type of the first statement, e.g. "SELECT" or "UNKNOWN"."""
+        if self._statement_type is None:
+            statements = self.statements
+            self._statement_type = (
+                statements[0]._statement_type if statements else "UNKNOWN"
+            )
+        return self._statement_type
+
+    @cached_property
+    def clean(self) -> str:
+        """The SQL without comments, newlines or a final semicolon."""
+        return _clean_query(self.sql)
+
+    @cached_property
+    def temp_table(self) -> Optional[Tuple[str, str]]:
+        """
+        The table name and SQL of a CREATE TEMP TABLE tablename AS (...)
+        statement, or None if the SQL does not create a temporary table.
+        """
+        m = re.fullmatch(
+            r"create\s+temp\s+table\s+(\S+)\s+as\s+(.*)",
+            self.clean,
+            flags=re.IGNORECASE,
+        )
+        if not m:
+            return None
+        table_name = m.group(1)
+        table_sql = m.group(2)
+
+        # Remove parentheses from the SQL
+        m = re.fullmatch(r"\((.*)\)", table_sql)
+        if m:
+            table_sql = m.group(1)
+
+        return table_name, table_sql
+
+    @cached_property
+    def tables(self) -> Optional[FrozenSet[str]]:
+        """
+        The lower cased tables the SQL references, or None if they
+        cannot be worked out.
+        """
+        try:
+            return frozenset(t.lower() for t in sql_metadata.Parser(self.sql).tables)
+        # sql_metadata raises a range of errors for SQL it does not support
+        except Exception:
+            return None
+
+
+@lru_cache(maxsize=256)
+def _analyse_sql(sql: str) -> _SqlAnalysis:
+    """
+    Returns the analysis of some SQL, shared with every other
+    caller that analyses the same SQL.
+    """
+    return _SqlAnalysis(sql)
+
+
+# Matches, in a single pass, the parts of SQL where __temp__ must be
+# left alone (string literals, quoted identifiers and comments) and
+# references to __temp__ at the start of a name everywhere else
+_temp_reference_regex = re.compile(
+    r"""
+    '(?:[^']|'')*'?             # string literal
+    | "(?:[^"]|"")*"?           # quoted identifier
+    | `[^`]*`?                  # backtick quoted identifier
+    | --[^\n]*                  # line comment
+    | /\*.*?(?:\*/|\Z)          # block comment
+    | (?<![\w$])__temp__        # reference to the temp database
+    """,
+    flags=re.VERBOSE | re.DOTALL | re.IGNORECASE,
+)
+
+
 def replace_temp_database_name_reference(sql: str, database_name: str) -> str:
     """
     Replaces references to the user's temp database __temp__
-    with the database_name string provided.
+    with the database_name string provided. References inside
+    string literals, quoted identifiers and comments are left alone.
 
     Args:
         sql (str): The raw SQL query as a string
@@ -167,23 +340,16 @@ def replace_temp_database_name_reference(sql: str, database_name: str) -> str:
         str: The new SQL query which is sent to Athena
     """
 
-    parsed = sqlparse.parse(sql)
-    new_query = []
-    for query in parsed:
-        check_temp_query(str(query))
-        # Get all the separated tokens from subtrees
-        fq = list(query.flatten())
-        # Join them back together replacing __temp__
-        # where necessary
-        new_query.append(
-            "".join(
-                re.sub("^__temp__", database_name, str(word), flags=re.IGNORECASE)
-                for word in fq
-            )
-        )
-    # Strip output for consistency, different versions of sqlparse
-    # treat a trailing newline differently
-    return "".join(new_query).strip()
+    # Strip output for consistency with the sqlparse based version
+    # this replaced
+    if "__temp__" not in sql.lower():
+        return sql.strip()
+
+    check_temp_query(sql)
+    return _temp_reference_regex.sub(
+        lambda m: database_name if m.group(0).lower() == "__temp__" else m.group(0),
+        sql,
+    ).strip()
 
 
 def get_user_id_and_table_dir(
@@ -194,13 +360,43 @@ def get_user_id_and_table_dir(
     if boto3_session is None:
         boto3_session = get_boto_session(force_ec2=force_ec2, region_name=region_name)
 
-    sts_client = boto3_session.client("sts")
-    sts_resp = sts_client.get_caller_identity()
-    out_path = s3_path_join("s3://" + bucket, sts_resp["UserId"])
+    user_id = _get_user_id(boto3_session)
+    out_path = s3_path_join("s3://" + bucket, user_id)
     if out_path[-1] != "/":
         out_path += "/"
 
-    return (sts_resp["UserId"], out_path)
+    return (user_id, out_path)
+
+
+def _get_user_id(boto3_session) -> str:
+    """
+    Returns the UserId of the caller identity for a boto3 session.
+    The identity is cached against the session's access key, so it is
+    looked up again whenever the credentials are refreshed.
+    """
+    access_key = None
+    if session_cache_enabled:
+        access_key = _get_access_key(boto3_session)
+        user_id = _identity_cache.get(access_key)
+        if user_id is not None:
+            return user_id
+
+    sts_client = boto3_session.client("sts")
+    user_id = sts_client.get_caller_identity()["UserId"]
+
+    if access_key is not None:
+        with _session_cache_lock:
+            _identity_cache[access_key] = user_id
+    return user_id
+
+
+def _get_access_key(boto3_session) -> Optional[str]:
+    """
+    Returns the access key of a boto3 session's credentials, which
+    identifies the caller without a call to STS.
+    """
+    credentials = boto3_session.get_credentials()
+    return getattr(credentials, "access_key", None)
 
 
 def get_database_name_from_userid(user_id: str) -> str:
@@ -237,24 +433,139 @@ def get_database_name_from_userid(user_id: str) -> str:
     return unique_db_name
 
 
+# Tokens of a SQL query that matter when looking for a table reference.
+# Strings and comments are matched so that they can be skipped.
+_sql_name = r"""(?:"(?:[^"]|"")*"|`[^`]*`|[\w$]+)"""
+_sql_token_regex = re.compile(
+    rf"""
+    (?P<skip>'(?:[^']|'')*'?|--[^\n]*|/\*.*?(?:\*/|\Z))
+    | (?P<name>{_sql_name}(?:\s*\.\s*{_sql_name})*)
+    | (?P<punct>[(),;])
+    """,
+    flags=re.VERBOSE | re.DOTALL,
+)
+# Keywords followed by a table name
+_table_keywords = {"from", "join", "into", "table", "update"}
+# Keywords that may come between a table keyword and the table name
+_table_modifiers = {"if", "not", "exists", "only"}
+# Keywords that end a comma separated list of tables
+_clause_keywords = {
+    "where",
+    "group",
+    "order",
+    "having",
+    "limit",
+    "offset",
+    "union",
+    "intersect",
+    "except",
+    "on",
+    "using",
+    "window",
+    "select",
+    "set",
+    "values",
+}
+# Functions that take "FROM" as part of their arguments
+_from_functions = {"extract", "substring", "trim", "position", "overlay"}
+
+
+def _split_sql_name(name: str) -> list:
+    """Splits a possibly quoted and qualified name into its parts."""
+    return [
+        part.strip()[1:-1] if part.strip()[:1] in '"`' else part.strip()
+        for part in re.findall(rf"{_sql_name}", name)
+    ]
+
+
+class _TableScanner:
+    """
+    Finds the tables referenced in a SQL query, in the order they
+    appear, from the tokens matched by _sql_token_regex.
+    """
+
+    def __init__(self):
+        # One entry per open bracket: whether it belongs to a function
+        # such as EXTRACT whose arguments contain FROM, and the depth of
+        # the list of tables it was opened in
+        self.brackets = []
+        self.expect_table = False
+        self.table_list_depth = None
+        self.previous = None
+
+    def punctuation(self, token: str):
+        if token == "(":
+            in_function = self.previous in _from_functions
+            self.brackets.append((in_function, self.table_list_depth))
+            # A subquery or function rather than a table name
+            self.expect_table = False
+        elif token == ")":
+            if self.brackets:
+                self.table_list_depth = self.brackets.pop()[1]
+        elif token == "," and self.table_list_depth == len(self.brackets):
+            self.expect_table = True
+        elif token == ";":
+            self.expect_table = False
+            self.table_list_depth = None
+        self.previous = token
+
+    def name(self, token: str) -> Optional[list]:
+        """
+        Returns the parts of the name if it is a table name.
+        """
+        lowered = token.lower()
+        self.previous = lowered
+        if self.expect_table and lowered not in _table_modifiers:
+            self.expect_table = False
+            return _split_sql_name(token)
+        if self.expect_table:
+            pass
+        elif lowered in _table_keywords and not (
+            self.brackets and self.brackets[-1][0]
+        ):
+            self.expect_table = True
+            if lowered == "from":
+                self.table_list_depth = len(self.brackets)
+        elif lowered in _clause_keywords:
+            self.table_list_depth = None
+        return None
+
+
+def _iter_sql_tables(sql: str) -> Iterator[list]:
+    """
+    Lazily yields the parts of each table name in a SQL query.
+    """
+    scanner = _TableScanner()
+    for match in _sql_token_regex.finditer(sql):
+        if match.lastgroup == "punct":
+            scanner.punctuation(match.group())
+        elif match.lastgroup == "name":
+            parts = scanner.name(match.group())
+            if parts:
+                yield parts
+
+
+@lru_cache(maxsize=256)
 def get_database_name_from_sql(sql: str) -> str:
     """
     Obtains database name from SQL query for use
     by awswrangler.
 
+    The query is scanned once and the scan stops at the first
+    table given in the form "database.table". Results are kept
+    for the most recently seen queries.
+
     Args:
         sql (str): The raw SQL query as a string
 
     Returns:
         str: The database table name
     """
-
-    for table in sql_metadata.Parser(sql).tables:
+    for parts in _iter_sql_tables(sql):
         # Return the first database seen in the
         # form "database.table"
-        xs = table.split(".")
-        if len(xs) > 1:
-            return xs[0]
+        if len(parts) > 1:
+            return parts[0]
 
     # Return default in case of failure to parse
     return None
@@ -270,17 +581,305 @@ def get_boto_session(
 
     region_name = _set_region_name(region_name)
 
+    if not session_cache_enabled:
+        return _build_boto_session(force_ec2=force_ec2, region_name=region_name)[0]
+
+    sessions = _get_thread_sessions()
+    key = (region_name, force_ec2, os.getenv("AWS_ROLE_ARN"))
+    cached = sessions.get(key)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
+    session, expires_at = _build_boto_session(
+        force_ec2=force_ec2, region_name=region_name
+    )
+    sessions[key] = (session, expires_at)
+    return session
+
+
+def _get_thread_sessions() -> dict:
+    """
+    Returns the current thread's cache of boto3 sessions, emptying it
+    first if clear_session_cache has been called since it was filled.
+    """
+    if getattr(_session_cache, "generation", None) != _session_cache_generation:
+        _session_cache.sessions = {}
+        _session_cache.generation = _session_cache_generation
+    return _session_cache.sessions
+
+
+def _build_boto_session(force_ec2: bool, region_name: str):
+    """
+    Creates a new boto3 session and returns it with the time
+    (in seconds since the epoch) at which it should stop being reused.
+    """
+    expires_at = time.time() + session_cache_ttl
+
     kwargs = {"region_name": region_name}
     if force_ec2:
         provider = InstanceMetadataProvider(
             iam_role_fetcher=InstanceMetadataFetcher(timeout=1000, num_attempts=2)
         )
-        creds = provider.load().get_frozen_credentials()
+        refreshable_creds = provider.load()
+        creds = refreshable_creds.get_frozen_credentials()
         kwargs["aws_access_key_id"] = creds.access_key
         kwargs["aws_secret_access_key"] = creds.secret_key
         kwargs["aws_session_token"] = creds.token
 
-    return boto3.Session(**kwargs)
+        # The frozen credentials are not refreshed by boto3
+        # so the session can only be reused until they expire
+        expiry_time = getattr(refreshable_creds, "_expiry_time", None)
+        if isinstance(expiry_time, datetime.datetime):
+            expires_at = min(
+                expires_at, expiry_time.timestamp() - _credentials_expiry_margin
+            )
+
+    return boto3.Session(**kwargs), expires_at
+
+
+def clear_session_cache():
+    """
+    Clears the cached boto3 sessions, caller identities and
+    temporary databases known to exist, so the next call
+    creates a new session and calls STS again.
+    """
+    global _session_cache_generation
+    with _session_cache_lock:
+        _session_cache_generation += 1
+        _identity_cache.clear()
+        _known_temp_databases.clear()
+
+
+def _forget_temp_database(database: str):
+    """
+    Removes a database from the set of temporary databases known to
+    exist, so the next temp table call checks for it again.
+    """
+    with _session_cache_lock:
+        for key in [k for k in _known_temp_databases if k[2] == database]:
+            _known_temp_databases.discard(key)
+
+
+def _get_cached_metadata(
+    kind: str,
+    boto3_session,
+    database: Optional[str],
+    table: Optional[str],
+    fetch: Callable,
+    *args,
+    refresh: bool = False,
+):
+    """
+    Returns the result of fetch from the Glue metadata cache, calling
+    it and caching the result for glue_cache_ttl seconds on a miss.
+
+    Args:
+        kind (str): The kind of metadata, used for the hit/miss stats
+        boto3_session: The session fetch uses, whose region and access
+            key are part of the key
+        database (str): The database the metadata is for, if any
+        table (str): The table the metadata is for, if any
+        fetch (Callable): Function that gets the metadata from Glue
+        *args: Any other values the metadata depends on
+        refresh (bool): Always call fetch (and cache its result), for
+            callers that delete data based on the answer
+    """
+    if not glue_cache_enabled:
+        return fetch()
+
+    key = (
+        kind,
+        getattr(boto3_session, "region_name", None),
+        _get_access_key(boto3_session),
+        database.lower() if database else database,
+        table.lower() if table else table,
+        args,
+    )
+    with _glue_cache_lock:
+        stats = _glue_cache_stats.setdefault(kind, {"hits": 0, "misses": 0})
+        cached = _glue_cache.get(key)
+        if not refresh and cached is not None and cached[1] > time.time():
+            stats["hits"] += 1
+            return copy.deepcopy(cached[0])
+        stats["misses"] += 1
+
+    value = fetch()
+    with _glue_cache_lock:
+        _glue_cache[key] = (copy.deepcopy(value), time.time() + glue_cache_ttl)
+    return value
+
+
+def _forget_table(database: str, table: Optional[str] = None):
+    """
+    Removes a table, or every table in a database if table is None,
+    from the Glue metadata cache so the next call asks Glue again.
+    """
+    database = database.lower()
+    table = table.lower() if table is not None else None
+    with _glue_cache_lock:
+        for key in list(_glue_cache):
+            if key[3] == database and (table is None or key[4] in (None, table)):
+                del _glue_cache[key]
+
+
+def _forget_database(database: str):
+    """
+    Removes a database and its tables from the Glue metadata cache.
+    """
+    _forget_table(database)
+    with _glue_cache_lock:
+        for key in list(_glue_cache):
+            if key[0] == "databases":
+                del _glue_cache[key]
+
+
+def clear_glue_cache():
+    """
+    Clears the Glue metadata cache and its hit/miss counts.
+    """
+    with _glue_cache_lock:
+        _glue_cache.clear()
+        _glue_cache_stats.clear()
+
+
+def _query_poll_delays(poll_schedule: Optional[dict] = None) -> Iterator[float]:
+    """
+    Yields the delays in seconds between checks of a running query,
+    following query_poll_schedule updated with poll_schedule.
+    """
+    schedule = {**query_poll_schedule, **(poll_schedule or {})}
+    delay = schedule["initial_delay"]
+    while True:
+        yield delay * (1 - random.uniform(0, schedule["jitter"]))
+        delay = min(delay * schedule["multiplier"], schedule["max_delay"])
+
+
+def _record_query_wait(polls: int, wait_seconds: float) -> None:
+    with _query_poll_stats_lock:
+        _query_poll_stats["queries"] += 1
+        _query_poll_stats["polls"] += polls
+        _query_poll_stats["wait_seconds"] += wait_seconds
+
+
+def get_query_poll_stats(reset: bool = False) -> dict:
+    """
+    Returns the number of queries pydbtools has waited for, the number
+    of times it checked their state and the total time spent waiting.
+
+    Args:
+        reset (bool, optional): Set the counts back to zero after
+            returning them. Defaults to False.
+
+    Returns:
+        A dict such as {"queries": 3, "polls": 14, "wait_seconds": 12.5}
+    """
+    with _query_poll_stats_lock:
+        stats = dict(_query_poll_stats)
+        if reset:
+            _query_poll_stats.update(queries=0, polls=0, wait_seconds=0.0)
+    return stats
+
+
+def get_glue_cache_stats() -> dict:
+    """
+    Returns the number of hits and misses of the Glue metadata cache
+    since it was last cleared, for each kind of metadata and in total.
+
+    Returns:
+        A dict such as
+        {"table": {"hits": 10, "misses": 2}, ..., "total": {"hits": 15, "misses": 6}}
+    """
+    with _glue_cache_lock:
+        stats = {kind: dict(counts) for kind, counts in _glue_cache_stats.items()}
+    stats["total"] = {
+        "hits": sum(counts["hits"] for counts in stats.values()),
+        "misses": sum(counts["misses"] for counts in stats.values()),
+    }
+    return stats
+
+
+def _database_exists(database: str, boto3_session, refresh: bool = False) -> bool:
+    """
+    Checks if a database exists in the Glue catalog
+    with a single (cached) GetDatabase call. Set refresh
+    to ask Glue again rather than use a cached answer.
+    """
+
+    def fetch():
+        glue_client = boto3_session.client("glue")
+        try:
+            glue_client.get_database(Name=database)
+        except glue_client.exceptions.EntityNotFoundException:
+            return False
+        return True
+
+    return _get_cached_metadata(
+        "database", boto3_session, database, None, fetch, refresh=refresh
+    )
+
+
+def _get_databases(boto3_session) -> list:
+    """
+    Returns the names of the databases in the Glue catalog.
+    """
+    return _get_cached_metadata(
+        "databases",
+        boto3_session,
+        None,
+        None,
+        lambda: [
+            db["Name"] for db in wr.catalog.get_databases(boto3_session=boto3_session)
+        ],
+    )
+
+
+def _get_glue_table(
+    database: str, table: str, boto3_session, refresh: bool = False
+) -> Optional[dict]:
+    """
+    Gets a table's definition from the Glue catalog
+    with a single (cached) GetTable call. Set refresh
+    to ask Glue again rather than use a cached answer.
+
+    Returns:
+        The Glue table, or None if the table does not exist.
+    """
+
+    def fetch():
+        glue_client = boto3_session.client("glue")
+        try:
+            return glue_client.get_table(DatabaseName=database, Name=table)["Table"]
+        except glue_client.exceptions.EntityNotFoundException:
+            return None
+
+    return _get_cached_metadata(
+        "table", boto3_session, database, table, fetch, refresh=refresh
+    )
+
+
+def _get_partitions(
+    database: str,
+    table: str,
+    expression: Optional[str],
+    boto3_session,
+    refresh: bool = False,
+) -> dict:
+    """
+    Returns the location and values of the partitions of
+    a table matching an expression. See wr.catalog.get_partitions.
+    Set refresh to ask Glue again rather than use a cached answer.
+    """
+    return _get_cached_metadata(
+        "partitions",
+        boto3_session,
+        database,
+        table,
+        lambda: wr.catalog.get_partitions(
+            database, table, expression=expression, boto3_session=boto3_session
+        ),
+        expression,
+        refresh=refresh,
+    )
 
 
 def get_boto_client(
@@ -298,5 +897,30 @@ def get_boto_client(
 
 
 def get_table_location(database: str, table: str, **kwargs):
-    path = wr.catalog.get_table_location(database, table, **kwargs)
+    boto3_session = kwargs.pop("boto3_session", None)
+    if kwargs:
+        path = wr.catalog.get_table_location(
+            database, table, boto3_session=boto3_session, **kwargs
+        )
+    else:
+        glue_table = _get_glue_table(
+            database, table, boto3_session or get_boto_session()
+        )
+        if glue_table is None:
+            raise wr.exceptions.InvalidTable(f"{database}.{table}")
+        path = glue_table["StorageDescriptor"]["Location"]
     return path if path.endswith("/") else path + "/"
+
+
+def _get_arrow_s3_filesystem(boto3_session) -> pyarrow.fs.S3FileSystem:
+    """
+    Returns a pyarrow S3 filesystem that uses the
+    credentials and region of a boto3 session.
+    """
+    creds = boto3_session.get_credentials().get_frozen_credentials()
+    return pyarrow.fs.S3FileSystem(
+        access_key=creds.access_key,
+        secret_key=creds.secret_key,
+        session_token=creds.token,
+        region=boto3_session.region_name,
+    )
@@ -11,3 +11,13 @@ def sql_dict():
             with open(os.path.join("tests/data/", fn)) as f:
                 sql_dict[fn.split(".")[0]] = "".join(f.readlines())
     return sql_dict
+
+
+# The Glue metadata cache is global, so stop tests reading each other's entries
+@pytest.fixture(autouse=True)
+def glue_cache():
+    import pydbtools as pydb
+
+    pydb.utils.clear_glue_cache()
+    yield
+    pydb.utils.clear_glue_cache()
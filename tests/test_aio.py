@@ -0,0 +1,194 @@
+import asyncio
+
+import awswrangler as wr
+import pandas as pd
+import pytest
+
+import pydbtools as pydb
+import pydbtools.aio as aio
+
+
+class MockAthenaClient:
+    """Queries succeed (or fail) after a number of polls."""
+
+    def __init__(self, polls=2, final_state="SUCCEEDED"):
+        self.polls = polls
+        self.final_state = final_state
+        self.calls = {}
+        self.stopped = []
+
+    def get_query_execution(self, QueryExecutionId):
+        n = self.calls[QueryExecutionId] = self.calls.get(QueryExecutionId, 0) + 1
+        state = self.final_state if n > self.polls else "RUNNING"
+        return {
+            "QueryExecution": {
+                "QueryExecutionId": QueryExecutionId,
+                "Status": {"State": state, "StateChangeReason": "reason"},
+            }
+        }
+
+    def stop_query_execution(self, QueryExecutionId):
+        self.stopped.append(QueryExecutionId)
+
+
+class MockSession:
+    region_name = "eu-west-1"
+
+    def __init__(self, client):
+        self._client = client
+
+    def client(self, service_name):
+        return self._client
+
+
+@pytest.fixture
+def athena(monkeypatch):
+    client = MockAthenaClient()
+    monkeypatch.setitem(pydb.utils.query_poll_schedule, "initial_delay", 0)
+    monkeypatch.setattr(
+        "pydbtools._wrangler.get_boto_session",
+        lambda *args, **kwargs: MockSession(client),
+    )
+    monkeypatch.setattr(
+        "pydbtools._wrangler.get_user_id_and_table_dir",
+        lambda *args, **kwargs: ("user_pytest", "s3://dummy/path/"),
+    )
+    monkeypatch.setattr(
+        "pydbtools._wrangler.get_database_name_from_userid",
+        lambda user_id: "mojap_de_temp_pytest",
+    )
+    monkeypatch.setattr(
+        "pydbtools._wrangler._create_temp_database", lambda *args, **kwargs: None
+    )
+    return client
+
+
+def test_wait_query(athena):
+    async def main():
+        return await asyncio.gather(
+            *(aio.wait_query(f"id{i}", MockSession(athena)) for i in range(20))
+        )
+
+    executions = asyncio.run(main())
+    assert [e["QueryExecutionId"] for e in executions] == [f"id{i}" for i in range(20)]
+    assert all(e["Status"]["State"] == "SUCCEEDED" for e in executions)
+    assert athena.calls == {f"id{i}": 3 for i in range(20)}
+
+
+@pytest.mark.parametrize(
+    "final_state, error",
+    [
+        ("FAILED", wr.exceptions.QueryFailed),
+        ("CANCELLED", wr.exceptions.QueryCancelled),
+    ],
+)
+def test_wait_query_failure(athena, final_state, error):
+    athena.final_state = final_state
+    with pytest.raises(error, match="reason"):
+        asyncio.run(aio.wait_query("id", MockSession(athena)))
+
+
+def test_wait_query_task_cancelled(athena):
+    athena.polls = 1000
+
+    async def main():
+        task = asyncio.create_task(aio.wait_query("id", MockSession(athena)))
+        while not athena.calls:
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert athena.stopped == ["id"]
+
+
+def test_read_sql_query(athena, monkeypatch):
+    started = {}
+
+    def start_query_execution(sql, database, s3_output, boto3_session, **kwargs):
+        query_execution_id = f"id{len(started)}"
+        started[query_execution_id] = (sql, database, s3_output)
+        return query_execution_id
+
+    def get_query_results(query_execution_id, boto3_session, **kwargs):
+        return pd.DataFrame({"id": [query_execution_id]})
+
+    monkeypatch.setattr(aio.ath, "start_query_execution", start_query_execution)
+    monkeypatch.setattr(aio.ath, "get_query_results", get_query_results)
+
+    async def main():
+        return await asyncio.gather(
+            *(
+                aio.read_sql_query(f"SELECT {i} FROM __temp__.t", ctas_approach=False)
+                for i in range(10)
+            )
+        )
+
+    dfs = asyncio.run(main())
+    assert sorted(df["id"][0] for df in dfs) == [f"id{i}" for i in range(10)]
+    assert sorted(started.values()) == [
+        (
+            f"SELECT {i} FROM mojap_de_temp_pytest.t",
+            "mojap_de_temp_pytest",
+            "s3://dummy/path/",
+        )
+        for i in range(10)
+    ]
+
+
+def test_read_sql_query_ctas(athena, monkeypatch):
+    events = []
+
+    def start_ctas_query(sql, database, s3_output, boto3_session, **kwargs):
+        events.append(("start", sql, database, s3_output))
+        return {"ctas_query_id": "ctas_id", "ctas_table": "t", "ctas_database": "d"}
+
+    monkeypatch.setattr(aio, "_start_ctas_query", start_ctas_query)
+    monkeypatch.setattr(
+        aio, "_drop_ctas_table", lambda ctas, session: events.append(("drop",))
+    )
+    monkeypatch.setattr(
+        aio.ath,
+        "get_query_results",
+        lambda query_execution_id, boto3_session, pyarrow_additional_kwargs: (
+            events.append(("read", query_execution_id, pyarrow_additional_kwargs))
+            or pd.DataFrame({"a": [1]})
+        ),
+    )
+
+    df = asyncio.run(aio.read_sql_query("SELECT * FROM db.t"))
+    assert df["a"].tolist() == [1]
+    assert events == [
+        ("start", "SELECT * FROM db.t", "db", "s3://dummy/path/"),
+        (
+            "read",
+            "ctas_id",
+            {"coerce_int96_timestamp_unit": "ms", "timestamp_as_object": True},
+        ),
+        ("drop",),
+    ]
+
+    # The CTAS table is dropped if the query fails
+    events.clear()
+    athena.final_state = "FAILED"
+    with pytest.raises(wr.exceptions.QueryFailed):
+        asyncio.run(aio.read_sql_query("SELECT * FROM db.t"))
+    assert [e[0] for e in events] == ["start", "drop"]
+
+
+def test_create_temp_table(athena, monkeypatch):
+    started = []
+    forgotten = []
+
+    def start_temp_table_query(sql, table_name, boto3_session):
+        started.append((sql, table_name))
+        return "id", "mojap_de_temp_pytest"
+
+    monkeypatch.setattr(aio, "_start_temp_table_query", start_temp_table_query)
+    monkeypatch.setattr(aio, "_forget_table", lambda *args: forgotten.append(args))
+
+    asyncio.run(aio.create_temp_table("SELECT * FROM __temp__.a", "b"))
+    assert started == [("SELECT * FROM mojap_de_temp_pytest.a", "b")]
+    assert forgotten == [("mojap_de_temp_pytest", "b")]
+    assert athena.calls == {"id": 3}
@@ -0,0 +1,119 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from pydbtools import _parquet_dataset
+
+
+class LocalFileSystem:
+    """Writes S3 paths under a local directory, creating directories as needed."""
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def local_path(self, path):
+        return os.path.join(self.root, path.replace("s3://", "", 1))
+
+    def open_output_stream(self, path):
+        path = self.local_path(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return pa.OSFile(path, "wb")
+
+    def open_input_file(self, path):
+        return pa.OSFile(self.local_path(path), "rb")
+
+    def delete_file(self, path):
+        os.remove(self.local_path(path))
+
+
+@pytest.mark.parametrize(
+    "file_size, expected", [(100, 100), ("2KB", 2000), ("1.5 MB", 1_500_000)]
+)
+def test_parse_file_size(file_size, expected):
+    assert _parquet_dataset._parse_file_size(file_size) == expected
+
+
+def test_parse_file_size_invalid():
+    with pytest.raises(ValueError):
+        _parquet_dataset._parse_file_size(0)
+
+
+def test_split_partitions():
+    df = pd.DataFrame({"a": range(6), "p": [1, 2] * 3, "q": ["x"] * 6})
+    parts = list(_parquet_dataset._split_partitions(df, ["p", "q"]))
+    assert [partition for partition, _ in parts] == [
+        [("p", 1), ("q", "x")],
+        [("p", 2), ("q", "x")],
+    ]
+    assert parts[0][1]["a"].tolist() == [0, 2, 4]
+    assert list(parts[0][1].columns) == ["a"]
+
+    [(partition, part)] = _parquet_dataset._split_partitions(df, None)
+    assert partition == []
+    assert part is df
+
+
+def test_sized_parquet_writer(tmp_path):
+    schema = pa.schema([("a", pa.int64())])
+    fs = LocalFileSystem(tmp_path)
+    writer = _parquet_dataset._SizedParquetWriter(
+        "s3://bucket/tbl.parquet", schema, fs, target_file_size=4000
+    )
+    for i in range(50):
+        table = pa.table({"a": list(range(i * 100, i * 100 + 100))})
+        writer.write(table, [("p", i % 2)])
+    writer.close()
+
+    assert writer.partitions_values == {
+        "s3://bucket/tbl.parquet/p=0/": ["0"],
+        "s3://bucket/tbl.parquet/p=1/": ["1"],
+    }
+    assert len(writer.paths) > 2
+    assert all(p.endswith(".snappy.parquet") for p in writer.paths)
+
+    rows = []
+    for path in writer.paths:
+        metadata = pq.ParquetFile(fs.local_path(path)).metadata
+        # Chunks are coalesced rather than written as a row group each
+        assert metadata.num_row_groups < metadata.num_rows / 100
+        rows += pq.read_table(fs.local_path(path))["a"].to_pylist()
+    assert sorted(rows) == list(range(5000))
+
+
+def test_sized_parquet_writer_abort(tmp_path):
+    writer = _parquet_dataset._SizedParquetWriter(
+        "s3://bucket/tbl.parquet",
+        pa.schema([("a", pa.int64())]),
+        LocalFileSystem(tmp_path),
+        target_file_size=1,
+    )
+    writer.write(pa.table({"a": [1, 2, 3]}))
+    writer.write(pa.table({"a": [4, 5, 6]}), [("p", "x")])
+    assert len(writer.paths) == 2
+    writer.abort()
+    assert not any(files for _, _, files in os.walk(tmp_path))
+
+
+def test_sized_parquet_writer_max_open_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(_parquet_dataset, "_max_open_files", 3)
+    monkeypatch.setattr(_parquet_dataset, "_max_buffered_bytes", 1)
+    fs = LocalFileSystem(tmp_path)
+    writer = _parquet_dataset._SizedParquetWriter(
+        "s3://bucket/tbl.parquet",
+        pa.schema([("a", pa.int64())]),
+        fs,
+        target_file_size=10**9,
+    )
+    open_files = []
+    for i in range(100):
+        writer.write(pa.table({"a": [i]}), [("p", i % 10)])
+        open_files.append(len(writer._files))
+    writer.close()
+
+    assert max(open_files) == 3
+    assert writer._files == {}
+    df = pd.read_parquet(fs.local_path("s3://bucket/tbl.parquet/"))
+    assert sorted(df["a"]) == list(range(100))
@@ -0,0 +1,112 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from pydbtools import _result_cache, utils
+
+
+class MockGlueClient:
+    class exceptions:
+        class EntityNotFoundException(Exception):
+            pass
+
+    def __init__(self, update_times):
+        self.update_times = update_times
+
+    def get_table(self, DatabaseName, Name):
+        key = f"{DatabaseName}.{Name}"
+        if key not in self.update_times:
+            raise self.exceptions.EntityNotFoundException()
+        return {"Table": {"UpdateTime": self.update_times[key]}}
+
+
+class MockSession:
+    region_name = "eu-west-1"
+
+    def __init__(self, update_times):
+        self.glue = MockGlueClient(update_times)
+
+    def client(self, name):
+        return self.glue
+
+
+@pytest.fixture
+def cached_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "result_cache_dir", str(tmp_path))
+    monkeypatch.setattr(
+        utils,
+        "get_user_id_and_table_dir",
+        lambda boto3_session: ("user_pytest", "s3://dummy/path/"),
+    )
+    calls = []
+
+    def read_sql_query(sql, database=None, boto3_session=None, **kwargs):
+        calls.append(sql)
+        return pd.DataFrame(
+            {
+                "a": [1, 2],
+                "t": pd.Series([datetime.datetime(2020, 1, 1), None], dtype=object),
+            }
+        )
+
+    return _result_cache.cache_results(read_sql_query), calls
+
+
+def test_cache_results(cached_read):
+    read, calls = cached_read
+    session = MockSession({"db.table": "t1"})
+    pyarrow_kwargs = {"timestamp_as_object": True}
+
+    sql = "SELECT * FROM db.table"
+    df1 = read(sql, boto3_session=session, pyarrow_additional_kwargs=pyarrow_kwargs)
+    df2 = read(
+        "SELECT *\nFROM db.table;",
+        boto3_session=session,
+        pyarrow_additional_kwargs=pyarrow_kwargs,
+    )
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(df1, df2)
+
+    # Table updated in Glue
+    session.glue.update_times["db.table"] = "t2"
+    read(sql, boto3_session=session, pyarrow_additional_kwargs=pyarrow_kwargs)
+    assert len(calls) == 2
+
+    # Unqualified tables use the database
+    read("SELECT * FROM table", database="db", boto3_session=session)
+    read("SELECT * FROM table", database="db", boto3_session=session)
+    assert len(calls) == 3
+
+    # Unknown tables are not cached
+    read("SELECT * FROM db.other", boto3_session=session)
+    read("SELECT * FROM db.other", boto3_session=session)
+    assert len(calls) == 5
+
+    _result_cache.clear_result_cache()
+    read(sql, boto3_session=session, pyarrow_additional_kwargs=pyarrow_kwargs)
+    assert len(calls) == 6
+
+
+def test_cache_results_ttl_and_eviction(cached_read, monkeypatch, tmp_path):
+    read, calls = cached_read
+    session = MockSession({"db.a": "t1", "db.b": "t1"})
+
+    read("SELECT * FROM db.a", boto3_session=session)
+    monkeypatch.setattr(utils, "result_cache_ttl", -1)
+    read("SELECT * FROM db.a", boto3_session=session)
+    assert len(calls) == 2
+
+    monkeypatch.setattr(utils, "result_cache_ttl", 60)
+    monkeypatch.setattr(utils, "result_cache_max_bytes", 1)
+    read("SELECT * FROM db.b", boto3_session=session)
+    assert len(list(tmp_path.glob("*.parquet"))) == 0
+
+
+def test_cache_results_disabled(cached_read, monkeypatch):
+    read, calls = cached_read
+    monkeypatch.setattr(utils, "result_cache_dir", None)
+    session = MockSession({"db.table": "t1"})
+    read("SELECT * FROM db.table", boto3_session=session)
+    read("SELECT * FROM db.table", boto3_session=session)
+    assert len(calls) == 2
@@ -1,7 +1,11 @@
 import pytest
+import sql_metadata
 
 from pydbtools._wrangler import check_sql
-from pydbtools.utils import replace_temp_database_name_reference
+from pydbtools.utils import (
+    get_database_name_from_sql,
+    replace_temp_database_name_reference,
+)
 
 sql1 = """
 with x as (SELECT __TEMP__.y.c1, db.tb.c2
@@ -125,3 +129,106 @@ def test_replace_temp_database_name_reference(test_input: str, expected: bool):
     else:
         sql = replace_temp_database_name_reference(test_input, "dbname")
         assert sql == expected
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        ("SELECT 1", "SELECT 1"),
+        ("  select * from db.x;\n", "select * from db.x;"),
+        (
+            "select * from __temp__.x -- join __temp__.y\nwhere a = 1",
+            "select * from dbname.x -- join __temp__.y\nwhere a = 1",
+        ),
+        (
+            "select * /* from __temp__.y */ from __TEMP__.x",
+            "select * /* from __temp__.y */ from dbname.x",
+        ),
+        (
+            "select 'it''s __temp__.x', my__temp__ from __temp__.x",
+            "select 'it''s __temp__.x', my__temp__ from dbname.x",
+        ),
+        (
+            "select * from __temp__.x join __temp__.y on x.a = y.a",
+            "select * from dbname.x join dbname.y on x.a = y.a",
+        ),
+        ("select * from __temp__.x /* unclosed", "select * from dbname.x /* unclosed"),
+    ],
+)
+def test_replace_temp_database_name_reference_skips(test_input, expected):
+    assert replace_temp_database_name_reference(test_input, "dbname") == expected
+
+
+def sql_metadata_database_name(sql):
+    """The previous implementation, which parses the whole query."""
+    for table in sql_metadata.Parser(sql).tables:
+        xs = table.split(".")
+        if len(xs) > 1:
+            return xs[0]
+    return None
+
+
+@pytest.mark.parametrize("name", ["basic", "buggy", "templated"])
+def test_get_database_name_from_sql_files(sql_dict, name):
+    sql = sql_dict[name]
+    assert get_database_name_from_sql(sql) == sql_metadata_database_name(sql)
+
+
+@pytest.mark.parametrize(
+    "test_input, expected",
+    [
+        (sql1, "__TEMP__"),
+        (sql2, "__temp__"),
+        ("SELECT * FROM a, db.b", "db"),
+        ("SELECT * FROM a ORDER BY c1, db.col", None),
+        ('SELECT * FROM "my-db"."t"', "my-db"),
+        ("SELECT * FROM `db` . `t`", "db"),
+        ("select extract(year from t.d) from db.x", "db"),
+        ("CREATE TABLE IF NOT EXISTS db.t AS SELECT 1", "db"),
+        ("INSERT INTO db.t SELECT * FROM db2.s", "db"),
+        ("SELECT * FROM t WHERE x IN (SELECT y FROM db.z)", "db"),
+        ("select * from a, (select * from b) as c, db.d", "db"),
+        ("SELECT 'from db.x' FROM t -- from db.y", None),
+        ("SELECT a.b FROM t WHERE b.c = 1", None),
+    ],
+)
+def test_get_database_name_from_sql(test_input, expected):
+    assert get_database_name_from_sql(test_input) == expected
+    assert sql_metadata_database_name(test_input) == expected
+
+
+def test_analyse_sql(monkeypatch):
+    import sqlparse
+
+    from pydbtools._wrangler import _parse_temp_table_sql
+    from pydbtools.utils import _analyse_sql
+
+    calls = []
+    parse = sqlparse.parse
+    monkeypatch.setattr(sqlparse, "parse", lambda sql: calls.append(sql) or parse(sql))
+
+    script = """
+    create temp table analysed as (select * from db.analyse_one);
+    select * from __temp__.analysed join db.analyse_two using (id);
+    drop table db.analyse_three
+    """
+    statements = _analyse_sql(script).statements
+    assert [s.statement_type for s in statements] == ["CREATE", "SELECT", "DROP"]
+    assert _parse_temp_table_sql(str(statements[0])) == (
+        "analysed",
+        "select * from db.analyse_one",
+    )
+    # Only the script is parsed to find the statement types
+    assert len(calls) == 1
+    assert statements[1].tables == {"__temp__.analysed", "db.analyse_two"}
+    assert statements[2].clean == "drop table db.analyse_three"
+    n_calls = len(calls)
+
+    # Splitting the script again or analysing one of its statements
+    # reuses the earlier analysis
+    assert _analyse_sql(script).statements == statements
+    assert _analyse_sql(str(statements[1])) is statements[1]
+    assert statements[1].tables == {"__temp__.analysed", "db.analyse_two"}
+    check_sql(str(statements[1]))
+    check_sql(str(statements[1]))
+    assert len(calls) == n_calls + 1
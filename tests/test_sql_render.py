@@ -1,3 +1,5 @@
+from jinja2 import Template
+
 import pydbtools as pydb
 
 
@@ -21,3 +23,45 @@ def test_jinja_get_sql_from_file():
         "tests/data/templated.sql", jinja_args=args
     )
     assert expected == actual
+
+
+def test_render_sql_templates():
+    sql = "SELECT * FROM db.t WHERE dt = '{{ dt }}'"
+    args = [{"dt": "2024-01-01"}, {"dt": "2024-01-02"}]
+    actual = pydb.render_sql_templates(sql, args)
+    assert actual == [
+        "SELECT * FROM db.t WHERE dt = '2024-01-01'",
+        "SELECT * FROM db.t WHERE dt = '2024-01-02'",
+    ]
+    assert pydb.render_sql_templates(sql, []) == []
+
+
+def test_templates_compiled_once(monkeypatch):
+    import pydbtools._sql_render as sql_render
+
+    compiled = []
+    monkeypatch.setattr(
+        sql_render, "Template", lambda sql: compiled.append(sql) or Template(sql)
+    )
+    sql_render._compile_template.cache_clear()
+
+    sql = "SELECT {{ x }}"
+    for x in range(3):
+        assert pydb.render_sql_template(sql, {"x": x}) == f"SELECT {x}"
+    assert pydb.render_sql_templates(sql, [{"x": 3}]) == ["SELECT 3"]
+    assert compiled == [sql]
+
+
+def test_get_sql_from_file_rereads_changed_file(tmp_path):
+    import os
+
+    path = tmp_path / "query.sql"
+    path.write_text("SELECT {{ a }}")
+    assert pydb.get_sql_from_file(str(path), {"a": 1}) == "SELECT 1"
+
+    path.write_text("SELECT {{ a }}, 2")
+    # Make sure the modification time changes on coarse clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert pydb.get_sql_from_file(str(path), {"a": 1}) == "SELECT 1, 2"
+    assert pydb.get_sql_from_file(str(path), encoding="utf-8") == "SELECT {{ a }}, 2"
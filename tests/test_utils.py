@@ -59,3 +59,258 @@ def test_clean_user_id(test_input, expected):
             pydb.utils.get_database_name_from_userid(test_input)
             == f"{pydb.utils.temp_database_name_prefix}{expected}"
         )
+
+
+class MockCredentials:
+    def __init__(self, access_key):
+        self.access_key = access_key
+
+
+class MockIdentity:
+    """
+    Caller identity for mock sessions, as the Glue
+    metadata cache is keyed by it.
+    """
+
+    access_key = "key1"
+    user_id = "abcde:alpha_user_bob"
+
+    def get_credentials(self):
+        return MockCredentials(self.access_key)
+
+    def get_caller_identity(self):
+        return {"UserId": self.user_id}
+
+
+class MockSession:
+    def __init__(self, access_key="key1", user_id="abcde:alpha_user_bob"):
+        self.access_key = access_key
+        self.user_id = user_id
+        self.sts_calls = 0
+
+    def get_credentials(self):
+        return MockCredentials(self.access_key)
+
+    def client(self, name):
+        assert name == "sts"
+        return self
+
+    def get_caller_identity(self):
+        self.sts_calls += 1
+        return {"UserId": self.user_id}
+
+
+@pytest.fixture
+def session_cache(monkeypatch):
+    import pydbtools as pydb
+
+    built = []
+
+    def mock_build_boto_session(force_ec2, region_name):
+        session = MockSession()
+        built.append((force_ec2, region_name))
+        return session, pydb.utils.time.time() + 60
+
+    monkeypatch.setattr("pydbtools.utils._build_boto_session", mock_build_boto_session)
+    monkeypatch.setattr("pydbtools.utils.session_cache_enabled", True)
+    pydb.utils.clear_session_cache()
+    yield built
+    pydb.utils.clear_session_cache()
+
+
+def test_get_boto_session_is_cached(session_cache, monkeypatch):
+    import pydbtools as pydb
+
+    s1 = pydb.utils.get_boto_session(region_name="eu-west-1")
+    s2 = pydb.utils.get_boto_session(region_name="eu-west-1")
+    s3 = pydb.utils.get_boto_session(region_name="eu-west-2")
+    s4 = pydb.utils.get_boto_session(region_name="eu-west-1", force_ec2=True)
+    assert s1 is s2
+    assert s1 is not s3
+    assert s1 is not s4
+    assert len(session_cache) == 3
+
+    pydb.utils.clear_session_cache()
+    assert pydb.utils.get_boto_session(region_name="eu-west-1") is not s1
+
+    monkeypatch.setattr("pydbtools.utils.session_cache_enabled", False)
+    s5 = pydb.utils.get_boto_session(region_name="eu-west-1")
+    s6 = pydb.utils.get_boto_session(region_name="eu-west-1")
+    assert s5 is not s6
+
+
+def test_get_boto_session_per_thread(session_cache):
+    import gc
+    import threading
+    import weakref
+
+    import pydbtools as pydb
+
+    main = pydb.utils.get_boto_session(region_name="eu-west-1")
+    other = []
+
+    def get_session():
+        other.append(weakref.ref(pydb.utils.get_boto_session(region_name="eu-west-1")))
+
+    thread = threading.Thread(target=get_session)
+    thread.start()
+    thread.join()
+    gc.collect()
+    # Each thread gets its own session, which is dropped when it ends
+    assert len(session_cache) == 2
+    assert other[0]() is None
+    assert pydb.utils.get_boto_session(region_name="eu-west-1") is main
+
+
+def test_get_boto_session_refreshes_expired(session_cache, monkeypatch):
+    import pydbtools as pydb
+
+    s1 = pydb.utils.get_boto_session(region_name="eu-west-1")
+    now = pydb.utils.time.time()
+    monkeypatch.setattr("pydbtools.utils.time.time", lambda: now + 120)
+    s2 = pydb.utils.get_boto_session(region_name="eu-west-1")
+    assert s1 is not s2
+
+
+def test_get_user_id_and_table_dir_is_cached(session_cache, monkeypatch):
+    import pydbtools as pydb
+
+    monkeypatch.setattr("pydbtools.utils.bucket", "a-bucket")
+    session = MockSession()
+    expected = ("abcde:alpha_user_bob", "s3://a-bucket/abcde:alpha_user_bob/")
+    assert pydb.utils.get_user_id_and_table_dir(session) == expected
+    assert pydb.utils.get_user_id_and_table_dir(session) == expected
+    assert session.sts_calls == 1
+
+    # Refreshed credentials trigger a new lookup
+    session.access_key = "key2"
+    assert pydb.utils.get_user_id_and_table_dir(session) == expected
+    assert session.sts_calls == 2
+
+    monkeypatch.setattr("pydbtools.utils.session_cache_enabled", False)
+    pydb.utils.get_user_id_and_table_dir(session)
+    assert session.sts_calls == 3
+
+
+class MockGlueTables(MockIdentity):
+    class exceptions:
+        class EntityNotFoundException(Exception):
+            pass
+
+    region_name = "eu-west-1"
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.calls = 0
+
+    def client(self, name):
+        return self
+
+    def get_table(self, DatabaseName, Name):
+        self.calls += 1
+        if Name not in self.tables.get(DatabaseName, []):
+            raise self.exceptions.EntityNotFoundException()
+        return {"Table": {"Name": Name, "DatabaseName": DatabaseName}}
+
+
+def test_glue_cache_tables(monkeypatch):
+    from pydbtools import utils
+
+    session = MockGlueTables({"db": ["a"], "db2": ["a"]})
+
+    assert utils._get_glue_table("db", "a", session) is not None
+    assert utils._get_glue_table("DB", "A", session) is not None
+    assert utils._get_glue_table("db", "b", session) is None
+    assert utils._get_glue_table("db", "b", session) is None
+    assert utils._get_glue_table("db2", "a", session) is not None
+    assert session.calls == 3
+
+    utils._forget_table("db", "b")
+    session.tables["db"].append("b")
+    assert utils._get_glue_table("db", "b", session) is not None
+    assert utils._get_glue_table("db", "a", session) is not None
+    assert session.calls == 4
+
+    utils._forget_table("db")
+    assert utils._get_glue_table("db", "a", session) is not None
+    assert utils._get_glue_table("db2", "a", session) is not None
+    assert session.calls == 5
+
+    assert utils.get_glue_cache_stats() == {
+        "table": {"hits": 4, "misses": 5},
+        "total": {"hits": 4, "misses": 5},
+    }
+
+    monkeypatch.setattr(utils, "glue_cache_ttl", 0)
+    utils.clear_glue_cache()
+    utils._get_glue_table("db2", "a", session)
+    utils._get_glue_table("db2", "a", session)
+    assert session.calls == 7
+
+    monkeypatch.setattr(utils, "glue_cache_ttl", 30)
+    monkeypatch.setattr(utils, "glue_cache_enabled", False)
+    utils._get_glue_table("db2", "a", session)
+    utils._get_glue_table("db2", "a", session)
+    assert session.calls == 9
+    assert utils.get_glue_cache_stats()["total"] == {"hits": 0, "misses": 2}
+
+
+def test_glue_cache_identity_and_refresh():
+    from pydbtools import utils
+
+    session = MockGlueTables({"db": []})
+    other = MockGlueTables({"db": ["a"]})
+    other.access_key = "other_key"
+    other.user_id = "other_account_user"
+
+    # Sessions for other callers in the same region do not share entries
+    assert utils._get_glue_table("db", "a", session) is None
+    assert utils._get_glue_table("db", "a", other) is not None
+
+    # Refreshing ignores the cached answer and replaces it
+    session.tables["db"].append("a")
+    assert utils._get_glue_table("db", "a", session) is None
+    assert utils._get_glue_table("db", "a", session, refresh=True) is not None
+    assert utils._get_glue_table("db", "a", session) is not None
+    assert session.calls == 2
+
+
+def test_glue_cache_without_session_cache(monkeypatch):
+    from pydbtools import utils
+
+    def get_user_id(boto3_session):
+        raise AssertionError("STS called")
+
+    monkeypatch.setattr(utils, "session_cache_enabled", False)
+    monkeypatch.setattr(utils, "_get_user_id", get_user_id)
+    session = MockGlueTables({"db": ["a"]})
+
+    # Entries are keyed by the access key, so lookups don't call STS
+    assert utils._get_glue_table("db", "a", session) is not None
+    assert utils._get_glue_table("db", "a", session) is not None
+    assert session.calls == 1
+
+
+def test_glue_cache_databases(monkeypatch):
+    from pydbtools import utils
+
+    calls = []
+
+    def get_databases(boto3_session):
+        calls.append(None)
+        return [{"Name": "db"}]
+
+    monkeypatch.setattr(utils.wr.catalog, "get_databases", get_databases)
+    session = MockGlueTables({"db": ["a"]})
+
+    assert utils._get_databases(session) == ["db"]
+    assert utils._get_glue_table("db", "a", session) is not None
+    utils._get_databases(session).append("mutated")
+    assert utils._get_databases(session) == ["db"]
+    assert len(calls) == 1
+
+    utils._forget_database("db")
+    assert utils._get_databases(session) == ["db"]
+    assert utils._get_glue_table("db", "a", session) is not None
+    assert len(calls) == 2
+    assert session.calls == 2
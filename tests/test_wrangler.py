@@ -1,6 +1,7 @@
 import pytest
 
 from pydbtools._wrangler import init_athena_params
+from tests.test_utils import MockIdentity
 
 
 def mock_get_user_id_and_table_dir(
@@ -183,3 +184,1634 @@ def test_init_athena_params(
             assert out["ctas_approach"] == fun_params.get(
                 "ctas_approach", False
             )
+
+
+class MockGlueSession:
+    region_name = "eu-west-1"
+
+
+@pytest.mark.parametrize("db_exists", [True, False])
+def test_create_temp_database_is_remembered(db_exists, monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    events = []
+    monkeypatch.setattr(
+        wrangler,
+        "get_user_id_and_table_dir",
+        lambda **kwargs: ("abcde:alpha_user_bob", "s3://dummy/path/"),
+    )
+    monkeypatch.setattr(
+        wrangler,
+        "_database_exists",
+        lambda database, boto3_session: events.append("glue") or db_exists,
+    )
+    monkeypatch.setattr(
+        wrangler.ath,
+        "start_query_execution",
+        lambda sql, **kwargs: events.append(sql) or "qid",
+    )
+    monkeypatch.setattr(wrangler, "_wait_query", lambda *args, **kwargs: {})
+    wrangler._known_temp_databases.clear()
+
+    db_name = wrangler.get_database_name_from_userid("abcde:alpha_user_bob")
+    session = MockGlueSession()
+    for _ in range(3):
+        wrangler._create_temp_database(boto3_session=session)
+
+    expected = ["glue"]
+    if not db_exists:
+        expected.append(f"CREATE DATABASE IF NOT EXISTS {db_name}")
+    assert events == expected
+
+    # Dropping the database means it is checked for again
+    wrangler._forget_temp_database(db_name)
+    wrangler._create_temp_database(boto3_session=session)
+    assert events == expected + ["glue"] + expected[1:]
+    wrangler._known_temp_databases.clear()
+
+
+def test_init_athena_params_passes_var_args(monkeypatch):
+    setup_kwargs = []
+    monkeypatch.setattr(
+        "pydbtools._wrangler.get_boto_session",
+        lambda **kwargs: setup_kwargs.append(kwargs) or "session",
+    )
+
+    @init_athena_params
+    def fun_var_args(query_id, *args, **kwargs):
+        return query_id, args, kwargs
+
+    out = fun_var_args("qid", 1, 2, force_ec2=True, workgroup="wg")
+    assert out == ("qid", (1, 2), {"workgroup": "wg", "boto3_session": "session"})
+    assert setup_kwargs == [{"force_ec2": True, "region_name": None}]
+
+
+def test_init_athena_params_sets_pyarrow_kwargs(monkeypatch):
+    monkeypatch.setattr(
+        "pydbtools._wrangler.get_boto_session", lambda **kwargs: "session"
+    )
+
+    @init_athena_params
+    def fun_pyarrow(boto3_session=None, pyarrow_additional_kwargs=None):
+        return pyarrow_additional_kwargs
+
+    assert fun_pyarrow() == {
+        "coerce_int96_timestamp_unit": "ms",
+        "timestamp_as_object": True,
+    }
+    assert fun_pyarrow(pyarrow_additional_kwargs={"a": 1}) == {"a": 1}
+
+
+script = """
+create temp table A as (
+    select * from database.table1
+    where year = 2021
+);
+
+create temp table B as (
+    select * from database.table2
+    where amount > 10
+);
+
+select * from __temp__.A
+left join __temp__.B
+on A.id = B.id;
+
+select * from database.table3;
+
+drop table database.table4;
+
+select * from __temp__.b;
+"""
+
+
+def test_get_statement_dependencies():
+    import sqlparse
+
+    from pydbtools._wrangler import _get_statement_dependencies
+
+    queries = sqlparse.parse(script)
+    assert _get_statement_dependencies(queries) == [
+        set(),
+        set(),
+        {0, 1},
+        set(),
+        {0, 1, 2, 3},
+        {1, 4},
+    ]
+
+
+@pytest.mark.parametrize("max_concurrency", [None, 1, 4])
+def test_read_sql_queries_gen_concurrent(max_concurrency, monkeypatch):
+    import threading
+
+    import pydbtools._wrangler as wrangler
+
+    events = []
+    lock = threading.Lock()
+
+    def log(event):
+        with lock:
+            events.append(event)
+
+    monkeypatch.setattr(
+        wrangler, "create_temp_table", lambda sql, table_name: log(table_name)
+    )
+    monkeypatch.setattr(
+        wrangler,
+        "read_sql_query",
+        lambda sql, **kwargs: log(sql) or sql.split()[-1],
+    )
+    monkeypatch.setattr(
+        wrangler, "start_query_execution_and_wait", lambda sql: log(sql)
+    )
+
+    results = list(
+        wrangler.read_sql_queries_gen(script, max_concurrency=max_concurrency)
+    )
+    assert results == ["B.id;", "database.table3;", "__temp__.b;"]
+    assert len(events) == 6
+    join_query = next(e for e in events if e.endswith("B.id;"))
+    assert events.index("A") < events.index(join_query)
+    assert events.index("B") < events.index(join_query)
+    assert events[4].strip() == "drop table database.table4;"
+
+
+def test_read_sql_queries_gen_concurrent_failure(monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    ran = []
+
+    def create_temp_table(sql, table_name):
+        if table_name == "B":
+            raise ValueError("Query failed")
+        ran.append(table_name)
+
+    monkeypatch.setattr(wrangler, "create_temp_table", create_temp_table)
+    monkeypatch.setattr(
+        wrangler, "read_sql_query", lambda sql, **kwargs: ran.append(sql) or sql
+    )
+    monkeypatch.setattr(
+        wrangler, "start_query_execution_and_wait", lambda sql: ran.append(sql)
+    )
+
+    gen = wrangler.read_sql_queries_gen(script, max_concurrency=4)
+    with pytest.raises(ValueError, match="Query failed"):
+        list(gen)
+    # Only statements that do not depend on B have run
+    assert "A" in ran
+    assert not any("__temp__.b" in q.lower() for q in ran if q != "A")
+    assert not any("drop table" in q for q in ran)
+
+
+def test_init_athena_params_result_reuse(monkeypatch):
+    monkeypatch.setattr("pydbtools._wrangler.get_boto_session", get_empty_boto_log)
+    monkeypatch.setattr(
+        "pydbtools._wrangler.get_user_id_and_table_dir",
+        mock_get_user_id_and_table_dir,
+    )
+    monkeypatch.setattr(
+        "pydbtools._wrangler.get_database_name_from_userid",
+        lambda user_id: "mojap_de_temp_pytest",
+    )
+    monkeypatch.setattr(
+        "pydbtools._wrangler._create_temp_database", mock_create_temp_database
+    )
+
+    @init_athena_params
+    def fun_with_reuse(
+        sql=None,
+        database=None,
+        ctas_approach=None,
+        result_reuse_configuration=None,
+        boto3_session=None,
+    ):
+        return locals()
+
+    out = fun_with_reuse("SELECT * FROM db.tb", result_reuse_max_age=60)
+    assert out["ctas_approach"] is False
+    assert out["database"] == "db"
+    assert out["result_reuse_configuration"] == {
+        "ResultReuseByAgeConfiguration": {"Enabled": True, "MaxAgeInMinutes": 60}
+    }
+
+    out = fun_with_reuse("SELECT * FROM db.tb")
+    assert out["ctas_approach"] is True
+    assert out["database"] == "mojap_de_temp_pytest"
+    assert out["result_reuse_configuration"] is None
+
+
+@pytest.mark.parametrize(
+    "result, expected",
+    [
+        ({}, False),
+        ({"Statistics": {"ResultReuseInformation": {}}}, False),
+        (
+            {"Statistics": {"ResultReuseInformation": {"ReusedPreviousResult": True}}},
+            True,
+        ),
+    ],
+)
+def test_was_result_reused(result, expected):
+    import warnings
+
+    import pandas as pd
+
+    from pydbtools._wrangler import was_result_reused
+
+    assert was_result_reused(result) == expected
+
+    df = pd.DataFrame()
+    assert was_result_reused(df) is False
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=UserWarning)
+        df.query_metadata = result
+    assert was_result_reused(df) == expected
+
+
+def test_read_parquet_batches(tmp_path, monkeypatch):
+    import datetime
+
+    import pyarrow as pa
+    import pyarrow.fs
+    import pyarrow.parquet as pq
+
+    import pydbtools._wrangler as wrangler
+
+    monkeypatch.setattr(
+        wrangler,
+        "_get_arrow_s3_filesystem",
+        lambda boto3_session: pyarrow.fs.LocalFileSystem(),
+    )
+    table = pa.table(
+        {
+            "a": list(range(25)),
+            "t": [datetime.datetime(2020, 1, 1)] * 25,
+        }
+    )
+    paths = []
+    for i in range(2):
+        path = str(tmp_path / f"{i}.parquet")
+        pq.write_table(table, path, use_deprecated_int96_timestamps=True)
+        paths.append("s3://" + path)
+
+    batches = list(
+        wrangler._read_parquet_batches(
+            paths, 10, None, {"coerce_int96_timestamp_unit": "ms"}
+        )
+    )
+    assert [b.num_rows for b in batches] == [10, 10, 5, 10, 10, 5]
+    assert batches[0].schema.field("t").type == pa.timestamp("ms")
+
+
+class MockS3Client:
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.copied = []
+
+    def get_object(self, Bucket, Key):
+        import io
+
+        return {"Body": io.BytesIO(self.manifest.encode())}
+
+    def download_file(self, bucket, key, target):
+        import shutil
+
+        shutil.copy(f"{bucket}/{key}", target)
+
+    def copy(self, source, bucket, key):
+        self.copied.append((source, bucket, key))
+
+
+class MockS3Session:
+    region_name = "eu-west-1"
+
+    def __init__(self, manifest):
+        self.s3 = MockS3Client(manifest)
+
+    def client(self, name):
+        return self.s3
+
+
+@pytest.fixture
+def unload_files(tmp_path, monkeypatch):
+    import types
+
+    import pyarrow as pa
+    import pyarrow.fs
+    import pyarrow.parquet as pq
+
+    import pydbtools._wrangler as wrangler
+
+    src = tmp_path / "src"
+    src.mkdir()
+    paths = []
+    for i in range(2):
+        path = str(src / f"part_{i}")
+        pq.write_table(pa.table({"a": list(range(10 * i, 10 * i + 10))}), path)
+        paths.append("s3://" + path)
+    session = MockS3Session("\n".join(paths))
+    unloads = []
+
+    monkeypatch.setattr(wrangler, "get_boto_session", lambda **kwargs: session)
+    monkeypatch.setattr(
+        wrangler,
+        "get_user_id_and_table_dir",
+        lambda boto3_session: ("user_pytest", "s3://dummy/path/"),
+    )
+    monkeypatch.setattr(
+        wrangler, "get_database_name_from_userid", lambda user_id: "temp_db"
+    )
+    monkeypatch.setattr(
+        wrangler.ath,
+        "unload",
+        lambda sql, **kwargs: unloads.append((sql, kwargs))
+        or types.SimpleNamespace(manifest_location="s3://bucket/manifest.csv"),
+    )
+    monkeypatch.setattr(wrangler.wr.s3, "delete_objects", lambda *a, **k: None)
+    monkeypatch.setattr(
+        wrangler,
+        "_get_arrow_s3_filesystem",
+        lambda boto3_session: pyarrow.fs.LocalFileSystem(),
+    )
+    return session, unloads, tmp_path
+
+
+def test_save_query_to_parquet_unload_rewrite(unload_files):
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    import pydbtools._wrangler as wrangler
+
+    session, unloads, tmp_path = unload_files
+    out = str(tmp_path / "out.parquet")
+    wrangler.save_query_to_parquet(
+        "SELECT * FROM __temp__.x",
+        out,
+        unload_approach=True,
+        compression="zstd",
+        row_group_size=4,
+    )
+    assert unloads[0][0] == "SELECT * FROM temp_db.x"
+    assert unloads[0][1]["compression"] == "ZSTD"
+    assert unloads[0][1]["path"].startswith("s3://dummy/path/__unload__/")
+
+    metadata = pq.ParquetFile(out).metadata
+    assert metadata.num_row_groups == 6
+    assert metadata.row_group(0).column(0).compression == "ZSTD"
+    assert pd.read_parquet(out)["a"].tolist() == list(range(20))
+
+
+def test_save_query_to_parquet_unload_copy(unload_files):
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    session, unloads, tmp_path = unload_files
+    out_dir = str(tmp_path / "out") + "/"
+    wrangler.save_query_to_parquet("SELECT * FROM db.x", out_dir, unload_approach=True)
+    assert sorted(p.name for p in (tmp_path / "out").iterdir()) == [
+        "part_0.parquet",
+        "part_1.parquet",
+    ]
+    assert sorted(pd.read_parquet(out_dir)["a"].tolist()) == list(range(20))
+
+    wrangler.save_query_to_parquet(
+        "SELECT * FROM db.x", "s3://other-bucket/out/", unload_approach=True
+    )
+    assert [c[1:] for c in session.s3.copied] == [
+        ("other-bucket", "out/part_0.parquet"),
+        ("other-bucket", "out/part_1.parquet"),
+    ]
+
+
+@pytest.fixture
+def arrow_read(tmp_path, monkeypatch):
+    import pyarrow as pa
+    import pyarrow.fs
+    import pyarrow.parquet as pq
+
+    import pydbtools._wrangler as wrangler
+
+    paths = []
+    for i in range(2):
+        path = str(tmp_path / f"{i}.parquet")
+        pq.write_table(pa.table({"a": list(range(10 * i, 10 * i + 10))}), path)
+        paths.append("s3://" + path)
+    ctas_queries = []
+    monkeypatch.setattr(
+        wrangler,
+        "_run_ctas_query",
+        lambda sql, *args, **kwargs: ctas_queries.append(sql) or (paths, None),
+    )
+    monkeypatch.setattr(
+        wrangler,
+        "_get_arrow_s3_filesystem",
+        lambda boto3_session: pyarrow.fs.LocalFileSystem(),
+    )
+
+    def read_sql_table(table, database, chunksize=None, boto3_session=None):
+        return "pandas"
+
+    return wrangler._read_arrow_results(read_sql_table), ctas_queries
+
+
+def test_read_arrow_results(arrow_read):
+    import pyarrow as pa
+
+    read, ctas_queries = arrow_read
+    assert read("tb", "db") == "pandas"
+    assert ctas_queries == []
+
+    table = read("tb", "db", return_type="arrow")
+    assert isinstance(table, pa.Table)
+    assert table.column("a").to_pylist() == list(range(20))
+    assert ctas_queries == ['SELECT * FROM "db"."tb"']
+
+    batches = list(read("tb", "db", chunksize=4, return_type="arrow"))
+    assert [b.num_rows for b in batches] == [4, 4, 2, 4, 4, 2]
+
+    with pytest.raises(ValueError):
+        read("tb", "db", return_type="numpy")
+
+
+def test_read_arrow_results_polars(arrow_read):
+    pl = pytest.importorskip("polars")
+
+    read, _ = arrow_read
+    df = read("tb", "db", return_type="polars")
+    assert isinstance(df, pl.DataFrame)
+    assert df["a"].to_list() == list(range(20))
+
+
+def test_read_arrow_results_empty(monkeypatch):
+    import pyarrow as pa
+
+    import pydbtools._wrangler as wrangler
+
+    calls = []
+    ctas = {
+        "ctas_database": "temp_db",
+        "ctas_table": "temp_table",
+        "ctas_query_metadata": type("Metadata", (), {"manifest_location": None}),
+    }
+    monkeypatch.setattr(
+        wrangler,
+        "_start_ctas_query",
+        lambda *args, **kwargs: calls.append("start") or ctas,
+    )
+    monkeypatch.setattr(wrangler, "_read_manifest", lambda *args: [])
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "get_table_types",
+        lambda database, table, boto3_session: {"a": "bigint", "b": "varchar(3)"},
+    )
+    monkeypatch.setattr(
+        wrangler, "_drop_ctas_table", lambda ctas, session: calls.append("drop")
+    )
+
+    def read_sql_query(sql, database, boto3_session=None):
+        raise AssertionError("query run again")
+
+    # The schema comes from the CTAS table before it is dropped
+    table = wrangler._read_arrow_results(read_sql_query)(
+        "SELECT a, b FROM db.t WHERE false", "db", return_type="arrow"
+    )
+    assert table.num_rows == 0
+    assert table.schema == pa.schema([("a", pa.int64()), ("b", pa.string())])
+    assert calls == ["start", "drop"]
+
+
+@pytest.fixture
+def chunk_upload(monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    calls = {
+        "to_parquet": [],
+        "create": [],
+        "partitions": [],
+        "delete": [],
+        "glue_table": None,
+    }
+
+    def to_parquet(df, **kwargs):
+        calls["to_parquet"].append((df, kwargs))
+        if (df["a"] < 0).any():
+            raise ValueError("bad chunk")
+        return {
+            "paths": [kwargs["path"] + f"{df['a'].iloc[0]}.parquet"],
+            "partitions_values": {
+                kwargs["path"] + f"p={p}/": [str(p)] for p in df["p"].unique()
+            },
+        }
+
+    monkeypatch.setattr(
+        wrangler, "_thread_session_factory", lambda session: lambda: session
+    )
+    monkeypatch.setattr(wrangler.wr.s3, "to_parquet", to_parquet)
+    monkeypatch.setattr(
+        wrangler.wr.s3,
+        "delete_objects",
+        lambda path, **kwargs: calls["delete"].append(path),
+    )
+    monkeypatch.setattr(wrangler, "get_boto_session", lambda: "session")
+    monkeypatch.setattr(wrangler, "_get_glue_table", lambda *args: calls["glue_table"])
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "create_parquet_table",
+        lambda **kwargs: calls["create"].append(kwargs),
+    )
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "add_parquet_partitions",
+        lambda **kwargs: calls["partitions"].append(kwargs),
+    )
+    return calls
+
+
+@pytest.mark.parametrize("mode", ["overwrite", "append"])
+def test_upload_chunks_to_table(chunk_upload, mode):
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    chunks = [pd.DataFrame({"a": [i, i + 1], "p": [i % 3] * 2}) for i in range(10)]
+    wrangler._upload_chunks_to_table(
+        iter(chunks),
+        "db",
+        "tbl",
+        "s3://bucket/tbl/",
+        mode=mode,
+        partition_cols=["p"],
+        max_concurrency=3,
+        boto3_session=None,
+    )
+
+    assert len(chunk_upload["to_parquet"]) == 10
+    assert all(
+        kwargs["mode"] == "append"
+        and "database" not in kwargs
+        and kwargs["dtype"] == {"a": "bigint"}
+        for _, kwargs in chunk_upload["to_parquet"]
+    )
+    assert chunk_upload["delete"] == (
+        ["s3://bucket/tbl/tbl.parquet/"] if mode == "overwrite" else []
+    )
+    assert len(chunk_upload["create"]) == 1
+    assert chunk_upload["create"][0]["mode"] == mode
+    assert chunk_upload["create"][0]["columns_types"] == {"a": "bigint"}
+    assert chunk_upload["create"][0]["partitions_types"] == {"p": "bigint"}
+    assert len(chunk_upload["partitions"]) == 1
+    assert sorted(chunk_upload["partitions"][0]["partitions_values"].values()) == [
+        ["0"],
+        ["1"],
+        ["2"],
+    ]
+
+
+@pytest.mark.parametrize("mode", ["overwrite", "append"])
+def test_upload_chunks_to_table_catalog_types(chunk_upload, mode):
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    chunk_upload["glue_table"] = {
+        "StorageDescriptor": {"Columns": [{"Name": "a", "Type": "double"}]},
+        "PartitionKeys": [{"Name": "p", "Type": "string"}],
+    }
+    # The first chunk's types would be bigint and the second's double
+    chunks = [
+        pd.DataFrame({"a": [1, 2], "b": ["x", "y"], "p": [0, 0]}),
+        pd.DataFrame({"a": [None, None], "b": ["z", "z"], "p": [1, 1]}),
+    ]
+    wrangler._upload_chunks_to_table(
+        iter(chunks),
+        "db",
+        "tbl",
+        "s3://bucket/tbl/",
+        mode=mode,
+        partition_cols=["p"],
+        max_concurrency=2,
+        boto3_session=None,
+    )
+
+    # Appends are cast to the table's types, new columns keep their own
+    if mode == "append":
+        columns_types = {"a": "double", "b": "string"}
+        partitions_types = {"p": "string"}
+    else:
+        columns_types = {"a": "bigint", "b": "string"}
+        partitions_types = {"p": "bigint"}
+    assert [kwargs["dtype"] for _, kwargs in chunk_upload["to_parquet"]] == [
+        columns_types
+    ] * 2
+    assert chunk_upload["create"][0]["columns_types"] == columns_types
+    assert chunk_upload["create"][0]["partitions_types"] == partitions_types
+
+
+def test_upload_chunks_to_table_failure(chunk_upload):
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    def chunks():
+        for i in range(100):
+            yield pd.DataFrame({"a": [-1 if i == 2 else i], "p": [0]})
+
+    with pytest.raises(ValueError, match="bad chunk"):
+        wrangler._upload_chunks_to_table(
+            chunks(),
+            "db",
+            "tbl",
+            "s3://bucket/tbl/",
+            mode="append",
+            partition_cols=["p"],
+            max_concurrency=2,
+            boto3_session=None,
+        )
+    assert len(chunk_upload["to_parquet"]) < 100
+    assert chunk_upload["create"] == []
+
+
+@pytest.fixture
+def local_s3(tmp_path, monkeypatch):
+    import os
+
+    import pydbtools._wrangler as wrangler
+    from tests.test_parquet_dataset import LocalFileSystem
+
+    fs = LocalFileSystem(tmp_path)
+
+    def list_objects(prefix, **kwargs):
+        return [
+            "s3://" + os.path.relpath(os.path.join(root, f), tmp_path)
+            for root, _, files in os.walk(fs.local_path(prefix))
+            for f in files
+        ]
+
+    def size_objects(paths, **kwargs):
+        return {path: os.path.getsize(fs.local_path(path)) for path in paths}
+
+    def delete_objects(paths, **kwargs):
+        for path in paths:
+            os.remove(fs.local_path(path))
+
+    monkeypatch.setattr(wrangler, "_get_arrow_s3_filesystem", lambda boto3_session: fs)
+    monkeypatch.setattr(wrangler.wr.s3, "list_objects", list_objects)
+    monkeypatch.setattr(wrangler.wr.s3, "size_objects", size_objects)
+    monkeypatch.setattr(wrangler.wr.s3, "delete_objects", delete_objects)
+    return fs
+
+
+@pytest.fixture
+def sized_table(tmp_path, local_s3, monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    calls = {"create": [], "partitions": [], "glue_table": None}
+    monkeypatch.setattr(wrangler, "get_boto_session", lambda: "session")
+    monkeypatch.setattr(wrangler, "_get_glue_table", lambda *args: calls["glue_table"])
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "create_parquet_table",
+        lambda **kwargs: calls["create"].append(kwargs),
+    )
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "add_parquet_partitions",
+        lambda **kwargs: calls["partitions"].append(kwargs),
+    )
+
+    dataset = tmp_path / "bucket" / "tbl" / "tbl.parquet"
+    for p in [0, 5]:
+        (dataset / f"p={p}").mkdir(parents=True)
+        (dataset / f"p={p}" / "old.parquet").write_bytes(b"old")
+    return calls, "s3://bucket/tbl/", dataset
+
+
+@pytest.mark.parametrize(
+    "mode, remaining_old",
+    [
+        ("overwrite", []),
+        ("append", ["p=0", "p=5"]),
+        ("overwrite_partitions", ["p=5"]),
+    ],
+)
+def test_write_sized_table(sized_table, mode, remaining_old):
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    calls, location, dataset = sized_table
+    chunks = [
+        pd.DataFrame({"a": range(i * 10, i * 10 + 10), "p": [i % 2] * 10})
+        for i in range(20)
+    ]
+    wrangler._write_sized_table(
+        iter(chunks),
+        "db",
+        "tbl",
+        location,
+        mode=mode,
+        partition_cols=["p"],
+        target_file_size="1MB",
+        boto3_session=None,
+    )
+
+    old = sorted(p.parent.name for p in dataset.glob("*/old.parquet"))
+    assert old == remaining_old
+    new = sorted(dataset.glob("*/*.snappy.parquet"))
+    assert [p.parent.name for p in new] == ["p=0", "p=1"]
+    assert sorted(pd.concat(pd.read_parquet(p) for p in new)["a"].tolist()) == list(
+        range(200)
+    )
+
+    assert len(calls["create"]) == 1
+    assert calls["create"][0]["columns_types"] == {"a": "bigint"}
+    assert len(calls["partitions"]) == 1
+    assert sorted(calls["partitions"][0]["partitions_values"].values()) == [
+        ["0"],
+        ["1"],
+    ]
+
+
+def test_write_sized_table_catalog_types(sized_table):
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    import pydbtools._wrangler as wrangler
+
+    calls, location, dataset = sized_table
+    calls["glue_table"] = {
+        "StorageDescriptor": {"Columns": [{"Name": "a", "Type": "double"}]},
+        "PartitionKeys": [{"Name": "p", "Type": "string"}],
+    }
+    chunks = [
+        pd.DataFrame({"a": [1, 2], "b": ["x", "y"], "p": [0, 1]}),
+        pd.DataFrame({"a": [None, 3], "b": ["z", "z"], "p": [0, 1]}),
+    ]
+    wrangler._write_sized_table(
+        iter(chunks),
+        "db",
+        "tbl",
+        location,
+        mode="append",
+        partition_cols=["p"],
+        target_file_size="1MB",
+        boto3_session=None,
+    )
+
+    # Appends are written with the table's types, new columns keep their own
+    new = sorted(dataset.glob("*/*.snappy.parquet"))
+    assert [str(pq.read_schema(p).field("a").type) for p in new] == ["double"] * 2
+    assert calls["create"][0]["columns_types"] == {"a": "double", "b": "string"}
+    assert calls["create"][0]["partitions_types"] == {"p": "string"}
+
+
+def test_write_sized_table_failure(sized_table):
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    calls, location, dataset = sized_table
+
+    def chunks():
+        yield pd.DataFrame({"a": [1, 2], "p": [0, 1]})
+        raise ValueError("bad chunk")
+
+    with pytest.raises(ValueError, match="bad chunk"):
+        wrangler._write_sized_table(
+            chunks(),
+            "db",
+            "tbl",
+            location,
+            mode="overwrite",
+            partition_cols=["p"],
+            target_file_size=1,
+            boto3_session=None,
+        )
+    assert sorted(p.name for p in dataset.glob("*/*")) == ["old.parquet"] * 2
+    assert calls["create"] == []
+
+
+class MockGlueTableSession(MockIdentity):
+    region_name = "eu-west-1"
+
+    def __init__(self, partition_keys, location="s3://bucket/tbl"):
+        self.partition_keys = partition_keys
+        self.location = location
+
+    def client(self, name):
+        return self
+
+    def get_table(self, DatabaseName, Name):
+        return {
+            "Table": {
+                "Name": Name,
+                "DatabaseName": DatabaseName,
+                "PartitionKeys": self.partition_keys,
+                "StorageDescriptor": {"Location": self.location, "Columns": []},
+            }
+        }
+
+
+@pytest.mark.parametrize("partitioned", [True, False])
+def test_compact_table(tmp_path, local_s3, monkeypatch, partitioned):
+    import datetime
+
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    import pydbtools._wrangler as wrangler
+
+    location = tmp_path / "bucket" / "tbl"
+    partitions = {}
+    for p, n_files in [(0, 10), (1, 1)]:
+        path = location / f"p={p}" if partitioned else location
+        path.mkdir(parents=True, exist_ok=True)
+        partitions[f"s3://bucket/tbl/p={p}/"] = [str(p)]
+        for i in range(n_files):
+            table = pa.table(
+                {
+                    "a": [p * 100 + i * 10 + j for j in range(10)],
+                    "t": [datetime.datetime(2020, 1, 1)] * 10,
+                }
+            )
+            pq.write_table(
+                table, path / f"{p}_{i}.parquet", use_deprecated_int96_timestamps=True
+            )
+    (location / "_SUCCESS").write_bytes(b"")
+
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "get_partitions",
+        lambda database, table, expression, boto3_session: partitions,
+    )
+    session = MockGlueTableSession([{"Name": "p"}] if partitioned else [])
+
+    compacted = wrangler.compact_table(
+        "db", "tbl", target_file_size="1MB", boto3_session=session
+    )
+
+    if partitioned:
+        assert compacted == ["s3://bucket/tbl/p=0/"]
+        assert [f.name for f in (location / "p=1").iterdir()] == ["1_0.parquet"]
+        compacted_dir = location / "p=0"
+    else:
+        assert compacted == ["s3://bucket/tbl/"]
+        compacted_dir = location
+    files = sorted(compacted_dir.glob("*.parquet"))
+    assert len(files) == 1
+    assert files[0].name.endswith(".snappy.parquet")
+    df = pd.read_parquet(files[0])
+    assert len(df) == (100 if partitioned else 110)
+    assert df["t"].iloc[0] == pd.Timestamp(2020, 1, 1)
+    assert (location / "_SUCCESS").exists()
+    assert not list(location.parent.glob("*__compacted_*"))
+
+
+def test_compact_table_schema_evolution(tmp_path, local_s3):
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    import pydbtools._wrangler as wrangler
+
+    location = tmp_path / "bucket" / "tbl"
+    location.mkdir(parents=True)
+    for i in range(3):
+        pq.write_table(pa.table({"a": [i]}), location / f"0_{i}.parquet")
+        pq.write_table(
+            pa.table({"b": [f"b{i}"], "a": [10 + i]}), location / f"1_{i}.parquet"
+        )
+    session = MockGlueTableSession([])
+
+    wrangler.compact_table("db", "tbl", target_file_size="1MB", boto3_session=session)
+
+    (compacted,) = location.iterdir()
+    df = pd.read_parquet(compacted).sort_values("a")
+    assert df["a"].tolist() == [0, 1, 2, 10, 11, 12]
+    assert df["b"].isna().tolist() == [True] * 3 + [False] * 3
+    assert df["b"].tolist()[3:] == ["b0", "b1", "b2"]
+
+    # Files with conflicting types are left alone
+    pq.write_table(pa.table({"a": ["x"]}), location / "bad.parquet")
+    before = sorted(location.iterdir())
+    with pytest.raises(ValueError, match="conflicting schemas"):
+        wrangler.compact_table(
+            "db", "tbl", target_file_size="1MB", boto3_session=session
+        )
+    assert sorted(location.iterdir()) == before
+
+
+def test_dataframe_to_table_after_compact_table(tmp_path, local_s3, monkeypatch):
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    session = MockGlueTableSession([], location="s3://bucket/tbl/tbl.parquet")
+
+    def to_parquet(df, path, mode, **kwargs):
+        # awswrangler refuses to write anywhere but the table's location
+        assert path.rstrip("/") == session.location.rstrip("/")
+        assert mode == "append"
+        name = f"{wrangler.uuid.uuid4().hex}.parquet"
+        df.to_parquet(local_s3.local_path(f"{path}/{name}"))
+
+    monkeypatch.setattr(wrangler.wr.s3, "to_parquet", to_parquet)
+    (tmp_path / "bucket" / "tbl" / "tbl.parquet").mkdir(parents=True)
+    for i in range(5):
+        wrangler.dataframe_to_table(
+            pd.DataFrame({"a": [i]}),
+            "db",
+            "tbl",
+            "s3://bucket/tbl/",
+            mode="append",
+            boto3_session=session,
+        )
+
+    wrangler.compact_table("db", "tbl", target_file_size="1MB", boto3_session=session)
+    wrangler.dataframe_to_table(
+        pd.DataFrame({"a": [5]}),
+        "db",
+        "tbl",
+        "s3://bucket/tbl/",
+        mode="append",
+        boto3_session=session,
+    )
+
+    df = pd.read_parquet(local_s3.local_path(session.location))
+    assert sorted(df["a"].tolist()) == list(range(6))
+    assert len(list((tmp_path / "bucket" / "tbl" / "tbl.parquet").iterdir())) == 2
+
+
+def test_compact_table_view():
+    import pydbtools._wrangler as wrangler
+
+    with pytest.raises(ValueError, match="no location"):
+        wrangler.compact_table(
+            "db", "tbl", boto3_session=MockGlueTableSession([], location=None)
+        )
+
+
+def test_compact_table_expression_unpartitioned():
+    import pydbtools._wrangler as wrangler
+
+    with pytest.raises(ValueError, match="not partitioned"):
+        wrangler.compact_table(
+            "db", "tbl", expression="p = 1", boto3_session=MockGlueTableSession([])
+        )
+
+
+def throttled(code="ThrottlingException"):
+    from botocore.exceptions import ClientError
+
+    return ClientError({"Error": {"Code": code, "Message": "slow down"}}, "Op")
+
+
+def test_call_with_retries(monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    monkeypatch.setattr(wrangler, "_retry_base_delay", 0)
+    attempts = []
+
+    def flaky(x):
+        attempts.append(x)
+        if len(attempts) < 3:
+            raise throttled()
+        return x
+
+    assert wrangler._call_with_retries(flaky, 1) == 1
+    assert len(attempts) == 3
+
+    def always_throttled():
+        attempts.append(None)
+        raise throttled("TooManyRequestsException")
+
+    attempts.clear()
+    with pytest.raises(Exception, match="slow down"):
+        wrangler._call_with_retries(always_throttled)
+    assert len(attempts) == wrangler._retry_max_attempts
+
+    def access_denied():
+        attempts.append(None)
+        raise throttled("AccessDeniedException")
+
+    attempts.clear()
+    with pytest.raises(Exception):
+        wrangler._call_with_retries(access_denied)
+    assert len(attempts) == 1
+
+
+class MockBatchGlueSession:
+    region_name = "eu-west-1"
+
+    def __init__(self, fail_tables=()):
+        self.fail_tables = set(fail_tables)
+        self.deleted_tables = []
+
+    def client(self, name):
+        return self
+
+    def batch_delete_table(self, DatabaseName, TablesToDelete):
+        assert len(TablesToDelete) <= 100
+        self.deleted_tables += [t for t in TablesToDelete if t not in self.fail_tables]
+        return {
+            "Errors": [
+                {"TableName": t, "ErrorDetail": {"ErrorMessage": "nope"}}
+                for t in TablesToDelete
+                if t in self.fail_tables
+            ]
+        }
+
+
+@pytest.fixture
+def glue_database(monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    glue_tables = [
+        {"Name": f"t{i}", "StorageDescriptor": {"Location": f"s3://bucket/t{i}"}}
+        for i in range(250)
+    ] + [{"Name": "a_view", "StorageDescriptor": {"Location": ""}}]
+    deleted = {"data": [], "database": []}
+
+    def delete_objects(path, **kwargs):
+        if path == "s3://bucket/t7/":
+            raise ValueError("access denied")
+        deleted["data"].append(path)
+
+    # Deletions always check Glue rather than the cache
+    monkeypatch.setattr(
+        wrangler, "_database_exists", lambda db, session, refresh: refresh
+    )
+    monkeypatch.setattr(
+        wrangler.wr.catalog, "get_tables", lambda **kwargs: iter(glue_tables)
+    )
+    monkeypatch.setattr(
+        wrangler, "_thread_session_factory", lambda session: lambda: session
+    )
+    monkeypatch.setattr(wrangler.wr.s3, "delete_objects", delete_objects)
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "delete_database",
+        lambda db, **kwargs: deleted["database"].append(db),
+    )
+    return deleted
+
+
+def test_delete_database_and_data(glue_database, monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    session = MockBatchGlueSession(fail_tables=["t3"])
+    with pytest.raises(wrangler.DeletionError) as e:
+        wrangler.delete_database_and_data("db", boto3_session=session)
+
+    assert set(e.value.failures) == {"t3", "t7"}
+    assert "access denied" in str(e.value.failures["t7"])
+    assert len(glue_database["data"]) == 249
+    assert len(session.deleted_tables) == 249
+    assert "t7" not in session.deleted_tables
+    assert glue_database["database"] == []
+
+    monkeypatch.setattr(wrangler.wr.s3, "delete_objects", lambda path, **kwargs: None)
+    session = MockBatchGlueSession()
+    assert wrangler.delete_database_and_data("db", boto3_session=session)
+    assert len(session.deleted_tables) == 251
+    assert glue_database["database"] == ["db"]
+
+
+class MockPartitionSession(MockIdentity):
+    region_name = "eu-west-1"
+
+    def __init__(self, objects, fail_values=(), throttle_first=False):
+        self.objects = objects
+        self.fail_values = set(fail_values)
+        self.throttle_first = throttle_first
+        self.batches = []
+
+    def client(self, name):
+        return self
+
+    def batch_delete_partition(self, DatabaseName, TableName, PartitionsToDelete):
+        assert len(PartitionsToDelete) <= 25
+        if self.throttle_first:
+            self.throttle_first = False
+            raise throttled()
+        self.batches.append([p["Values"] for p in PartitionsToDelete])
+        return {
+            "Errors": [
+                {"PartitionValues": p["Values"], "ErrorDetail": {"ErrorMessage": "no"}}
+                for p in PartitionsToDelete
+                if tuple(p["Values"]) in self.fail_values
+            ]
+        }
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        contents = [
+            {"Key": key, "Size": size}
+            for key, size in self.objects.items()
+            if key.startswith(Prefix)
+        ]
+        return [{"Contents": contents[:1]}, {"Contents": contents[1:]}, {}]
+
+
+@pytest.fixture
+def glue_partitions(monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    partitions = {
+        f"s3://bucket/tbl/year={y}/month={m}/": [str(y), str(m)]
+        for y in range(2000, 2010)
+        for m in range(1, 13)
+    }
+    deleted = []
+
+    def delete_objects(path, **kwargs):
+        if path == "s3://bucket/tbl/year=2003/month=1/":
+            raise ValueError("access denied")
+        deleted.append(path)
+
+    monkeypatch.setattr(wrangler, "_retry_base_delay", 0)
+    monkeypatch.setattr(
+        wrangler.wr.catalog, "get_partitions", lambda *args, **kwargs: partitions
+    )
+    monkeypatch.setattr(
+        wrangler, "_thread_session_factory", lambda session: lambda: session
+    )
+    monkeypatch.setattr(wrangler.wr.s3, "delete_objects", delete_objects)
+    return partitions, deleted
+
+
+def test_delete_partitions_and_data(glue_partitions):
+    import pydbtools._wrangler as wrangler
+
+    partitions, deleted = glue_partitions
+    session = MockPartitionSession({}, fail_values=[("2005", "6")], throttle_first=True)
+    with pytest.raises(wrangler.DeletionError) as e:
+        wrangler.delete_partitions_and_data(
+            "db", "tbl", "year > 1999", boto3_session=session
+        )
+
+    assert set(e.value.failures) == {
+        "s3://bucket/tbl/year=2003/month=1/",
+        "s3://bucket/tbl/year=2005/month=6/",
+    }
+    assert len(deleted) == 119
+    batched = [tuple(v) for batch in session.batches for v in batch]
+    assert len(batched) == 119
+    assert ("2003", "1") not in batched
+
+
+def test_delete_partitions_and_data_dry_run(glue_partitions):
+    import pydbtools._wrangler as wrangler
+
+    partitions, deleted = glue_partitions
+    session = MockPartitionSession(
+        {
+            "tbl/year=2000/month=1/a.parquet": 10,
+            "tbl/year=2000/month=1/b.parquet": 5,
+            "tbl/year=2000/month=10/a.parquet": 7,
+        }
+    )
+    df = wrangler.delete_partitions_and_data(
+        "db", "tbl", "year > 1999", boto3_session=session, dry_run=True
+    )
+
+    assert deleted == []
+    assert session.batches == []
+    assert len(df) == 120
+    first = df.set_index("location").loc["s3://bucket/tbl/year=2000/month=1/"]
+    assert first["values"] == ["2000", "1"]
+    assert (first["objects"], first["bytes"]) == (2, 15)
+    assert df["bytes"].sum() == 22
+
+
+def test_delete_table_and_data_uses_get_table(monkeypatch):
+    import pydbtools._wrangler as wrangler
+
+    deleted = []
+    monkeypatch.setattr(
+        wrangler, "tables", lambda **kwargs: pytest.fail("listed every table")
+    )
+    monkeypatch.setattr(
+        wrangler.wr.s3, "delete_objects", lambda path, **kwargs: deleted.append(path)
+    )
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "delete_table_if_exists",
+        lambda database, table, **kwargs: deleted.append(f"{database}.{table}"),
+    )
+
+    class Session(MockGlueTableSession):
+        class exceptions:
+            class EntityNotFoundException(Exception):
+                pass
+
+        def get_table(self, DatabaseName, Name):
+            if Name != "a":
+                raise self.exceptions.EntityNotFoundException()
+            location = "s3://bucket/a" if not deleted else "s3://bucket/b"
+            return {"Table": {"StorageDescriptor": {"Location": location}}}
+
+    session = Session([])
+    assert not wrangler.delete_table_and_data("b", "db", boto3_session=session)
+    assert wrangler.delete_table_and_data("a", "db", boto3_session=session)
+    assert deleted == ["s3://bucket/a/", "db.a"]
+    # The deletion clears the cached table
+    assert wrangler.delete_table_and_data("a", "db", boto3_session=session)
+    assert deleted[2] == "s3://bucket/b/"
+
+
+def test_cache_glue_metadata():
+    import pydbtools._wrangler as wrangler
+    from pydbtools import utils
+
+    calls = []
+
+    def describe(table, database=None, limit=10, boto3_session=None):
+        calls.append((table, database, limit))
+        return {"table": table, "limit": limit}
+
+    cached = wrangler._cache_glue_metadata("describe", describe)
+    session = MockGlueTableSession([])
+
+    assert cached("a", "db", boto3_session=session) == {"table": "a", "limit": 10}
+    cached("a", database="db", boto3_session=session)
+    cached("a", "db", limit=5, boto3_session=session)
+    cached("b", "db", boto3_session=session)
+    assert len(calls) == 3
+
+    utils._forget_table("db", "a")
+    cached("a", "db", boto3_session=session)
+    cached("b", "db", boto3_session=session)
+    assert len(calls) == 4
+    assert utils.get_glue_cache_stats()["describe"] == {"hits": 2, "misses": 4}
+
+
+def test_wait_query_adaptive_polling(monkeypatch):
+    import pydbtools._wrangler as wrangler
+    from pydbtools.utils import get_query_poll_stats
+
+    states = ["QUEUED", "RUNNING", "RUNNING", "RUNNING", "SUCCEEDED"]
+    sleeps = []
+    monkeypatch.setattr(
+        wrangler.ath,
+        "get_query_execution",
+        lambda query_execution_id, boto3_session: {
+            "QueryExecutionId": query_execution_id,
+            "Status": {"State": states.pop(0)},
+        },
+    )
+    monkeypatch.setattr(wrangler.time, "sleep", sleeps.append)
+    get_query_poll_stats(reset=True)
+
+    schedule = {"initial_delay": 1, "multiplier": 3, "max_delay": 10, "jitter": 0}
+    response = wrangler._wait_query("qid", None, schedule)
+    assert response["Status"]["State"] == "SUCCEEDED"
+    assert sleeps == [1, 3, 9, 10]
+    stats = get_query_poll_stats(reset=True)
+    assert stats["queries"] == 1
+    assert stats["polls"] == 5
+    assert get_query_poll_stats()["polls"] == 0
+
+    states[:] = ["RUNNING", "FAILED"]
+    with pytest.raises(wrangler.wr.exceptions.QueryFailed):
+        wrangler._wait_query("qid", None, schedule)
+
+
+def test_query_poll_delays_jitter(monkeypatch):
+    from itertools import islice
+
+    from pydbtools import utils
+    from pydbtools.utils import _query_poll_delays
+
+    schedule = {"initial_delay": 0.1, "multiplier": 2, "max_delay": 1, "jitter": 0.5}
+    delays = list(islice(_query_poll_delays(schedule), 20))
+    assert 0.05 <= delays[0] <= 0.1
+    assert all(0.5 <= delay <= 1 for delay in delays[5:])
+    # The global schedule is used for anything not given
+    monkeypatch.setitem(utils.query_poll_schedule, "initial_delay", 7)
+    assert next(_query_poll_delays({"jitter": 0})) == 7
+
+
+def test_run_queries(monkeypatch):
+    import threading
+    import time
+
+    import pydbtools._wrangler as wrangler
+
+    lock = threading.Lock()
+    running = set()
+    max_running = []
+    attempts = {}
+
+    def start_query_execution(sql, **kwargs):
+        assert kwargs["database"] == "db"
+        with lock:
+            attempts[sql] = attempts.get(sql, 0) + 1
+            if sql == "SELECT 3" and attempts[sql] == 1:
+                raise throttled("TooManyRequestsException")
+            if sql == "BAD START":
+                raise ValueError("bad sql")
+            running.add(sql)
+            max_running.append(len(running))
+        return sql
+
+    def wait_query(query_execution_id, boto3_session, poll_schedule, check_state):
+        assert not check_state
+        time.sleep(0.01)
+        with lock:
+            running.discard(query_execution_id)
+        state = "FAILED" if query_execution_id == "BAD RUN" else "SUCCEEDED"
+        return {
+            "Status": {"State": state, "StateChangeReason": "failed"},
+            "Statistics": {"DataScannedInBytes": len(query_execution_id)},
+        }
+
+    monkeypatch.setattr(wrangler, "start_query_execution", start_query_execution)
+    monkeypatch.setattr(wrangler, "_wait_query", wait_query)
+    monkeypatch.setattr(wrangler, "get_boto_session", lambda **kwargs: None)
+    monkeypatch.setattr(wrangler, "_retry_base_delay", 0)
+
+    sqls = [f"SELECT {i}" for i in range(10)] + ["BAD START", "BAD RUN"]
+    results = wrangler.run_queries(sqls, max_concurrency=3, database="db")
+
+    assert max(max_running) <= 3
+    assert attempts["SELECT 3"] == 2
+    assert [r["query_execution_id"] for r in results] == sqls[:10] + [
+        None,
+        "BAD RUN",
+    ]
+    assert [r["state"] for r in results] == ["SUCCEEDED"] * 10 + [None, "FAILED"]
+    assert results[0]["statistics"] == {"DataScannedInBytes": 8}
+    assert all(r["error"] is None for r in results[:10])
+    assert isinstance(results[10]["error"], ValueError)
+    assert isinstance(results[11]["error"], wrangler.wr.exceptions.QueryFailed)
+
+
+def test_create_temp_tables(monkeypatch):
+    import threading
+    import time
+
+    import pydbtools._wrangler as wrangler
+
+    lock = threading.Lock()
+    events = []
+    running = set()
+    max_running = []
+    prepared = []
+
+    def prepare_temp_database(session):
+        prepared.append(session)
+        return "mojap_de_temp_pytest", "s3://dummy/path/__athena_temp_db__/"
+
+    def start_temp_table_ctas(sql, table_name, temp_db_name, db_path, session):
+        assert temp_db_name == "mojap_de_temp_pytest"
+        with lock:
+            events.append(("start", table_name, sql))
+            running.add(table_name)
+            max_running.append(len(running))
+        return table_name
+
+    def wait_query(query_execution_id, session, poll_schedule):
+        time.sleep(0.01)
+        with lock:
+            running.discard(query_execution_id)
+            events.append(("done", query_execution_id))
+        if query_execution_id == "bad":
+            raise wrangler.wr.exceptions.QueryFailed("failed")
+
+    monkeypatch.setattr(wrangler, "_prepare_temp_database", prepare_temp_database)
+    monkeypatch.setattr(wrangler, "_thread_session_factory", lambda s: lambda: s)
+    monkeypatch.setattr(wrangler, "_start_temp_table_ctas", start_temp_table_ctas)
+    monkeypatch.setattr(wrangler, "_wait_query", wait_query)
+    monkeypatch.setattr(wrangler, "get_boto_session", lambda **kwargs: "session")
+
+    tables = {f"t{i}": f"SELECT {i}" for i in range(6)}
+    tables["joined"] = "SELECT * FROM __temp__.t0 JOIN __temp__.t5 USING (a)"
+    wrangler.create_temp_tables(tables, max_concurrency=3)
+
+    assert prepared == ["session"]
+    assert max(max_running) <= 3
+    assert max(max_running) > 1
+    assert sorted(e[1] for e in events if e[0] == "start") == sorted(tables)
+    assert (
+        "start",
+        "joined",
+        "SELECT * FROM mojap_de_temp_pytest.t0 JOIN mojap_de_temp_pytest.t5 USING (a)",
+    ) in events
+    joined = events.index(next(e for e in events if e[1] == "joined"))
+    assert events.index(("done", "t0")) < joined
+    assert events.index(("done", "t5")) < joined
+
+    # A failure is raised and the tables that depend on it are not created
+    events.clear()
+    with pytest.raises(wrangler.wr.exceptions.QueryFailed):
+        wrangler.create_temp_tables(
+            {"bad": "SELECT 1", "after": "SELECT * FROM __temp__.bad"}
+        )
+    assert events == [("start", "bad", "SELECT 1"), ("done", "bad")]
+
+    # Tables are created after the tables they read, whatever the order
+    events.clear()
+    wrangler.create_temp_tables(
+        {
+            "last": "SELECT * FROM __temp__.middle",
+            "middle": "SELECT * FROM __temp__.first",
+            "first": "SELECT 1",
+        }
+    )
+    assert [e[1] for e in events] == ["first"] * 2 + ["middle"] * 2 + ["last"] * 2
+
+    # Tables that read each other are rejected before anything is started
+    events.clear()
+    prepared.clear()
+    with pytest.raises(ValueError, match="cycle"):
+        wrangler.create_temp_tables(
+            {
+                "a": "SELECT * FROM __temp__.b",
+                "b": "SELECT * FROM __temp__.a",
+                "c": "SELECT 1",
+            }
+        )
+    with pytest.raises(ValueError, match="cycle"):
+        wrangler.create_temp_tables({"a": "SELECT * FROM __temp__.a"})
+    assert events == []
+    assert prepared == []
+
+    with pytest.raises(ValueError):
+        wrangler.create_temp_tables({"t": "DROP TABLE db.t"})
+
+
+class MockTempStorageSession:
+    region_name = "eu-west-1"
+
+    def __init__(self, objects):
+        self.objects = objects
+
+    def client(self, name):
+        return self
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix, Delimiter=None):
+        keys = [key for key in self.objects if key.startswith(Prefix)]
+        if Delimiter is None:
+            return [{"Contents": [{"Key": k, "Size": self.objects[k]} for k in keys]}]
+        prefixes = sorted(
+            {Prefix + k[len(Prefix) :].split("/")[0] + "/" for k in keys if "/" in k}
+        )
+        return [{"CommonPrefixes": [{"Prefix": p} for p in prefixes]}, {}]
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_cleanup_temp_storage(monkeypatch, dry_run):
+    import datetime
+    import time
+
+    import pydbtools._wrangler as wrangler
+
+    old = str(int(time.time()) - 3 * 86400) + "123456"
+    new = str(int(time.time()) - 60) + "123456"
+    session = MockTempStorageSession(
+        {
+            # Old tables, one still in use
+            f"user/{old}1/df_table/a.parquet": 10,
+            f"user/__athena_temp_db__/{old}2/unused/a.parquet": 5,
+            f"user/__athena_temp_db__/{old}2/unused/b.parquet": 7,
+            f"user/__athena_temp_db__/{old}3/live/a.parquet": 100,
+            # Too recent
+            f"user/__athena_temp_db__/{new}/running/a.parquet": 1,
+            # Not temp table folders
+            "user/tables/abc/a.parquet": 1,
+            "user/query_id.csv": 1,
+        }
+    )
+    deleted = []
+    monkeypatch.setattr(
+        wrangler,
+        "get_user_id_and_table_dir",
+        lambda boto3_session: ("user_id", "s3://bucket/user/"),
+    )
+    monkeypatch.setattr(wrangler, "get_database_name_from_userid", lambda u: "temp")
+    # Deletions always check Glue rather than the cache
+    monkeypatch.setattr(
+        wrangler, "_database_exists", lambda db, session, refresh: refresh
+    )
+    monkeypatch.setattr(
+        wrangler.wr.catalog,
+        "get_tables",
+        lambda database, boto3_session: [
+            {"StorageDescriptor": {"Location": f"s3://bucket/user/{p}"}}
+            for p in [f"__athena_temp_db__/{old}3/live", f"__athena_temp_db__/{new}"]
+        ]
+        + [{"Name": "a_view"}],
+    )
+    monkeypatch.setattr(
+        wrangler, "_thread_session_factory", lambda session: lambda: session
+    )
+    monkeypatch.setattr(
+        wrangler.wr.s3, "delete_objects", lambda paths, **kwargs: deleted.extend(paths)
+    )
+
+    df = wrangler.cleanup_temp_storage(
+        older_than=datetime.timedelta(days=1), dry_run=dry_run, boto3_session=session
+    )
+
+    assert sorted(df["location"]) == [
+        f"s3://bucket/user/{old}1/",
+        f"s3://bucket/user/__athena_temp_db__/{old}2/",
+    ]
+    assert df["bytes"].sum() == 22
+    assert df["objects"].sum() == 3
+    assert (df["created"] < datetime.datetime.now() - datetime.timedelta(days=2)).all()
+    if dry_run:
+        assert deleted == []
+    else:
+        assert sorted(deleted) == [
+            f"s3://bucket/user/{old}1/df_table/a.parquet",
+            f"s3://bucket/user/__athena_temp_db__/{old}2/unused/a.parquet",
+            f"s3://bucket/user/__athena_temp_db__/{old}2/unused/b.parquet",
+        ]
+
+
+def test_dataframe_to_temp_table_location(monkeypatch):
+    import re
+
+    import pandas as pd
+
+    import pydbtools._wrangler as wrangler
+
+    written = []
+    monkeypatch.setattr(
+        wrangler,
+        "get_user_id_and_table_dir",
+        lambda boto3_session: ("user_id", "s3://bucket/user/"),
+    )
+    monkeypatch.setattr(wrangler, "get_database_name_from_userid", lambda u: "temp")
+    monkeypatch.setattr(wrangler, "_create_temp_database", lambda *args, **kwargs: None)
+    monkeypatch.setattr(wrangler, "delete_temp_table", lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        wrangler,
+        "dataframe_to_table",
+        lambda df, db, table, location, boto3_session: written.append(location),
+    )
+
+    wrangler.dataframe_to_temp_table(
+        pd.DataFrame({"a": [1]}), "t", boto3_session="session"
+    )
+
+    # Each call writes under a new timestamped folder, which
+    # cleanup_temp_storage looks for
+    (location,) = written
+    assert re.fullmatch(r"s3://bucket/user/\d{10,}/t", location)
+    folder = location.rsplit("/", 1)[0] + "/"
+    assert wrangler.s3_path_join(location, "t.parquet/") == folder + "t.parquet/"
+
+
+def test_thread_session_factory_refreshes_credentials():
+    import datetime
+    import threading
+
+    import boto3
+    from botocore.credentials import RefreshableCredentials
+
+    import pydbtools._wrangler as wrangler
+
+    def metadata(access_key, expires_in):
+        expiry = datetime.datetime.now(datetime.timezone.utc) + expires_in
+        return {
+            "access_key": access_key,
+            "secret_key": "secret",
+            "token": "token",
+            "expiry_time": expiry.isoformat(),
+        }
+
+    refreshed = metadata("key2", datetime.timedelta(hours=1))
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata("key1", datetime.timedelta(hours=1)),
+        refresh_using=lambda: refreshed,
+        method="assume-role",
+    )
+    source = boto3.Session(region_name="eu-west-1")
+    source._session._credentials = credentials
+
+    get_session = wrangler._thread_session_factory(source)
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(get_session()))
+    thread.start()
+    thread.join()
+    (session,) = sessions
+
+    assert session is not get_session()
+    assert session.region_name == "eu-west-1"
+    assert session.get_credentials() is credentials
+    assert session.get_credentials().get_frozen_credentials().access_key == "key1"
+
+    # Credentials about to expire are refreshed for the worker sessions too
+    credentials._set_from_data(metadata("key1", datetime.timedelta(seconds=1)))
+    assert session.get_credentials().get_frozen_credentials().access_key == "key2"